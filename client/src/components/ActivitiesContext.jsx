@@ -4,11 +4,29 @@ import {
   useState,
   useEffect,
   useCallback,
+  useRef,
 } from "react";
 
 const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:5050";
 const ActivitiesContext = createContext();
 
+// Merge a page of server changes into the current list, newest first
+function applyChanges(activities, changes) {
+  const byId = new Map(
+    (activities || []).map((activity) => [activity.id, activity])
+  );
+  for (const change of changes) {
+    if (change.deleted) {
+      byId.delete(change.id);
+    } else {
+      byId.set(change.id, change.activity);
+    }
+  }
+  return [...byId.values()].sort((a, b) =>
+    b.start_date.localeCompare(a.start_date)
+  );
+}
+
 export function ActivitiesProvider({ children }) {
   const [activities, setActivities] = useState(null);
   const [isAuthorized, setIsAuthorized] = useState(false);
@@ -16,6 +34,8 @@ export function ActivitiesProvider({ children }) {
   const [isLoading, setIsLoading] = useState(true);
   const [userInfo, setUserInfo] = useState(null);
   const [userId, setUserId] = useState(null);
+  // Last change-log sequence number applied; 0 asks the server for the full list
+  const changeSeq = useRef(0);
 
   // Set auth status function for other components to use
   const setAuthStatus = useCallback((status) => {
@@ -68,6 +88,36 @@ export function ActivitiesProvider({ children }) {
     }
   };
 
+  // Pull changes since the last sync until caught up. Returns the number of changes applied.
+  // minSeq (from a refresh) makes the server read past a lagging replica.
+  const pullChanges = async (id, minSeq = 0) => {
+    let applied = 0;
+    let hasMore = true;
+
+    while (hasMore) {
+      const res = await fetch(
+        `${API_BASE}/api/activities/${id}/changes?since=${changeSeq.current}&min_seq=${minSeq}`
+      );
+
+      if (!res.ok) {
+        throw new Error(`Changes API error: ${res.status}`);
+      }
+
+      const data = await res.json();
+      if (data.reset) {
+        setActivities(data.activities);
+        applied += data.activities.length;
+      } else if (data.changes.length > 0) {
+        setActivities((current) => applyChanges(current, data.changes));
+        applied += data.changes.length;
+      }
+      changeSeq.current = data.seq;
+      hasMore = data.has_more;
+    }
+
+    return applied;
+  };
+
   const fetchActivities = async (id) => {
     setIsLoading(true);
 
@@ -83,17 +133,8 @@ export function ActivitiesProvider({ children }) {
 
     try {
       console.log(`Fetching activities for user ${userIdTemp}`);
-      const res = await fetch(`${API_BASE}/api/activities/${userIdTemp}`);
-
-      if (!res.ok) {
-        console.error(`Activities API error: ${res.status}`);
-        setIsLoading(false);
-        return { success: false };
-      }
-
-      const data = await res.json();
-      console.log(`Fetched ${data.length} activities`);
-      setActivities(data);
+      const applied = await pullChanges(userIdTemp);
+      console.log(`Fetched ${applied} activity changes`);
       setIsLoading(false);
       return { success: true };
     } catch (error) {
@@ -116,7 +157,10 @@ export function ActivitiesProvider({ children }) {
       }
 
       console.log(`Refreshing activities for user ${storedUserId}`);
-      const res = await fetch(`${API_BASE}/api/refresh/${storedUserId}`);
+      // Skip the full list in the refresh response; only the changes are pulled
+      const res = await fetch(
+        `${API_BASE}/api/refresh/${storedUserId}?activities=0`
+      );
 
       if (!res.ok) {
         console.error(`Refresh API error: ${res.status}`);
@@ -125,21 +169,14 @@ export function ActivitiesProvider({ children }) {
       }
 
       const data = await res.json();
-
-      if (data.activities) {
-        console.log(`Refreshed ${data.activities.length} activities`);
-        setActivities(data.activities);
-        setIsRefreshing(false);
-        return {
-          success: true,
-          changes: data.changes || { added: 0, updated: 0, deleted: 0 },
-          newActivities: data.changes?.added || 0,
-        };
-      } else {
-        console.error("No activities in refresh response");
-        setIsRefreshing(false);
-        return { success: false };
-      }
+      const applied = await pullChanges(storedUserId, data.changeSeq || 0);
+      console.log(`Refreshed with ${applied} activity changes`);
+      setIsRefreshing(false);
+      return {
+        success: true,
+        changes: data.changes || { added: 0, updated: 0, deleted: 0 },
+        newActivities: data.changes?.added || 0,
+      };
     } catch (error) {
       console.error("Error refreshing activities:", error);
       setIsRefreshing(false);
@@ -153,6 +190,7 @@ export function ActivitiesProvider({ children }) {
     setUserInfo(null);
     setActivities(null);
     setUserId(null);
+    changeSeq.current = 0;
   };
 
   return (
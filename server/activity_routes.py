@@ -0,0 +1,301 @@
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Activity, UserSummary, Route
+from training_load import get_calendar_series
+from sync_scheduler import record_user_sync
+from export import EXPORT_FORMATS, export_chunks, format_available
+from streams import SPLIT_LENGTHS, store_streams, load_streams, compute_splits, compute_best_efforts
+from search import search_activities
+from changes import MAX_CHANGES_PAGE, get_change_seq, get_changes
+from compression import cached_json_response
+from summary import update_user_summary, summary_response
+from profiles import get_user_profile
+from route_clusters import list_routes, route_history
+from db_routing import primary_only, use_primary, require_change_seq
+from strava_sync import StravaSyncError, StravaCredentials, refresh_user_token, fetch_activity_streams, sync_recent_activities
+
+bp = Blueprint("activities", __name__)
+
+
+def requested_activity_type(default='Run'):
+    """The ?type= filter on read endpoints: a Strava activity type, or None for ?type=all."""
+    activity_type = request.args.get("type", default)
+    return None if activity_type == "all" else activity_type
+
+
+@bp.route("/api/athlete/<int:user_id>")
+def get_athlete(user_id):
+    # Find user by ID only (no API key check)
+    profile = get_user_profile(user_id)
+    
+    if not profile:
+        return jsonify({"error": "User not found"}), 404
+    
+    return jsonify(profile)
+
+
+@bp.route("/api/activities/<int:user_id>")
+def get_activities(user_id):
+    # Find user by ID only
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Runs by default; ?type=Ride etc. for another sport, ?type=all for every sport
+    activity_type = requested_activity_type()
+    
+    def render():
+        activities = Activity.query.filter_by(user_id=user_id)
+        if activity_type:
+            activities = activities.filter_by(type=activity_type)
+        return [activity.activity_data for activity in activities.order_by(Activity.start_date.desc())]
+    
+    # Serialized and compressed once per version of the user's activities
+    cache_key = f"{user_id}:{activity_type or 'all'}"
+    return cached_json_response("activities", cache_key, get_change_seq(user_id), render)
+
+
+@bp.route("/api/summary/<int:user_id>")
+def get_user_summary(user_id):
+    """Dashboard totals, latest run and badge count, read from the user's summary row"""
+    summary = db.session.get(UserSummary, user_id)
+    if summary is None:
+        # Building the row writes, so build it from the primary's data
+        use_primary()
+        if not get_user_profile(user_id):
+            return jsonify({"error": "User not found"}), 404
+        # Users who haven't synced since summaries were added get theirs built once
+        try:
+            summary = update_user_summary(user_id)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent first request built it first; its row is just as current
+            db.session.rollback()
+            summary = db.session.get(UserSummary, user_id)
+    
+    return jsonify(summary_response(summary))
+
+
+@bp.route("/api/activities/<int:user_id>/changes")
+def get_activity_changes(user_id):
+    """Activities added, updated or deleted after change ?since=<seq>, for delta sync"""
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    since = request.args.get("since", 0, type=int)
+    # A replica behind what the client has already seen would answer with older data
+    require_change_seq(user_id, since)
+    activity_type = requested_activity_type()
+    if since <= 0:
+        # A client's first load: the full list, cached like /api/activities
+        cache_key = f"{user_id}:{activity_type or 'all'}"
+        return cached_json_response("changes", cache_key, get_change_seq(user_id),
+                                    lambda: get_changes(user_id, activity_type=activity_type))
+    
+    limit = min(max(request.args.get("limit", MAX_CHANGES_PAGE, type=int), 1), MAX_CHANGES_PAGE)
+    return jsonify(get_changes(user_id, since=since, limit=limit, activity_type=activity_type))
+
+
+@bp.route("/api/activities/<int:user_id>/search")
+def search_user_activities(user_id):
+    """Activities whose name or description matches every word of ?q= (as prefixes), newest first"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # after/before are inclusive dates
+    try:
+        after = datetime.strptime(request.args["after"], '%Y-%m-%d') if "after" in request.args else None
+        before = datetime.strptime(request.args["before"], '%Y-%m-%d') + timedelta(days=1) if "before" in request.args else None
+    except ValueError:
+        return jsonify({"error": "after and before must be YYYY-MM-DD"}), 400
+    
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+    activities, has_more = search_activities(
+        user_id, query, activity_type=requested_activity_type(default="all"), after=after, before=before,
+        page=page, per_page=per_page
+    )
+    
+    return jsonify({
+        "results": [activity.activity_data for activity in activities],
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more
+    })
+
+
+@bp.route("/api/export/<int:user_id>")
+def export_activities(user_id):
+    """Stream a user's full activity history as ?format=ndjson (default), csv or parquet, optionally one ?type="""
+    export_format = request.args.get("format", "ndjson")
+    if not format_available(export_format):
+        return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+    
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(export_chunks(export_format, user_id, activity_type=requested_activity_type(default="all"))),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=runhub-{user_id}.{extension}"}
+    )
+
+
+@bp.route("/api/activities/<int:activity_id>/splits")
+@primary_only
+def get_activity_splits(activity_id):
+    """Splits (?unit=km or mi) and best efforts from the activity's full-resolution streams."""
+    unit = request.args.get("unit", "km")
+    if unit not in SPLIT_LENGTHS:
+        return jsonify({"error": f"Unknown unit: {unit}"}), 400
+    
+    activity = db.session.get(Activity, activity_id)
+    if not activity:
+        return jsonify({"error": "Activity not found"}), 404
+    
+    streams = load_streams(activity_id)
+    if streams is None:
+        # First request for this activity: fetch from Strava once and keep the streams
+        # Both calls release the DB connection while they wait on Strava
+        credentials = StravaCredentials.from_user(db.session.get(User, activity.user_id))
+        try:
+            refresh_user_token(credentials)
+            streams = fetch_activity_streams(credentials, activity_id)
+        except StravaSyncError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), e.status_code
+        store_streams(activity_id, streams)
+        db.session.commit()
+    
+    if "time" not in streams or len(streams.get("distance", [])) < 2:
+        return jsonify({"error": "Activity has no GPS data"}), 404
+    
+    return jsonify({
+        "activity_id": activity_id,
+        "unit": unit,
+        "points": len(streams["time"]),
+        "splits": compute_splits(streams, SPLIT_LENGTHS[unit]),
+        "best_efforts": compute_best_efforts(streams)
+    })
+
+
+@bp.route("/api/refresh/<int:user_id>")
+@primary_only
+def refresh_activities(user_id):
+    """Refresh activities for a user. Pass ?verify=1 to force a deep verification."""
+    # Find user by ID only (no API key check)
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    # Copied off the row: no pooled DB connection is held while waiting on Strava, and
+    # reading the expired user during those waits would check one out again
+    credentials = StravaCredentials.from_user(user)
+    
+    try:
+        sync_started = time.time()
+        refresh_user_token(credentials)
+        
+        # Track timing and changes
+        start_time = time.time()
+        changes = sync_recent_activities(credentials, force_verify=request.args.get("verify") == "1")
+        activities_added = changes["added"]
+        activities_updated = changes["updated"]
+        activities_deleted = changes["deleted"]
+        
+        # Calculate processing time
+        processing_time = time.time() - start_time
+        record_user_sync(user_id, sync_started, "ok", changes={
+            "added": activities_added, "updated": activities_updated, "deleted": activities_deleted
+        })
+        
+        response = {
+            "changes": {
+                "added": activities_added,
+                "updated": activities_updated,
+                "deleted": activities_deleted,
+                "total_changes": activities_added + activities_updated + activities_deleted
+            },
+            "processingTime": round(processing_time, 2),
+            "syncMode": changes["mode"],
+            "stravaCalls": changes["strava_calls"],
+            "stravaCallsSaved": changes["calls_saved"],
+            # Pass as ?min_seq= so reads don't come from a replica that hasn't caught up
+            "changeSeq": get_change_seq(user_id)
+        }
+        
+        # STEP 10: Get all activities after refresh. Delta-sync clients pass ?activities=0
+        # and pull /api/activities/<user_id>/changes instead.
+        if request.args.get("activities") != "0":
+            activities = Activity.query.filter_by(user_id=user_id)
+            activity_type = requested_activity_type()
+            if activity_type:
+                activities = activities.filter_by(type=activity_type)
+            activities = activities.order_by(Activity.start_date.desc()).all()
+            response["activities"] = [activity.activity_data for activity in activities]
+            response["totalActivities"] = len(activities)
+        
+        return jsonify(response)
+    
+    except StravaSyncError as e:
+        db.session.rollback()
+        record_user_sync(user_id, sync_started, "error", str(e))
+        return jsonify({"error": str(e)}), e.status_code
+    
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error refreshing activities: {str(e)}")
+        record_user_sync(user_id, sync_started, "error", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/api/calendar/<int:user_id>")
+def get_calendar(user_id):
+    """Dense per-day distance, time, count, streak and training load series for one ?type= (default Run)"""
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Default to the last 365 days
+    try:
+        end = datetime.strptime(request.args["end"], '%Y-%m-%d').date() if "end" in request.args else datetime.utcnow().date()
+        start = datetime.strptime(request.args["start"], '%Y-%m-%d').date() if "start" in request.args else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+    
+    if start > end:
+        return jsonify({"error": "start must be on or before end"}), 400
+    if (end - start).days > 366 * 10:
+        return jsonify({"error": "Date range too large"}), 400
+    
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": get_calendar_series(user_id, start, end, requested_activity_type())
+    })
+
+
+@bp.route("/api/routes/<int:user_id>")
+def get_routes(user_id):
+    """Routes the user has covered at least ?min_count= times (default 2), for one ?type= (default Run)"""
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    min_count = max(request.args.get("min_count", 2, type=int), 1)
+    return jsonify({"routes": list_routes(user_id, requested_activity_type(), min_count)})
+
+
+@bp.route("/api/routes/<int:user_id>/<int:route_id>")
+def get_route_history(user_id, route_id):
+    """Every effort on one route with the best time and pace trend"""
+    route = db.session.get(Route, route_id)
+    if route is None or route.user_id != user_id:
+        return jsonify({"error": "Route not found"}), 404
+    
+    return jsonify(route_history(route))
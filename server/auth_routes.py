@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+from flask import Blueprint, current_app, redirect, request
+from models import db, User
+from cache import user_cache
+from strava_sync import strava_http, release_db_connection, fetch_and_store_activities
+from db_routing import primary_only
+
+bp = Blueprint("auth", __name__)
+
+
+@bp.route("/authorize")
+def authorize():
+    url = (
+        f"https://www.strava.com/oauth/authorize?client_id={current_app.config['STRAVA_CLIENT_ID']}"
+        f"&response_type=code&redirect_uri={current_app.config['STRAVA_REDIRECT_URI']}"
+        f"&approval_prompt=force&scope=read,activity:read"
+    )
+    return redirect(url)
+
+
+@bp.route("/callback")
+@primary_only
+def callback():
+    # Exchange temporary code from callback url for access token
+    temp_code = request.args.get("code")
+    release_db_connection()
+    token_res = strava_http.post(
+        "https://www.strava.com/oauth/token",
+        data={
+            "client_id": current_app.config["STRAVA_CLIENT_ID"],
+            "client_secret": current_app.config["STRAVA_CLIENT_SECRET"],
+            "code": temp_code,
+            "grant_type": "authorization_code",
+        },
+    )
+    data = token_res.json()
+
+    # User did not authorize strava
+    if "access_token" not in data:
+        return redirect(f"{current_app.config['FRONTEND_URL']}")
+
+    access_token = data["access_token"]
+    athlete = data["athlete"]
+    
+    try:
+        # Store user info in the database
+        user = User.query.get(athlete["id"])
+        if not user:
+            user = User(
+                id=athlete["id"],
+                username=athlete.get("username"),
+                firstname=athlete["firstname"],
+                lastname=athlete["lastname"],
+                profile=athlete.get("profile"),
+                access_token=access_token,
+                refresh_token=data.get("refresh_token"),
+                token_expires_at=data.get("expires_at")
+            )
+            db.session.add(user)
+        else:
+            # Update existing user's token
+            user.access_token = access_token
+            user.refresh_token = data.get("refresh_token")
+            user.token_expires_at = data.get("expires_at")
+            user.updated_at = datetime.utcnow()
+        
+        db.session.commit()
+        user_cache.invalidate(athlete["id"])
+        
+        # After user is created/updated, fetch their activities
+        fetch_and_store_activities(athlete["id"], access_token)
+
+        # Just redirect with user_id (no API key needed)
+        user_id = athlete["id"]
+        frontend_url = os.environ.get("FRONTEND_URL", "http://localhost:5173")
+        return redirect(f"{frontend_url}?user_id={user_id}")
+    
+    except Exception as e:
+        print(f"Error during authentication: {str(e)}")
+        frontend_url = os.environ.get("FRONTEND_URL", "http://localhost:5173")
+        return redirect(f"{frontend_url}?error=auth_failed&message={str(e)}")
@@ -0,0 +1,41 @@
+from flask import Blueprint, jsonify
+from models import UserBadge
+from profiles import get_user_profile
+from badges import get_badge_definitions, evaluate_user_badges
+from db_routing import primary_only
+
+bp = Blueprint("badges", __name__)
+
+
+@bp.route("/api/badges/<int:user_id>")
+def get_user_badges(user_id):
+    """Get badges earned by a user"""
+    if not get_user_profile(user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # One query for the user's awards; definitions come from the badge cache
+    definitions = {badge["id"]: badge for badge in get_badge_definitions()}
+    user_badges = UserBadge.query.filter_by(user_id=user_id).order_by(UserBadge.earned_date).all()
+    
+    badges = []
+    for user_badge in user_badges:
+        badge = definitions.get(user_badge.badge_id)
+        if not badge:
+            continue
+        badges.append({
+            "id": badge["id"],
+            "name": badge["name"],
+            "description": badge["description"],
+            "icon": badge["icon"],
+            "earned_date": user_badge.earned_date.isoformat()
+        })
+    
+    return jsonify(badges)
+
+
+@bp.route("/api/badges/evaluate/<int:user_id>")
+@primary_only
+def evaluate_badges_endpoint(user_id):
+    """Endpoint to manually trigger badge evaluation"""
+    result = evaluate_user_badges(user_id)
+    return jsonify(result)
@@ -0,0 +1,67 @@
+from models import db, Activity, Badge, UserBadge
+from cache import badge_cache
+from profiles import get_user_profile
+from summary import update_user_summary
+
+
+def get_badge_definitions():
+    """All badge definitions as dicts (read-through cached)."""
+    def load():
+        return [
+            {
+                "id": badge.id,
+                "name": badge.name,
+                "description": badge.description,
+                "icon": badge.icon,
+                "criteria_type": badge.criteria_type,
+                "criteria_value": badge.criteria_value,
+                "sport": badge.sport
+            }
+            for badge in Badge.query.order_by(Badge.id).all()
+        ]
+    return badge_cache.get_or_load("all", load)
+
+
+def evaluate_user_badges(user_id):
+    """Evaluate and award badges for a user based on their activities"""
+    if not get_user_profile(user_id):
+        return {"error": "User not found"}
+    
+    # Aggregate per sport in the database instead of loading every activity
+    totals = {
+        activity_type: (count, distance)
+        for activity_type, count, distance in db.session.query(
+            Activity.type,
+            db.func.count(Activity.id),
+            db.func.coalesce(db.func.sum(Activity.distance), 0)
+        ).filter(Activity.user_id == user_id).group_by(Activity.type)
+    }
+    
+    # Get all badges definitions
+    badges = get_badge_definitions()
+    earned_ids = {badge_id for (badge_id,) in db.session.query(UserBadge.badge_id).filter_by(user_id=user_id)}
+    badges_awarded = []
+    
+    for badge in badges:
+        # Skip if user already has this badge
+        if badge["id"] in earned_ids:
+            continue
+            
+        # Evaluate badge criteria against the badge's sport ('run_count' counts its activities)
+        run_count, total_distance = totals.get(badge.get("sport", "Run"), (0, 0))
+        if badge["criteria_type"] == 'run_count':
+            if run_count >= badge["criteria_value"]:
+                db.session.add(UserBadge(user_id=user_id, badge_id=badge["id"]))
+                badges_awarded.append(badge["name"])
+                
+        elif badge["criteria_type"] == 'total_distance':
+            if total_distance >= badge["criteria_value"]:
+                db.session.add(UserBadge(user_id=user_id, badge_id=badge["id"]))
+                badges_awarded.append(badge["name"])
+                
+        # Add more criteria types as needed
+    
+    if badges_awarded:
+        update_user_summary(user_id, activities=False)
+    db.session.commit()
+    return {"badges_awarded": badges_awarded}
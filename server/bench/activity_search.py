@@ -0,0 +1,175 @@
+"""Activity search latency over a large indexed history.
+
+Fills a fresh database with --activities activities spread over --users athletes (names
+and descriptions drawn from a mix of common and rare words, a few named races), then times
+/api/activities/<user_id>/search for several query shapes, and the search query alone
+against the same query done as a LIKE scan over the user's activities.
+
+Usage (from server/):
+    python bench/activity_search.py --activities 100000 --users 50
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from run import RESULTS_DIR, setup_app, git_revision, summarize
+
+RUN_NAMES = ["Morning Run", "Lunch Run", "Afternoon Run", "Evening Run", "Long Run", "Tempo Run",
+             "Easy Run", "Recovery Run", "Track Workout", "Hill Repeats"]
+RACE_NAMES = ["Boston Marathon", "Berlin Marathon", "Chicago Marathon", "Parkrun", "Turkey Trot",
+              "Half Marathon", "Trail Ultra", "Bay to Breakers"]
+DESCRIPTION_WORDS = ["legs", "felt", "heavy", "great", "windy", "rain", "sunny", "hot", "cold", "easy",
+                     "hard", "splits", "negative", "shoes", "new", "river", "loop", "park", "track",
+                     "hills", "tired", "strong", "pace", "group", "with", "friends", "dog", "solo",
+                     "recovery", "tempo", "intervals", "cooldown", "warmup", "strides", "humid"]
+RARE_WORDS = ["heartbreak", "waterfall", "lighthouse", "snowstorm", "blister", "moose"]
+OTHER_TYPES = ["Ride", "Walk", "Hike"]
+
+# (label, query params) for each query shape
+QUERIES = [
+    ("common_prefix", {"q": "ru"}),
+    ("race_name", {"q": "boston mar"}),
+    ("rare_description_word", {"q": "heartbreak"}),
+    ("filtered", {"q": "run", "type": "Run", "after": "2023-01-01", "before": "2023-12-31"}),
+    ("deep_page", {"q": "run", "page": 10}),
+    ("no_match", {"q": "xylophone"}),
+]
+
+
+def generate_rows(rng, activities, users):
+    end_date = datetime(2025, 11, 1, 7, 0, 0)
+    per_user = activities // users
+    for index in range(users):
+        user_id = 100000 + index
+        current = end_date
+        for run_index in range(per_user):
+            activity_type = rng.choice(OTHER_TYPES) if rng.random() < 0.1 else "Run"
+            if activity_type != "Run":
+                name = f"Afternoon {activity_type}"
+            elif rng.random() < 0.02:
+                name = f"{rng.choice(RACE_NAMES)} {current.year}"
+            else:
+                name = rng.choice(RUN_NAMES)
+            words = rng.sample(DESCRIPTION_WORDS, rng.randint(0, 8))
+            if rng.random() < 0.01:
+                words.append(rng.choice(RARE_WORDS))
+            activity_id = user_id * 100000 + run_index
+            yield {
+                "id": activity_id, "user_id": user_id, "name": name, "description": " ".join(words) or None,
+                "type": activity_type, "distance": 8000.0, "moving_time": 2400, "elapsed_time": 2500,
+                "start_date": current,
+                "activity_data_text": json.dumps({"id": activity_id, "name": name, "type": activity_type}),
+            }
+            current -= timedelta(hours=rng.randint(12, 60))
+
+
+def query_args(params):
+    """search_activities() arguments for the endpoint's query parameters."""
+    return {
+        "query": params["q"],
+        "activity_type": params.get("type"),
+        "after": datetime.strptime(params["after"], '%Y-%m-%d') if "after" in params else None,
+        "before": datetime.strptime(params["before"], '%Y-%m-%d') + timedelta(days=1) if "before" in params else None,
+        "page": params.get("page", 1),
+    }
+
+
+def like_scan(main, user_id, params):
+    """The same search as a LIKE scan: the fallback for databases without an index."""
+    from models import Activity
+    results = Activity.query.filter(Activity.user_id == user_id)
+    for term in params["q"].lower().split():
+        results = results.filter(main.db.or_(Activity.name.ilike(f"%{term}%"), Activity.description.ilike(f"%{term}%")))
+    if "type" in params:
+        results = results.filter(Activity.type == params["type"])
+    if "after" in params:
+        results = results.filter(Activity.start_date >= datetime.strptime(params["after"], '%Y-%m-%d'))
+    if "before" in params:
+        results = results.filter(Activity.start_date < datetime.strptime(params["before"], '%Y-%m-%d') + timedelta(days=1))
+    page = params.get("page", 1)
+    return results.order_by(Activity.start_date.desc()).offset((page - 1) * 20).limit(21).all()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Activity search latency")
+    parser.add_argument("--activities", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200, help="queries timed per shape")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/search-<timestamp>.json)")
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix="runhub-search-"), "bench.db")
+    main = setup_app(database_path)
+    from models import User, Activity
+    from search import search_activities
+    rng = random.Random(args.seed)
+
+    with main.app.app_context():
+        user_ids = [100000 + index for index in range(args.users)]
+        main.db.session.add_all([User(id=user_id, firstname="Bench", lastname="User", access_token="bench")
+                                 for user_id in user_ids])
+        main.db.session.commit()
+
+        # Inserted through the ORM so the index triggers do the indexing, as in a sync
+        start = time.perf_counter()
+        batch = []
+        for row in generate_rows(rng, args.activities, args.users):
+            batch.append(row)
+            if len(batch) >= 5000:
+                main.db.session.bulk_insert_mappings(Activity, batch)
+                batch = []
+        if batch:
+            main.db.session.bulk_insert_mappings(Activity, batch)
+        main.db.session.commit()
+        insert_seconds = time.perf_counter() - start
+        indexed = main.db.session.execute(main.db.text("SELECT count(*) FROM activity_search")).scalar()
+    print(f"Inserted and indexed {indexed} activities in {insert_seconds:.1f}s")
+
+    client = main.app.test_client()
+    results = {"insert": {"activities": indexed, "seconds": round(insert_seconds, 2),
+                          "activities_per_s": round(indexed / insert_seconds, 1)}}
+    for label, params in QUERIES:
+        endpoint_latencies, search_latencies, scan_latencies, hits = [], [], [], 0
+        for iteration in range(args.iterations):
+            user_id = user_ids[iteration % len(user_ids)]
+            start = time.perf_counter()
+            response = client.get(f"/api/activities/{user_id}/search", query_string=params)
+            endpoint_latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            hits += len(response.get_json()["results"])
+
+            with main.app.app_context():
+                start = time.perf_counter()
+                search_activities(user_id, **query_args(params))
+                search_latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                like_scan(main, user_id, params)
+                scan_latencies.append(time.perf_counter() - start)
+        results[label] = {
+            "params": params,
+            "results_per_op": round(hits / args.iterations, 1),
+            "endpoint": summarize(endpoint_latencies),
+            "search": summarize(search_latencies),
+            "like_scan": summarize(scan_latencies),
+        }
+        print(f"{label}: endpoint p50 {results[label]['endpoint']['p50_ms']} ms, search p50 {results[label]['search']['p50_ms']} ms, "
+              f"LIKE scan p50 {results[label]['like_scan']['p50_ms']} ms")
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"search-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,137 @@
+"""Sign-up history load: Strava API import vs `flask import-archive` from a bulk export.
+
+Builds a Strava-style export archive (activities.csv + gzipped GPX tracks at roughly one
+point per second) for one synthetic athlete, then loads the same history three ways, each
+in a fresh process and database: through the fake API, and from the archive with one and
+with several parsing processes.
+
+Usage (from server/):
+    python bench/archive.py --runs 5000 --workers 4
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from run import RESULTS_DIR, setup_app, git_revision
+from synthetic import decode_polyline
+
+CSV_HEADER = [
+    "Activity ID", "Activity Date", "Activity Name", "Activity Type", "Activity Description",
+    "Elapsed Time", "Distance", "Filename", "Elapsed Time", "Moving Time", "Distance",
+    "Elevation Gain",
+]
+
+
+def gpx_for(activity):
+    """GPX track interpolated to one point per second of moving time."""
+    route = decode_polyline(activity["map"]["summary_polyline"])
+    per_segment = max(activity["moving_time"] // max(len(route) - 1, 1), 1)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<gpx version="1.1" creator="RunHub bench" xmlns="http://www.topografix.com/GPX/1/1">',
+             f'<trk><name>{activity["name"]}</name><trkseg>']
+    for (lat1, lng1), (lat2, lng2) in zip(route, route[1:]):
+        for step in range(per_segment):
+            fraction = step / per_segment
+            lines.append(f'<trkpt lat="{lat1 + (lat2 - lat1) * fraction:.6f}" lon="{lng1 + (lng2 - lng1) * fraction:.6f}"></trkpt>')
+    lines.append('</trkseg></trk></gpx>')
+    return "\n".join(lines).encode()
+
+
+def build_archive(path, activities):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        rows = io.StringIO()
+        writer = csv.writer(rows)
+        writer.writerow(CSV_HEADER)
+        for activity in activities:
+            filename = f"activities/{activity['id']}.gpx.gz"
+            start_date = datetime.strptime(activity["start_date"], '%Y-%m-%dT%H:%M:%SZ')
+            writer.writerow([
+                activity["id"], start_date.strftime("%b %d, %Y, %I:%M:%S %p"), activity["name"],
+                activity["type"], "", activity["elapsed_time"], f"{activity['distance'] / 1000:.2f}",
+                filename, activity["elapsed_time"], activity["moving_time"], activity["distance"],
+                activity["total_elevation_gain"],
+            ])
+            archive.writestr(filename, gzip.compress(gpx_for(activity), compresslevel=1))
+        archive.writestr("activities.csv", rows.getvalue())
+
+
+def load_worker(mode, workers, latency, archive_path, dataset_args):
+    """Load the history into a fresh database. Runs in its own process, one per mode."""
+    main = setup_app(os.path.join(tempfile.mkdtemp(prefix=f"runhub-archive-{mode}-"), "bench.db"))
+    from synthetic import generate_dataset
+    from fake_strava import FakeStravaAdapter
+    from models import User, Activity
+    from strava_sync import strava_http
+
+    dataset = generate_dataset(**dataset_args)
+    adapter = FakeStravaAdapter(dataset, latency=latency)
+    strava_http.mount("https://www.strava.com", adapter)
+    user_id = next(iter(dataset))
+
+    start = time.perf_counter()
+    if mode == "api":
+        response = main.app.test_client().get(f"/callback?code={user_id}")
+        assert "error" not in response.location, response.location
+    else:
+        with main.app.app_context():
+            main.db.session.add(User(id=user_id, firstname="Bench", lastname="User", access_token="bench"))
+            main.db.session.commit()
+        result = main.app.test_cli_runner().invoke(args=[
+            "import-archive", archive_path, "--user-id", str(user_id), "--workers", str(workers)
+        ])
+        assert result.exit_code == 0, result.output
+    elapsed = time.perf_counter() - start
+
+    with main.app.app_context():
+        stored = Activity.query.filter_by(user_id=user_id).count()
+    return {"seconds": round(elapsed, 2), "runs_stored": stored, "runs_per_s": round(stored / elapsed, 1),
+            "strava_calls": adapter.calls}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="API import vs bulk-export archive import")
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Strava latency per call (s)")
+    parser.add_argument("--out", help="results file (default bench/results/archive-<timestamp>.json)")
+    args = parser.parse_args()
+
+    from synthetic import generate_dataset
+    dataset_args = {"users": 1, "runs": args.runs, "seed": args.seed, "end_date": datetime(2025, 11, 1, 7, 0, 0)}
+    _, activities = next(iter(generate_dataset(**dataset_args).values()))
+
+    archive_path = os.path.join(tempfile.mkdtemp(prefix="runhub-archive-"), "export.zip")
+    start = time.perf_counter()
+    build_archive(archive_path, activities)
+    print(f"Built {os.path.getsize(archive_path) / 1e6:.1f} MB archive in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for mode, workers in [("api", 0), ("archive-1", 1), (f"archive-{args.workers}", args.workers)]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[mode] = pool.submit(load_worker, mode, workers, args.latency, archive_path, dataset_args).result()
+        print(f"{mode}: {json.dumps(results[mode])}")
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"archive-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
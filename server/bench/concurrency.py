@@ -0,0 +1,140 @@
+"""Load test comparing sync and gevent gunicorn workers on I/O-bound endpoints.
+
+Imports synthetic users into a SQLite file, then for each worker class starts a single
+gunicorn worker serving bench/fake_server.py (fake Strava with simulated latency) and fires
+concurrent requests at it, reporting throughput and peak in-flight requests per process.
+
+Usage (from server/):
+    python bench/concurrency.py --requests 60 --concurrency 20 --latency 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from run import BENCH_DIR, RESULTS_DIR, SERVER_DIR, setup_app, bench_import, summarize, git_revision
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/bench/inflight", timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start at {base_url}")
+
+
+def fire(base_url, paths, concurrency):
+    def request(path):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(f"{base_url}{path}", timeout=120) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = None
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(request, paths))
+    wall = time.perf_counter() - start
+    return wall, outcomes
+
+
+def run_worker_class(worker_class, args, env, paths, port):
+    env = {**env, "WEB_WORKER_CLASS": worker_class, "WEB_CONCURRENCY": "1", "PORT": str(port)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--pythonpath", BENCH_DIR, "fake_server:app"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_server(base_url)
+        wall, outcomes = fire(base_url, paths, args.concurrency)
+        with urllib.request.urlopen(f"{base_url}/bench/inflight") as response:
+            in_flight = json.load(response)
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for latency, _ in outcomes]
+    summary = summarize(latencies)
+    summary["wall_s"] = round(wall, 3)
+    summary["requests_per_s"] = round(len(paths) / wall, 2)
+    summary["errors"] = sum(1 for _, status in outcomes if status != 200)
+    summary["peak_in_flight_per_process"] = in_flight["peak"]
+    return summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Sync vs gevent worker load test")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated Strava latency per call (s)")
+    parser.add_argument("--path", default="/api/refresh/{user_id}", help="endpoint template to load")
+    parser.add_argument("--worker-classes", default="sync,gevent")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--out", help="results file (default bench/results/concurrency-<timestamp>.json)")
+    args = parser.parse_args()
+
+    end_date = datetime.utcnow().strftime('%Y-%m-%d')
+    env = {
+        **os.environ,
+        "BENCH_USERS": str(args.users),
+        "BENCH_RUNS": str(args.runs),
+        "BENCH_SEED": str(args.seed),
+        "BENCH_END_DATE": end_date,
+        "BENCH_STRAVA_LATENCY": str(args.latency),
+    }
+
+    # Import the dataset once; gunicorn workers then serve from the same file
+    database_path = os.path.join(tempfile.mkdtemp(prefix="runhub-concurrency-"), "bench.db")
+    main = setup_app(database_path)
+    env["DATABASE_URL"] = os.environ["DATABASE_URL"]
+
+    from synthetic import generate_dataset
+    from fake_strava import FakeStravaAdapter
+    from profiling import profile_queries
+    from strava_sync import strava_http
+    dataset = generate_dataset(users=args.users, runs=args.runs, seed=args.seed,
+                               end_date=datetime.strptime(end_date, '%Y-%m-%d') + timedelta(hours=7))
+    strava_http.mount("https://www.strava.com", FakeStravaAdapter(dataset))
+    bench_import(main, dataset, profile_queries)
+    with main.app.app_context():
+        main.db.engine.dispose()
+
+    user_ids = list(dataset)
+    paths = [args.path.format(user_id=user_ids[i % len(user_ids)]) for i in range(args.requests)]
+
+    results = {}
+    for worker_class in args.worker_classes.split(","):
+        results[worker_class] = run_worker_class(worker_class, args, env, paths, args.port)
+        print(f"{worker_class}: {json.dumps(results[worker_class])}")
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"concurrency-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,114 @@
+"""No pooled DB connection is held while a request waits on Strava.
+
+The fake Strava adapter records how many connections the app's pool has checked out at
+the moment each call arrives; every flow that calls Strava must show zero. Flows: the
+OAuth callback (full and incremental imports, several pages each), refresh in both
+modes, a refresh whose token has expired, the first splits request (streams fetch) and
+the backfill-history CLI.
+
+Usage (from server/):
+    python bench/connection_release.py --users 2 --runs 500
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from run import RESULTS_DIR, setup_app, git_revision
+from fake_strava import FakeStravaAdapter
+
+
+class PoolCheckingAdapter(FakeStravaAdapter):
+    """Notes the pool's checked-out connection count at each call."""
+
+    def __init__(self, dataset, pool):
+        super().__init__(dataset)
+        self.pool = pool
+        self.held = []  # [(path, connections checked out)]
+
+    def send(self, request, **kwargs):
+        self.held.append((request.path_url.split("?")[0], self.pool.checkedout()))
+        return super().send(request, **kwargs)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Connection release around Strava calls")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=500, help="activities per user; over 200 makes imports page")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/connection-release-<timestamp>.json)")
+    args = parser.parse_args()
+
+    main = setup_app(os.path.join(tempfile.mkdtemp(prefix="runhub-release-"), "bench.db"))
+    from synthetic import generate_dataset, generate_activity
+    from strava_sync import strava_http
+    from models import Activity, User, UserSyncStatus
+
+    dataset = generate_dataset(users=args.users, runs=args.runs, seed=args.seed)
+    with main.app.app_context():
+        adapter = PoolCheckingAdapter(dataset, main.db.engine.pool)
+    strava_http.mount("https://www.strava.com", adapter)
+    client = main.app.test_client()
+    runner = main.app.test_cli_runner()
+    checks = []
+
+    def check(name, ok, **details):
+        checks.append({"check": name, "ok": bool(ok), **details})
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {details if details else ''}")
+
+    def run_flow(name, call):
+        adapter.held.clear()
+        call()
+        held = [entry for entry in adapter.held if entry[1]]
+        check(f"{name}: no connection held during Strava calls", adapter.held and not held,
+              calls=len(adapter.held), held=held[:5])
+
+    user_id = next(iter(dataset))
+    user, activities = dataset[user_id]
+    hidden = activities[:250]
+    del activities[:250]
+    run_flow("callback, full import", lambda: client.get(f"/callback?code={user_id}"))
+    activities[:0] = hidden
+    run_flow("callback, incremental import", lambda: client.get(f"/callback?code={user_id}"))
+
+    rng = random.Random(args.seed)
+    newest = datetime.strptime(activities[0]["start_date"], '%Y-%m-%dT%H:%M:%SZ')
+    activities.insert(0, generate_activity(rng, user, user_id * 100000 + 90000, newest + timedelta(days=1)))
+    run_flow("refresh, verify", lambda: client.get(f"/api/refresh/{user_id}?verify=1&activities=0"))
+    activities.insert(0, generate_activity(rng, user, user_id * 100000 + 90001, newest + timedelta(days=2)))
+    run_flow("refresh, incremental", lambda: client.get(f"/api/refresh/{user_id}?activities=0"))
+
+    with main.app.app_context():
+        main.db.session.get(User, user_id).token_expires_at = 1
+        main.db.session.commit()
+    run_flow("refresh, expired token", lambda: client.get(f"/api/refresh/{user_id}?activities=0"))
+    check("expired token was exchanged", "/oauth/token" in [path for path, _ in adapter.held])
+
+    with main.app.app_context():
+        activity_id = main.db.session.query(Activity.id).filter_by(user_id=user_id).first()[0]
+    run_flow("splits, first request", lambda: client.get(f"/api/activities/{activity_id}/splits"))
+
+    with main.app.app_context():
+        main.db.session.query(UserSyncStatus).update({UserSyncStatus.backfill_completed_at: None})
+        main.db.session.commit()
+    run_flow("backfill-history", lambda: runner.invoke(args=["backfill-history", "--user-id", str(user_id)]))
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": {"checks": checks},
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"connection-release-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    failed = [entry["check"] for entry in checks if not entry["ok"]]
+    if failed:
+        raise SystemExit("Connection release checks failed:\n" + "\n".join(failed))
+
+
+if __name__ == "__main__":
+    main_cli()
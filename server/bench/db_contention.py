@@ -0,0 +1,251 @@
+"""Concurrent refresh benchmark against one SQLite file, prior vs tuned engine settings.
+
+Each "worker" is a separate process (like a gunicorn sync worker) refreshing its own users
+against the same database file. Profiles:
+
+- prior: what the app ran before db_config set pragmas, i.e. pysqlite's defaults (rollback
+  journal, synchronous=FULL, 5s busy wait, 2 MB page cache);
+- tuned: the db_config defaults (WAL, synchronous=NORMAL, 15s busy wait).
+
+Scenarios:
+
+- steady: --writers threads per process also open a write transaction every --gap-ms and
+  keep it open for --hold-ms (a long sync batch);
+- long-writer: one connection holds a write transaction for --long-hold-s while the
+  refreshes start, as VACUUM or a long CLI batch does. Between the two busy waits (5s and
+  15s), the prior profile's refreshes give up with "database is locked" and the tuned
+  ones wait it out.
+
+Lock errors are counted for refreshes and held writes alike; each scenario compares tuned
+with prior. Refresh errors beyond lock_errors are bare 500s: the error handler's own
+sync-status write hit the lock too. A profile that fails fast can post more refreshes per
+second than one that waits, so read throughput together with the errors.
+
+Usage (from server/):
+    python bench/db_contention.py --processes 4 --rounds 5 --writers 1 --hold-ms 20 --gap-ms 200 --long-hold-s 7
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from run import BENCH_DIR, RESULTS_DIR, SERVER_DIR, summarize, git_revision
+
+PROFILES = {
+    # pysqlite's defaults, which applied while main.py only set SQLALCHEMY_DATABASE_URI
+    "prior": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_BUSY_TIMEOUT_MS": "5000",
+              "SQLITE_CACHE_SIZE_KB": "2000"},
+    "tuned": {},  # db_config defaults: WAL, synchronous=NORMAL, 15s busy timeout
+}
+SCENARIOS = ("steady", "long-writer")
+
+
+def load_app(settings, database_path):
+    os.environ.update(settings)
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    sys.path.insert(0, SERVER_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    import main
+    return main
+
+
+def hold_writes(engine, user_ids, hold, gap, stop, outcome):
+    """Until `stop` is set: bump a sync row, keep the write transaction open for `hold` seconds, wait `gap`."""
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    rng = random.Random()
+    while not stop.is_set():
+        try:
+            with engine.begin() as connection:
+                connection.execute(text("UPDATE user_sync_status SET sync_count = sync_count + 1 WHERE user_id = :user_id"),
+                                   {"user_id": rng.choice(user_ids)})
+                time.sleep(hold)
+            outcome["writes"] += 1
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            outcome["lock_errors"] += 1
+        time.sleep(gap)
+
+
+def hold_long_write(database_path, user_id, ready, hold):
+    """Once every worker is `ready`, take the write lock and keep it for `hold` seconds."""
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    ready.wait()
+    connection.execute("BEGIN IMMEDIATE")
+    connection.execute("UPDATE user_sync_status SET sync_count = sync_count + 1 WHERE user_id = ?", (user_id,))
+    time.sleep(hold)
+    connection.execute("COMMIT")
+    connection.close()
+
+
+def refresh_worker(settings, database_path, dataset_args, user_ids, rounds, ready, writers, hold, gap):
+    main = load_app(settings, database_path)
+    from synthetic import generate_dataset
+    from fake_strava import FakeStravaAdapter
+    from strava_sync import strava_http
+    strava_http.mount("https://www.strava.com", FakeStravaAdapter(generate_dataset(**dataset_args)))
+
+    client = main.app.test_client()
+    latencies = []
+    errors = 0
+    lock_errors = 0
+    with main.app.app_context():
+        engine = main.db.engine
+
+    # Start every process at the same moment to maximize contention
+    ready.wait()
+    time.sleep(0.5)
+    started_at = time.time()
+    stop = threading.Event()
+    writes = [{"writes": 0, "lock_errors": 0} for _ in range(writers)]
+    threads = [threading.Thread(target=hold_writes, args=(engine, user_ids, hold, gap, stop, outcome)) for outcome in writes]
+    for thread in threads:
+        thread.start()
+    for _ in range(rounds):
+        for user_id in user_ids:
+            start = time.perf_counter()
+            response = client.get(f"/api/refresh/{user_id}")
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+                if "locked" in response.get_data(as_text=True):
+                    lock_errors += 1
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, lock_errors, started_at, time.time(), writes
+
+
+def run_profile(name, settings, scenario, args, dataset_args):
+    database_path = os.path.join(tempfile.mkdtemp(prefix=f"runhub-contention-{name}-"), "bench.db")
+
+    # Import every user once in this process, then hand the file to the workers
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        pool.apply(import_worker, (settings, database_path, dataset_args))
+
+    from synthetic import generate_dataset
+    user_ids = list(generate_dataset(**dataset_args))
+    shards = [user_ids[i::args.processes] for i in range(args.processes)]
+
+    manager = context.Manager()
+    ready = manager.Barrier(args.processes + 1)
+    writers = args.writers
+    if scenario == "long-writer":
+        # Lock taken just before the first refreshes arrive; no short writers on top
+        writers = 0
+        holder = threading.Thread(target=hold_long_write, args=(database_path, user_ids[0], ready, args.long_hold_s))
+    else:
+        holder = threading.Thread(target=ready.wait)
+    holder.start()
+    with context.Pool(args.processes) as pool:
+        outcomes = pool.starmap(refresh_worker, [
+            (settings, database_path, dataset_args, shard, args.rounds, ready, writers, args.hold_ms / 1000,
+             args.gap_ms / 1000)
+            for shard in shards
+        ])
+    holder.join()
+    manager.shutdown()
+    wall = max(outcome[4] for outcome in outcomes) - min(outcome[3] for outcome in outcomes)
+
+    latencies = [latency for outcome in outcomes for latency in outcome[0]]
+    writes = [write for outcome in outcomes for write in outcome[5]]
+    summary = summarize(latencies)
+    summary["errors"] = sum(outcome[1] for outcome in outcomes)
+    summary["lock_errors"] = sum(outcome[2] for outcome in outcomes)
+    summary["refreshes_per_s"] = round(len(latencies) / wall, 2)
+    summary["held_writes"] = sum(outcome["writes"] for outcome in writes)
+    summary["held_write_lock_errors"] = sum(outcome["lock_errors"] for outcome in writes)
+    return summary
+
+
+def compare_profiles(results):
+    """Each profile's errors and throughput against the first profile run."""
+    names = list(results)
+    base = results[names[0]]
+    return {
+        name: {
+            "vs": names[0],
+            "errors": f"{base['errors']} -> {results[name]['errors']}",
+            "lock_errors": f"{base['lock_errors']} -> {results[name]['lock_errors']}",
+            "held_write_lock_errors": f"{base['held_write_lock_errors']} -> {results[name]['held_write_lock_errors']}",
+            "refreshes_per_s_ratio": round(results[name]["refreshes_per_s"] / base["refreshes_per_s"], 2)
+            if base["refreshes_per_s"] else None,
+        }
+        for name in names[1:]
+    }
+
+
+def import_worker(settings, database_path, dataset_args):
+    main = load_app(settings, database_path)
+    from synthetic import generate_dataset
+    from fake_strava import FakeStravaAdapter
+    from strava_sync import strava_http
+    from profiling import profile_queries
+    from run import bench_import
+
+    dataset = generate_dataset(**dataset_args)
+    strava_http.mount("https://www.strava.com", FakeStravaAdapter(dataset))
+    with main.app.app_context():
+        main.db.create_all()
+    bench_import(main, dataset, profile_queries)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="SQLite write contention benchmark")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--writers", type=int, default=1, help="threads per process holding write transactions")
+    parser.add_argument("--hold-ms", type=float, default=20, help="how long each held write transaction stays open")
+    parser.add_argument("--gap-ms", type=float, default=200, help="pause between a writer's transactions")
+    parser.add_argument("--long-hold-s", type=float, default=7, help="long-writer scenario: seconds the lock is held")
+    parser.add_argument("--profiles", default="prior,tuned")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--out", help="results file (default bench/results/contention-<timestamp>.json)")
+    args = parser.parse_args()
+
+    dataset_args = {
+        "users": args.users,
+        "runs": args.runs,
+        "seed": args.seed,
+        "end_date": datetime.strptime(datetime.utcnow().strftime('%Y-%m-%d'), '%Y-%m-%d') + timedelta(hours=7),
+    }
+
+    results = {}
+    comparison = {}
+    for scenario in args.scenarios.split(","):
+        results[scenario] = {}
+        for name in args.profiles.split(","):
+            results[scenario][name] = run_profile(name, PROFILES[name], scenario, args, dataset_args)
+            print(f"{scenario} {name}: {json.dumps(results[scenario][name])}")
+        comparison[scenario] = compare_profiles(results[scenario])
+        for name, difference in comparison[scenario].items():
+            print(f"{scenario} {name} vs {difference['vs']}: {json.dumps(difference)}")
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(),
+                 "args": vars(args), "profiles": PROFILES},
+        "results": results,
+        "comparison": comparison,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"contention-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,51 @@
+"""WSGI entry point serving RunHub against the fake Strava API, for load tests under gunicorn.
+
+The dataset is regenerated from the same BENCH_* settings the driver used, so it matches
+what was imported into the database.
+"""
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from flask import jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fake_strava import FakeStravaAdapter
+from synthetic import generate_dataset
+from strava_sync import strava_http
+
+dataset = generate_dataset(
+    users=int(os.environ["BENCH_USERS"]),
+    runs=int(os.environ["BENCH_RUNS"]),
+    seed=int(os.environ["BENCH_SEED"]),
+    end_date=datetime.strptime(os.environ["BENCH_END_DATE"], '%Y-%m-%d') + timedelta(hours=7)
+)
+strava_http.mount("https://www.strava.com", FakeStravaAdapter(
+    dataset, latency=float(os.environ.get("BENCH_STRAVA_LATENCY", 0.2))
+))
+
+app = main.app
+
+# Track how many requests this process has in flight at once
+in_flight = {"current": 0, "peak": 0}
+in_flight_lock = threading.Lock()
+
+
+@app.before_request
+def enter_request():
+    with in_flight_lock:
+        in_flight["current"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+
+
+@app.teardown_request
+def exit_request(exc):
+    with in_flight_lock:
+        in_flight["current"] -= 1
+
+
+@app.route("/bench/inflight")
+def get_in_flight():
+    return jsonify({**in_flight, "pid": os.getpid()})
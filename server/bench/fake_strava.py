@@ -0,0 +1,105 @@
+"""In-process fake of the Strava endpoints RunHub calls, mounted as a requests adapter."""
+import json
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from synthetic import generate_streams
+
+
+class FakeStravaAdapter(BaseAdapter):
+    """Serves /oauth/token, /api/v3/athlete/activities and activity streams from a generated dataset.
+
+    Mount it on the app's Strava session:
+        strava_sync.strava_http.mount("https://www.strava.com", FakeStravaAdapter(dataset))
+    """
+
+    def __init__(self, dataset, latency=0.0):
+        super().__init__()
+        self.dataset = dataset  # {user_id: (user, [activities newest first])}
+        self.latency = latency  # simulated network latency per call, in seconds
+        self.calls = 0
+
+    @staticmethod
+    def token_for(user_id):
+        return f"bench-token-{user_id}"
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(request.url)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/oauth/token":
+            body = parse_qs(request.body if isinstance(request.body, str) else (request.body or b"").decode())
+            return self.token_response(request, body)
+        if url.path == "/api/v3/athlete/activities":
+            return self.activities_response(request, query)
+        if url.path.startswith("/api/v3/activities/") and url.path.endswith("/streams"):
+            return self.streams_response(request, int(url.path.split("/")[4]))
+        return self.build_response(request, 404, {"message": "Record Not Found"})
+
+    def token_response(self, request, body):
+        code = body.get("code", [None])[0] or body.get("refresh_token", [""])[0].replace("refresh-", "")
+        try:
+            user_id = int(code)
+        except ValueError:
+            return self.build_response(request, 400, {"message": "Bad Request"})
+        if user_id not in self.dataset:
+            return self.build_response(request, 400, {"message": "Bad Request"})
+
+        user = self.dataset[user_id][0]
+        return self.build_response(request, 200, {
+            "token_type": "Bearer",
+            "access_token": self.token_for(user_id),
+            "refresh_token": f"refresh-{user_id}",
+            "expires_at": int(time.time()) + 6 * 3600,
+            "athlete": {key: user[key] for key in ("id", "username", "firstname", "lastname", "profile")}
+        })
+
+    def activities_response(self, request, query):
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        user_id = int(token.rsplit("-", 1)[-1]) if token.startswith("bench-token-") else None
+        if user_id not in self.dataset:
+            return self.build_response(request, 401, {"message": "Authorization Error"})
+
+        activities = self.dataset[user_id][1]
+        after = int(query["after"]) if "after" in query else None
+        before = int(query["before"]) if "before" in query else None
+        if after is not None or before is not None:
+            def epoch(activity):
+                return int((datetime.strptime(activity["start_date"], '%Y-%m-%dT%H:%M:%SZ') - datetime(1970, 1, 1)).total_seconds())
+            activities = [a for a in activities
+                          if (after is None or epoch(a) > after) and (before is None or epoch(a) < before)]
+            # Strava returns oldest first when only 'after' is given
+            if after is not None and before is None:
+                activities = list(reversed(activities))
+
+        per_page = min(int(query.get("per_page", 30)), 200)
+        page = int(query.get("page", 1))
+        return self.build_response(request, 200, activities[(page - 1) * per_page:page * per_page])
+
+    def streams_response(self, request, activity_id):
+        user_id = activity_id // 100000
+        activity = next((a for a in self.dataset.get(user_id, (None, []))[1] if a["id"] == activity_id), None)
+        if activity is None:
+            return self.build_response(request, 404, {"message": "Record Not Found"})
+        return self.build_response(request, 200, generate_streams(activity))
+
+    @staticmethod
+    def build_response(request, status, payload):
+        response = Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode()
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
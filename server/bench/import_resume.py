@@ -0,0 +1,110 @@
+"""Checkpointed import correctness: stored activities match Strava after interrupted imports.
+
+Each athlete's newest --new activities are hidden from the fake API for the first login,
+then appear (more than one page of them) before a second login. The second import is cut
+off by Strava errors after --fail-after pages and resumed by a third login. After every
+login the activities stored must equal what the fake API holds, and the import must be
+marked complete only when they do. A full first import is interrupted the same way.
+
+Usage (from server/):
+    python bench/import_resume.py --users 2 --runs 800 --new 450
+"""
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from run import RESULTS_DIR, setup_app, git_revision
+from fake_strava import FakeStravaAdapter
+
+
+class FlakyStravaAdapter(FakeStravaAdapter):
+    """Fails activity list calls with a 500 once `fail_after` of them have succeeded, until reset."""
+
+    def __init__(self, dataset):
+        super().__init__(dataset)
+        self.fail_after = None
+
+    def activities_response(self, request, query):
+        if self.fail_after is not None:
+            if self.fail_after <= 0:
+                return self.build_response(request, 500, {"message": "Internal Server Error"})
+            self.fail_after -= 1
+        return super().activities_response(request, query)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Checkpointed import correctness")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=800)
+    parser.add_argument("--new", type=int, default=450, help="activities that appear between logins")
+    parser.add_argument("--fail-after", type=int, default=1, help="pages stored before Strava starts failing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/import-resume-<timestamp>.json)")
+    args = parser.parse_args()
+
+    main = setup_app(os.path.join(tempfile.mkdtemp(prefix="runhub-import-"), "bench.db"))
+    from synthetic import generate_dataset
+    from strava_sync import strava_http
+    from models import Activity
+    from sync_scheduler import get_sync_state
+
+    dataset = generate_dataset(users=args.users, runs=args.runs, seed=args.seed)
+    adapter = FlakyStravaAdapter(dataset)
+    strava_http.mount("https://www.strava.com", adapter)
+    client = main.app.test_client()
+    checks = []
+
+    def check(name, ok, **details):
+        checks.append({"check": name, "ok": bool(ok), **details})
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {details if details else ''}")
+
+    def login(user_id, fail_after=None):
+        adapter.fail_after = fail_after
+        client.get(f"/callback?code={user_id}")
+        adapter.fail_after = None
+        with main.app.app_context():
+            stored = Activity.query.filter_by(user_id=user_id).count()
+            status = get_sync_state(user_id).import_status
+        return stored, status
+
+    for index, user_id in enumerate(dataset):
+        activities = dataset[user_id][1]
+        hidden = activities[:args.new]
+        del activities[:args.new]
+
+        if index % 2:
+            # Full history import cut short, then resumed
+            stored, status = login(user_id, fail_after=args.fail_after)
+            check(f"user {user_id}: interrupted full import is not complete",
+                  status == "failed" and stored < len(activities), stored=stored, status=status)
+        stored, status = login(user_id)
+        check(f"user {user_id}: full import", stored == len(activities) and status == "complete",
+              stored=stored, expected=len(activities), status=status)
+
+        activities[:0] = hidden
+        stored, status = login(user_id, fail_after=args.fail_after)
+        check(f"user {user_id}: interrupted incremental import is not complete",
+              status == "failed" and stored < len(activities), stored=stored, status=status)
+        stored, status = login(user_id)
+        check(f"user {user_id}: resumed incremental import", stored == len(activities) and status == "complete",
+              stored=stored, expected=len(activities), status=status)
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": {"checks": checks},
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"import-resume-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    failed = [entry["check"] for entry in checks if not entry["ok"]]
+    if failed:
+        raise SystemExit("Import checks failed:\n" + "\n".join(failed))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,186 @@
+"""Read-replica routing and lag tolerance, with two SQLite files.
+
+The replica is a second database file that only changes when replicate() copies the
+primary into it (SQLite's online backup), so replication lag is whatever the harness
+leaves between copies. Every SQL statement is counted per engine, and each check fails
+the run if it doesn't hold:
+
+- read-only GETs run entirely on the replica; writes and @primary_only GETs (the OAuth
+  callback, /api/refresh) entirely on the primary;
+- a GET that writes (a first /api/summary) moves to the primary and reads its own write;
+- after a refresh, reads passing ?min_seq=<changeSeq> fall back to the primary until the
+  replica has caught up, while reads without it see the replica's older data;
+- a user who signed up after the last copy is still found.
+
+Usage (from server/):
+    python bench/replica.py --users 3 --runs 200
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+from run import RESULTS_DIR, setup_app, git_revision
+
+
+def replicate(primary_path, replica_path):
+    """Bring the replica up to date with the primary, as a streaming replica eventually would."""
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+
+
+class StatementCounter:
+    """SQL statements executed per engine, for the request in hand."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.counts = {name: 0 for name in engines}
+        for name, engine in engines.items():
+            event.listen(engine, "before_cursor_execute", self.listener(name))
+
+    def listener(self, name):
+        def count(*args):
+            self.counts[name] += 1
+        return count
+
+    def request(self, client, url):
+        for name in self.counts:
+            self.counts[name] = 0
+        response = client.get(url)
+        return response, dict(self.counts)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Read-replica routing check")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/replica-<timestamp>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="runhub-replica-")
+    primary_path, replica_path = os.path.join(workdir, "primary.db"), os.path.join(workdir, "replica.db")
+    os.environ["DATABASE_REPLICA_URL"] = f"sqlite:///{replica_path}"
+    main = setup_app(primary_path)
+    replicate(primary_path, replica_path)
+
+    from synthetic import generate_dataset, generate_activity
+    from fake_strava import FakeStravaAdapter
+    from strava_sync import strava_http
+    from models import UserSummary
+    from db_config import REPLICA_BIND
+    from cache import user_cache
+
+    dataset = generate_dataset(users=args.users + 1, runs=args.runs, seed=args.seed)
+    strava_http.mount("https://www.strava.com", FakeStravaAdapter(dataset))
+    user_ids = list(dataset)
+    late_user = user_ids.pop()  # signs up after the last copy
+    client = main.app.test_client()
+    checks = []
+
+    def check(name, ok, **details):
+        checks.append({"check": name, "ok": bool(ok), **details})
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {details if details else ''}")
+
+    with main.app.app_context():
+        counter = StatementCounter({"primary": main.db.engines[None], "replica": main.db.engines[REPLICA_BIND]})
+
+    for user_id in user_ids:
+        response, counts = counter.request(client, f"/callback?code={user_id}")
+        check(f"callback {user_id} on primary", response.status_code == 302 and counts["replica"] == 0, counts=counts)
+    replicate(primary_path, replica_path)
+
+    user_id = user_ids[0]
+    user_cache.invalidate(user_id)  # profiles were cached by the callback
+    for url in [f"/api/athlete/{user_id}", f"/api/activities/{user_id}", f"/api/activities/{user_id}/changes",
+                f"/api/summary/{user_id}", f"/api/calendar/{user_id}", f"/api/badges/{user_id}",
+                f"/api/routes/{user_id}", f"/api/activities/{user_id}/search?q=run",
+                "/api/leaderboards/all/distance"]:
+        response, counts = counter.request(client, url)
+        check(f"GET {url} on replica", response.status_code == 200 and counts["primary"] == 0 and counts["replica"] > 0,
+              counts=counts)
+    before_seq = client.get(f"/api/activities/{user_id}/changes").get_json()["seq"]
+
+    # New uploads since the copy, synced on the primary
+    rng = random.Random(args.seed)
+    user, activities = dataset[user_id]
+    newest = datetime.strptime(activities[0]["start_date"], '%Y-%m-%dT%H:%M:%SZ')
+    new_ids = []
+    for offset in range(3):
+        activities.insert(0, generate_activity(rng, user, user_id * 100000 + 90000 + offset, newest + timedelta(days=offset + 1)))
+        new_ids.append(activities[0]["id"])
+    response, counts = counter.request(client, f"/api/refresh/{user_id}?activities=0")
+    change_seq = response.get_json()["changeSeq"]
+    check("refresh on primary", response.status_code == 200 and counts["replica"] == 0 and change_seq > before_seq,
+          counts=counts, change_seq=change_seq)
+
+    def changed_ids(body):
+        return {change["id"] for change in body["changes"]}
+
+    response, counts = counter.request(client, f"/api/activities/{user_id}/changes?since={before_seq}")
+    body = response.get_json()
+    check("lagging replica serves reads without min_seq", counts["primary"] == 0 and body["seq"] == before_seq,
+          counts=counts, seq=body["seq"])
+    response, counts = counter.request(client, f"/api/activities/{user_id}/changes?since={before_seq}&min_seq={change_seq}")
+    body = response.get_json()
+    check("min_seq falls back to primary while replica lags",
+          counts["primary"] > 0 and body["seq"] == change_seq and set(new_ids) <= changed_ids(body), counts=counts)
+    response, counts = counter.request(client, f"/api/activities/{user_id}?min_seq={change_seq}")
+    check("min_seq fallback on the activity list", counts["primary"] > 0 and len(response.get_json()) == len(
+        [a for a in activities if a["type"] == "Run"]), counts=counts)
+    response, counts = counter.request(client, f"/api/activities/{user_id}/changes?since={change_seq}")
+    check("since ahead of replica falls back to primary", response.status_code == 200 and counts["primary"] > 0,
+          counts=counts)
+
+    replicate(primary_path, replica_path)
+    response, counts = counter.request(client, f"/api/activities/{user_id}/changes?since={before_seq}&min_seq={change_seq}")
+    body = response.get_json()
+    check("caught-up replica serves min_seq reads",
+          counts["primary"] == 0 and body["seq"] == change_seq and set(new_ids) <= changed_ids(body), counts=counts)
+
+    # A GET that writes: the summary row is built on first request
+    other_id = user_ids[1]
+    with main.app.app_context():
+        main.db.session.query(UserSummary).filter_by(user_id=other_id).delete()
+        main.db.session.commit()
+    replicate(primary_path, replica_path)
+    response, counts = counter.request(client, f"/api/summary/{other_id}")
+    with main.app.app_context():
+        stored = main.db.session.get(UserSummary, other_id)
+    check("GET that writes moves to primary", response.status_code == 200 and counts["primary"] > 0
+          and stored is not None and response.get_json()["total_runs"] == stored.run_count, counts=counts)
+
+    counter.request(client, f"/callback?code={late_user}")
+    user_cache.invalidate(late_user)  # as in a worker that didn't serve the sign-up
+    response, counts = counter.request(client, f"/api/athlete/{late_user}")
+    check("user not yet replicated is found on primary", response.status_code == 200 and counts["primary"] > 0,
+          counts=counts)
+
+    metrics = [line for line in client.get("/metrics").get_data(as_text=True).splitlines()
+               if line.startswith("runhub_replica_fallbacks_total")]
+    print("\n".join(metrics))
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": {"checks": checks, "fallback_metrics": metrics},
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"replica-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    failed = [entry["check"] for entry in checks if not entry["ok"]]
+    if failed:
+        raise SystemExit("Replica checks failed:\n" + "\n".join(failed))
+
+
+if __name__ == "__main__":
+    main_cli()
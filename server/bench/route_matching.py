@@ -0,0 +1,154 @@
+"""Route clustering accuracy, batch throughput and incremental matching cost.
+
+Each athlete gets --loops favourite routes; --repeat-share of their runs retrace one of
+them (with GPS noise and a slightly different recorded distance) and the rest are one-off
+routes from near home. The runs are stored without routes, then:
+
+- batch: `cluster_routes` over everything, once per --workers value, reporting
+  activities/s and how well the routes found agree with the true loops (pairwise
+  precision and recall: pairs put together that belong together, and vice versa);
+- incremental: for athletes with each of --history-sizes clustered runs, the time to
+  match one new run the way a sync does. Flat times across sizes mean the start-cell
+  index keeps matching independent of history length.
+
+Usage (from server/):
+    python bench/route_matching.py --users 4 --history 2000 --workers 1,4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from run import RESULTS_DIR, setup_app, git_revision, summarize
+from synthetic import generate_user, generate_activity, generate_route
+
+
+def generate_history(rng, user_id, runs, loops, repeat_share):
+    """(user, activities, {activity_id: loop label}) with one-offs labelled by their own id."""
+    user = generate_user(rng, user_id)
+    home_lat, home_lng = user["home"]
+    favourites = []
+    for _ in range(loops):
+        start = (home_lat + rng.uniform(-0.02, 0.02), home_lng + rng.uniform(-0.02, 0.02))
+        distance = round(max(rng.lognormvariate(9, 0.4), 3000), 1)
+        favourites.append((generate_route(rng, start, distance), distance))
+
+    activities, labels = [], {}
+    current = datetime(2025, 11, 1, 7, 0, 0)
+    for run_index in range(runs):
+        activity_id = user_id * 100000 + run_index
+        loop = rng.randrange(loops) if rng.random() < repeat_share else None
+        activities.append(generate_activity(rng, user, activity_id, current,
+                                            loop=favourites[loop] if loop is not None else None))
+        labels[activity_id] = f"{user_id}:{loop}" if loop is not None else activity_id
+        current -= timedelta(days=1, minutes=rng.randint(-180, 180))
+    return user, activities, labels
+
+
+def store_unmatched(main, user, activities):
+    """Insert a user and their activities directly, skipping the sync path's route matching."""
+    from models import User
+    from strava_sync import activity_from_strava
+    main.db.session.add(User(id=user["id"], firstname=user["firstname"], lastname=user["lastname"], access_token="bench"))
+    main.db.session.add_all([activity_from_strava(user["id"], activity) for activity in activities])
+    main.db.session.commit()
+
+
+def pairs(n):
+    return n * (n - 1) // 2
+
+
+def pairwise_accuracy(main, labels):
+    """Precision and recall of same-route pairs against the true loops."""
+    from models import Activity
+    routes = dict(main.db.session.query(Activity.id, Activity.route_id).filter(Activity.id.in_(list(labels))))
+    together = sum(pairs(n) for n in Counter((routes[i], labels[i]) for i in labels if routes[i]).values())
+    found = sum(pairs(n) for n in Counter(route for route in routes.values() if route).values())
+    actual = sum(pairs(n) for n in Counter(labels.values()).values())
+    return {
+        "precision": round(together / found, 4) if found else None,
+        "recall": round(together / actual, 4) if actual else None,
+        "unmatched": sum(1 for route in routes.values() if route is None),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Route clustering benchmark")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--history", type=int, default=2000, help="runs per athlete in the batch phase")
+    parser.add_argument("--loops", type=int, default=12, help="favourite routes per athlete")
+    parser.add_argument("--repeat-share", type=float, default=0.8, help="share of runs on a favourite route")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated pool sizes")
+    parser.add_argument("--history-sizes", default="250,1000,4000")
+    parser.add_argument("--new", type=int, default=100, help="runs matched one by one per history size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/route-matching-<timestamp>.json)")
+    args = parser.parse_args()
+
+    main = setup_app(os.path.join(tempfile.mkdtemp(prefix="runhub-routes-"), "bench.db"))
+    from models import Route
+    from route_clusters import cluster_routes, match_activity_routes
+    from strava_sync import activity_from_strava
+    rng = random.Random(args.seed)
+    results = {"batch": {}, "incremental": {}}
+
+    with main.app.app_context():
+        labels = {}
+        user_ids = [100000 + index for index in range(args.users)]
+        for user_id in user_ids:
+            user, activities, user_labels = generate_history(rng, user_id, args.history, args.loops, args.repeat_share)
+            store_unmatched(main, user, activities)
+            labels.update(user_labels)
+
+        for workers in sorted({int(value) for value in args.workers.split(",")}):
+            start = time.perf_counter()
+            matched, routes = cluster_routes(user_ids, workers=workers, rebuild=True)
+            seconds = time.perf_counter() - start
+            results["batch"][f"workers_{workers}"] = {
+                "activities": len(labels),
+                "matched": matched,
+                "routes": routes,
+                "seconds": round(seconds, 2),
+                "activities_per_s": round(len(labels) / seconds, 1),
+            }
+            print(f"batch, {workers} workers: {len(labels) / seconds:.0f} activities/s, {routes} routes")
+        results["batch"]["accuracy"] = pairwise_accuracy(main, labels)
+        print(f"accuracy: {results['batch']['accuracy']}")
+
+        for index, size in enumerate(int(value) for value in args.history_sizes.split(",")):
+            user_id = 200000 + index
+            user, activities, _ = generate_history(rng, user_id, size + args.new, args.loops, args.repeat_share)
+            # Newest first: the oldest `size` runs are the history, the rest arrive one by one
+            history, new = activities[args.new:], activities[:args.new]
+            store_unmatched(main, user, history)
+            cluster_routes([user_id], workers=1)
+
+            latencies = []
+            for activity in reversed(new):
+                main.db.session.add(activity_from_strava(user_id, activity))
+                main.db.session.flush()
+                start = time.perf_counter()
+                match_activity_routes(user_id, [activity["id"]])
+                latencies.append(time.perf_counter() - start)
+                main.db.session.commit()
+            routes = Route.query.filter_by(user_id=user_id).count()
+            results["incremental"][f"history_{size}"] = dict(summarize(latencies), routes=routes)
+            print(f"incremental, history {size}: p50 {results['incremental'][f'history_{size}']['p50_ms']} ms, {routes} routes")
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"route-matching-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,346 @@
+"""RunHub benchmark suite.
+
+Runs the server against a throwaway SQLite database and the in-process fake Strava API,
+with deterministic synthetic data, and reports throughput/latency per benchmark.
+
+Usage (from server/):
+    python bench/run.py --users 20 --runs 500
+    python bench/run.py --only activities,chat --compare bench/results/<previous>.json
+
+Results are written to bench/results/<timestamp>.json for later comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+BENCHMARKS = ["import", "refresh", "activities", "chat", "badges", "leaderboards", "startup"]
+
+
+def summarize(latencies, queries=None, items=None):
+    """Summarize per-operation latencies (seconds) into throughput and percentiles."""
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    summary = {
+        "ops": len(latencies),
+        "total_s": round(total, 4),
+        "ops_per_s": round(len(latencies) / total, 2) if total else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+    if queries is not None:
+        summary["queries_per_op"] = round(queries / len(latencies), 1)
+    if items is not None:
+        summary["items_per_s"] = round(items / total, 1) if total else None
+    return summary
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def setup_app(database_path):
+    """Import the server against a fresh SQLite file."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("FRONTEND_URL", "http://localhost:5173")
+    sys.path.insert(0, SERVER_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    import main
+    with main.app.app_context():
+        main.db.create_all()
+    return main
+
+
+def bench_import(main, dataset, profile_queries):
+    client = main.app.test_client()
+    latencies = []
+    queries = 0
+    items = 0
+    for user_id, (user, activities) in dataset.items():
+        with profile_queries() as profile:
+            elapsed, response = timed(lambda: client.get(f"/callback?code={user_id}"))
+        assert response.status_code == 302 and "error" not in response.location, response.location
+        latencies.append(elapsed)
+        queries += profile.count
+        items += len(activities)
+    return summarize(latencies, queries, items)
+
+
+def bench_refresh(main, dataset, profile_queries, rng_seed):
+    from synthetic import generate_activity
+    import random
+    rng = random.Random(rng_seed)
+
+    # Simulate new uploads and edits since the import
+    for user_id, (user, activities) in dataset.items():
+        newest = datetime.strptime(activities[0]["start_date"], '%Y-%m-%dT%H:%M:%SZ')
+        for offset in range(2):
+            new_id = user_id * 100000 + 90000 + offset
+            activities.insert(0, generate_activity(rng, user, new_id, newest + timedelta(days=offset + 1)))
+        activities[3]["name"] = "Renamed Run"
+
+    client = main.app.test_client()
+    latencies = []
+    queries = 0
+    strava_calls = 0
+    for user_id in dataset:
+        with profile_queries() as profile:
+            elapsed, response = timed(lambda: client.get(f"/api/refresh/{user_id}"))
+        assert response.status_code == 200, response.get_data(as_text=True)
+        latencies.append(elapsed)
+        queries += profile.count
+        strava_calls += response.get_json()["stravaCalls"]
+    summary = summarize(latencies, queries)
+    summary["strava_calls_per_op"] = round(strava_calls / len(dataset), 2)
+    return summary
+
+
+def bench_activities(main, dataset, profile_queries, repeat=5):
+    client = main.app.test_client()
+    # What a browser sends
+    headers = {"Accept-Encoding": "gzip, deflate, br"}
+    latencies = []
+    queries = 0
+    bytes_sent = 0
+    cpu = 0.0
+    for _ in range(repeat):
+        for user_id in dataset:
+            cpu_start = time.process_time()
+            with profile_queries() as profile:
+                elapsed, response = timed(lambda: client.get(f"/api/activities/{user_id}", headers=headers))
+            cpu += time.process_time() - cpu_start
+            assert response.status_code == 200
+            latencies.append(elapsed)
+            queries += profile.count
+            bytes_sent += len(response.get_data())
+    summary = summarize(latencies, queries)
+    summary["bytes_per_op"] = bytes_sent // len(latencies)
+    summary["cpu_ms_per_op"] = round(cpu / len(latencies) * 1000, 3)
+    return summary
+
+
+CHAT_QUESTIONS = [
+    "What was my last run?",
+    "How did my marathon go?",
+    "What was my fastest 10k last year?",
+    "How much did I run in March?",
+    "What is my longest run ever?",
+]
+
+
+def bench_chat(main, dataset, profile_queries, repeat=5):
+    """Time context building for /api/chat (everything before the OpenAI call)."""
+    from chat_context import build_chat_context
+    from models import User
+    latencies = []
+    queries = 0
+    tokens = []
+    with main.app.app_context():
+        for _ in range(repeat):
+            for user_id in dataset:
+                for question in CHAT_QUESTIONS:
+                    def build():
+                        user = main.db.session.get(User, user_id)
+                        return build_chat_context(user_id, f"{user.firstname} {user.lastname}", question)
+                    with profile_queries() as profile:
+                        elapsed, (context, info) = timed(build)
+                    latencies.append(elapsed)
+                    queries += profile.count
+                    tokens.append(info["tokens"])
+    summary = summarize(latencies, queries)
+    summary["context_tokens_per_op"] = round(sum(tokens) / len(tokens))
+    summary["context_tokens_max"] = max(tokens)
+    return summary
+
+
+def bench_badges(main, dataset, profile_queries):
+    from badges import evaluate_user_badges
+    main.app.test_cli_runner().invoke(args=["seed-badges"])
+
+    latencies = []
+    queries = 0
+    with main.app.app_context():
+        for user_id in dataset:
+            with profile_queries() as profile:
+                elapsed, _ = timed(lambda: evaluate_user_badges(user_id))
+            latencies.append(elapsed)
+            queries += profile.count
+    return summarize(latencies, queries)
+
+
+def bench_leaderboards(main, leaderboard_users, profile_queries, lookups=1000):
+    """Load test leaderboard reads with `leaderboard_users` ranked users."""
+    import bisect
+    import random
+    from models import User, LeaderboardEntry
+    from leaderboards import PERIODS, METRICS, period_bounds, rebuild_rank_buckets
+
+    rng = random.Random(7)
+    base_id = 900000000
+    with main.app.app_context():
+        db = main.db
+        db.session.execute(User.__table__.insert(), [
+            {"id": base_id + i, "firstname": f"Load{i}", "lastname": "User", "access_token": "x"}
+            for i in range(leaderboard_users)
+        ])
+        rows = []
+        for period in PERIODS:
+            period_key, _ = period_bounds(period)
+            for metric in METRICS:
+                for i in range(leaderboard_users):
+                    rows.append({"period": period, "period_key": period_key, "metric": metric,
+                                 "user_id": base_id + i, "value": round(rng.uniform(0, 500000), 1)})
+        db.session.execute(LeaderboardEntry.__table__.insert(), rows)
+        rebuild_rank_buckets()
+        db.session.commit()
+        # Expected ranks: 1 + entries with a higher value on the same board
+        board_values = {}
+        for period, metric, value in db.session.query(
+            LeaderboardEntry.period, LeaderboardEntry.metric, LeaderboardEntry.value
+        ).filter(LeaderboardEntry.period_key.in_([period_bounds(period)[0] for period in PERIODS])):
+            board_values.setdefault((period, metric), []).append(value)
+        for values in board_values.values():
+            values.sort()
+
+    client = main.app.test_client()
+    page_latencies = []
+    rank_latencies = []
+    page_queries = 0
+    rank_queries = 0
+    for _ in range(lookups):
+        period = rng.choice(PERIODS)
+        metric = rng.choice(METRICS)
+        page = rng.randint(1, max(leaderboard_users // 50, 1))
+        with profile_queries() as profile:
+            elapsed, response = timed(lambda: client.get(f"/api/leaderboards/{period}/{metric}?page={page}"))
+        assert response.status_code == 200
+        page_latencies.append(elapsed)
+        page_queries += profile.count
+
+        user_id = base_id + rng.randrange(leaderboard_users)
+        with profile_queries() as profile:
+            elapsed, response = timed(lambda: client.get(f"/api/leaderboards/{period}/{metric}/{user_id}"))
+        assert response.status_code == 200
+        values = board_values[(period, metric)]
+        ranked = response.get_json()
+        assert ranked["rank"] == len(values) - bisect.bisect_right(values, ranked["value"]) + 1
+        assert ranked["total"] == len(values)
+        rank_latencies.append(elapsed)
+        rank_queries += profile.count
+
+    return {
+        "users": leaderboard_users,
+        "top_n_page": summarize(page_latencies, page_queries),
+        "rank_lookup": summarize(rank_latencies, rank_queries),
+    }
+
+
+def compare(results, previous_path):
+    """Print the change in p50 latency against a previous results file."""
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+
+    def walk(current, old, prefix=""):
+        for key, value in current.items():
+            if isinstance(value, dict):
+                walk(value, old.get(key, {}), f"{prefix}{key}.")
+            elif key == "p50_ms" and old.get(key):
+                change = (value - old[key]) / old[key] * 100
+                print(f"  {prefix}{key}: {old[key]} -> {value} ({change:+.1f}%)")
+
+    print(f"\nComparison with {previous_path}:")
+    walk(results, previous)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="RunHub benchmark suite")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", default=datetime.utcnow().strftime('%Y-%m-%d'),
+                        help="date of each user's newest run (YYYY-MM-DD); fix it for byte-identical datasets")
+    parser.add_argument("--leaderboard-users", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Strava latency per call (s)")
+    parser.add_argument("--only", help=f"comma-separated subset of: {','.join(BENCHMARKS)}")
+    parser.add_argument("--out", help="results file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else BENCHMARKS
+    workdir = tempfile.mkdtemp(prefix="runhub-bench-")
+    main = setup_app(os.path.join(workdir, "bench.db"))
+
+    from synthetic import generate_dataset
+    from fake_strava import FakeStravaAdapter
+    from profiling import profile_queries
+    from strava_sync import strava_http
+    from startup import measure_startup
+
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d') + timedelta(hours=7)
+    dataset = generate_dataset(users=args.users, runs=args.runs, seed=args.seed, end_date=end_date)
+    adapter = FakeStravaAdapter(dataset, latency=args.latency)
+    strava_http.mount("https://www.strava.com", adapter)
+
+    # Every benchmark after the import needs the imported data
+    results = {}
+    if set(selected) - {"leaderboards", "startup"}:
+        results["import"] = bench_import(main, dataset, profile_queries)
+    if "refresh" in selected:
+        results["refresh"] = bench_refresh(main, dataset, profile_queries, args.seed)
+    if "activities" in selected:
+        results["activities"] = bench_activities(main, dataset, profile_queries)
+    if "chat" in selected:
+        results["chat"] = bench_chat(main, dataset, profile_queries)
+    if "badges" in selected:
+        results["badges"] = bench_badges(main, dataset, profile_queries)
+    if "leaderboards" in selected:
+        results["leaderboards"] = bench_leaderboards(main, args.leaderboard_users, profile_queries)
+    if "startup" in selected:
+        results["startup"] = measure_startup()
+    results["strava_calls"] = adapter.calls
+
+    output = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    print(json.dumps(results, indent=2))
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main_cli()
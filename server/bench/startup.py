@@ -0,0 +1,112 @@
+"""Cold-start cost: how long a fresh process takes to import the app and answer a request.
+
+Every sample is a new interpreter, like a freshly started gunicorn worker or a woken
+Render instance. Reports the median `import main` time from `python -X importtime`, its
+slowest direct imports, the time to the first response, and what the first /api/chat
+pays to import the OpenAI SDK. Exits non-zero when the median import exceeds the budget.
+
+Usage (from server/):
+    python bench/startup.py --samples 7 --budget-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from run import RESULTS_DIR, SERVER_DIR, git_revision
+
+# Generous for the ~0.6s measured on a 1-CPU container; importing openai up front alone blew it
+STARTUP_BUDGET_MS = 800
+
+FIRST_RESPONSE = (
+    "import time; start = time.perf_counter(); import main; "
+    "main.app.test_client().get('/metrics'); print(time.perf_counter() - start)"
+)
+
+
+def parse_importtime(stderr, module):
+    """(total µs, {direct import: cumulative µs}) for `module` from -X importtime output.
+
+    Children are printed before their parent, one indent level deeper.
+    """
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header row
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative), children
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative)
+    raise ValueError(f"{module} not found in importtime output")
+
+
+def sample(code, env, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def measure_startup(samples=7, budget_ms=STARTUP_BUDGET_MS, env=None):
+    env = dict(env or os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='runhub-startup-'), 'bench.db')}")
+
+    import_ms, first_response_ms, openai_ms = [], [], []
+    children = {}
+    for _ in range(samples):
+        total, direct = parse_importtime(sample("import main", env, importtime=True).stderr, "main")
+        import_ms.append(total / 1000)
+        for name, cumulative in direct.items():
+            children.setdefault(name, []).append(cumulative / 1000)
+        first_response_ms.append(float(sample(FIRST_RESPONSE, env).stdout.strip()) * 1000)
+        openai_ms.append(parse_importtime(sample("import openai", env, importtime=True).stderr, "openai")[0] / 1000)
+
+    top_imports = sorted(((name, statistics.median(values)) for name, values in children.items()),
+                         key=lambda item: item[1], reverse=True)[:10]
+    p50 = statistics.median(import_ms)
+    return {
+        "samples": samples,
+        "import": {"p50_ms": round(p50, 1), "max_ms": round(max(import_ms), 1)},
+        "first_response": {"p50_ms": round(statistics.median(first_response_ms), 1)},
+        "openai_import_on_first_chat": {"p50_ms": round(statistics.median(openai_ms), 1)},
+        "top_imports_ms": {name: round(value, 1) for name, value in top_imports},
+        "budget_ms": budget_ms,
+        "within_budget": p50 <= budget_ms,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Cold-start import time")
+    parser.add_argument("--samples", type=int, default=7, help="fresh interpreters per measurement")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="maximum median import time")
+    parser.add_argument("--out", help="results file (default bench/results/startup-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = measure_startup(args.samples, args.budget_ms)
+    print(json.dumps(results, indent=2))
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"startup-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    if not results["within_budget"]:
+        raise SystemExit(f"Median import {results['import']['p50_ms']} ms is over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,157 @@
+"""Sync write throughput and failure isolation.
+
+For each --batch-sizes value (activity writes per transaction) and --failure-rates value
+(fraction of rows made to fail), one fresh athlete goes through three phases via
+commit_sync_writes: add --activities activities, update them all, then delete them all.
+Injected failures are rows that violate NOT NULL at flush (adds and updates) or raise
+before touching the session (deletes).
+
+After each phase the reported counts are checked against the database: committed rows,
+change-log entries and the summary row must all agree, and only the injected rows may be
+missing. Any disagreement fails the run.
+
+Usage (from server/):
+    python bench/sync_writes.py --activities 2000 --batch-sizes 1,10,100,500 --failure-rates 0,0.01
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+
+from run import RESULTS_DIR, setup_app, git_revision
+from synthetic import generate_dataset
+
+
+def failing_delete(activity_id):
+    raise RuntimeError(f"injected failure deleting {activity_id}")
+
+
+def plan_phase(main, phase, user_id, activities, bad_ids):
+    """(kind, activity_id, write) operations for one phase, with bad_ids made to fail."""
+    from models import Activity
+    from strava_sync import add_activity_from_strava, update_activity_from_strava
+    writes = []
+    if phase == "add":
+        for activity in activities:
+            payload = dict(activity, distance=None) if activity["id"] in bad_ids else activity
+            writes.append(("added", activity["id"], partial(add_activity_from_strava, user_id, payload)))
+    elif phase == "update":
+        stored = {row.id: row for row in Activity.query.filter_by(user_id=user_id)}
+        for activity in activities:
+            if activity["id"] not in stored:
+                continue
+            payload = dict(activity, name=activity["name"] + " (edited)", distance=activity["distance"] + 100)
+            if activity["id"] in bad_ids:
+                payload["distance"] = None
+            writes.append(("updated", activity["id"], partial(update_activity_from_strava, stored[activity["id"]], payload)))
+    else:
+        for row in Activity.query.filter_by(user_id=user_id):
+            write = partial(failing_delete, row.id) if row.id in bad_ids else partial(main.db.session.delete, row)
+            writes.append(("deleted", row.id, write))
+    return writes
+
+
+def check_phase(main, phase, user_id, activities, bad_ids, counts, planned, changes_before):
+    """Compare reported counts with what the database actually holds."""
+    from models import Activity, ActivityChange, UserSummary
+    from summary import compute_user_summary, summary_mismatches
+    kind = {"add": "added", "update": "updated", "delete": "deleted"}[phase]
+    stored = {row.id: row for row in Activity.query.filter_by(user_id=user_id)}
+    expected_ok = len([op for op in planned if op[1] not in bad_ids])
+
+    problems = []
+    if counts[kind] != expected_ok or counts["failed"] != len(planned) - expected_ok:
+        problems.append(f"counts {counts} for {expected_ok} good of {len(planned)}")
+    if phase == "add" and len(stored) != counts["added"]:
+        problems.append(f"{len(stored)} rows stored, {counts['added']} reported")
+    if phase == "update":
+        edited = sum(1 for row in stored.values() if row.name.endswith(" (edited)"))
+        if edited != counts["updated"]:
+            problems.append(f"{edited} rows edited, {counts['updated']} reported")
+    if phase == "delete" and len(stored) != len(bad_ids & set(stored)):
+        problems.append(f"{len(stored)} rows left, only failed deletes should remain")
+    logged = ActivityChange.query.filter_by(user_id=user_id).count() - changes_before
+    if logged != counts[kind]:
+        problems.append(f"{logged} change-log entries for {counts[kind]} committed writes")
+    summary = main.db.session.get(UserSummary, user_id)
+    mismatches = summary_mismatches(summary, compute_user_summary(user_id))
+    mismatches.pop("badge_count", None)  # badges aren't evaluated here
+    if mismatches:
+        problems.append(f"summary mismatches {mismatches}")
+    return problems
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Sync write throughput and failure isolation")
+    parser.add_argument("--activities", type=int, default=2000, help="activities per athlete")
+    parser.add_argument("--batch-sizes", default="1,10,100,500")
+    parser.add_argument("--failure-rates", default="0,0.01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default bench/results/sync-writes-<timestamp>.json)")
+    args = parser.parse_args()
+
+    batch_sizes = [int(value) for value in args.batch_sizes.split(",")]
+    failure_rates = [float(value) for value in args.failure_rates.split(",")]
+    configs = [(batch_size, rate) for rate in failure_rates for batch_size in batch_sizes]
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix="runhub-sync-writes-"), "bench.db")
+    main = setup_app(database_path)
+    from models import User, ActivityChange
+    from strava_sync import commit_sync_writes
+    dataset = generate_dataset(users=len(configs), runs=args.activities, seed=args.seed, other_ratio=0.1)
+    rng = random.Random(args.seed)
+
+    results = {}
+    failed_checks = []
+    with main.app.app_context():
+        main.db.session.add_all([User(id=user_id, firstname="Bench", lastname="User", access_token="bench")
+                                 for user_id in dataset])
+        main.db.session.commit()
+
+        for (batch_size, rate), (user_id, (_, activities)) in zip(configs, dataset.items()):
+            label = f"batch_{batch_size}_fail_{rate}"
+            results[label] = {}
+            for phase in ("add", "update", "delete"):
+                bad_ids = {activity["id"] for activity in activities if rng.random() < rate}
+                planned = plan_phase(main, phase, user_id, activities, bad_ids)
+                changes_before = ActivityChange.query.filter_by(user_id=user_id).count()
+
+                start = time.perf_counter()
+                counts = commit_sync_writes(user_id, planned, batch_size=batch_size)
+                seconds = time.perf_counter() - start
+
+                problems = check_phase(main, phase, user_id, activities, bad_ids, counts, planned, changes_before)
+                failed_checks += [f"{label} {phase}: {problem}" for problem in problems]
+                results[label][phase] = {
+                    "writes": len(planned),
+                    "counts": counts,
+                    "seconds": round(seconds, 3),
+                    "writes_per_s": round(len(planned) / seconds, 1) if seconds else None,
+                    "consistent": not problems,
+                }
+                main.db.session.expunge_all()
+            print(f"{label}: " + ", ".join(
+                f"{phase} {result['writes_per_s']}/s{'' if result['consistent'] else ' INCONSISTENT'}"
+                for phase, result in results[label].items()
+            ))
+
+    output = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "git_revision": git_revision(), "args": vars(args)},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"sync-writes-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    if failed_checks:
+        raise SystemExit("Consistency checks failed:\n" + "\n".join(failed_checks))
+
+
+if __name__ == "__main__":
+    main_cli()
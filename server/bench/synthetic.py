@@ -0,0 +1,153 @@
+"""Deterministic generator of Strava-shaped activity payloads."""
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+# The server's polyline codec, so the fake API encodes exactly what the server decodes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from polyline import encode_polyline, decode_polyline
+
+# Starting points for synthetic athletes (lat, lng)
+CITIES = [
+    (42.3601, -71.0589),  # Boston
+    (40.7829, -73.9654),  # New York
+    (37.7694, -122.4862),  # San Francisco
+    (43.0731, -89.4012),  # Madison
+    (51.5074, -0.1278),  # London
+]
+
+RUN_NAMES = ["Morning Run", "Lunch Run", "Afternoon Run", "Evening Run", "Night Run",
+             "Long Run", "Tempo Run", "Easy Run", "Recovery Run", "Track Workout"]
+OTHER_TYPES = ["Ride", "Walk", "Hike", "Swim"]
+
+
+def generate_route(rng, start, distance):
+    """Random-walk loop of roughly `distance` meters that returns near its start."""
+    points_count = max(int(distance / 100), 8)
+    heading = rng.uniform(0, 2 * math.pi)
+    step = distance / points_count
+    lat, lng = start
+    points = [(lat, lng)]
+    for i in range(points_count):
+        # Turn steadily so the walk closes into a loop, with some jitter
+        heading += 2 * math.pi / points_count + rng.uniform(-0.3, 0.3)
+        lat += step * math.cos(heading) / 111320
+        lng += step * math.sin(heading) / (111320 * math.cos(math.radians(lat)))
+        points.append((lat, lng))
+    return points
+
+
+def jitter_route(rng, route, meters=5):
+    """The same route recorded on another day: every point off by GPS noise."""
+    return [(lat + rng.gauss(0, meters) / 111320, lng + rng.gauss(0, meters) / (111320 * math.cos(math.radians(lat))))
+            for lat, lng in route]
+
+
+def generate_user(rng, user_id):
+    return {
+        "id": user_id,
+        "username": f"runner{user_id}",
+        "firstname": f"Runner{user_id}",
+        "lastname": "Bench",
+        "profile": None,
+        "home": rng.choice(CITIES),
+    }
+
+
+def generate_activity(rng, user, activity_id, start_date, activity_type="Run", loop=None):
+    """Return one activity in the shape of Strava's /athlete/activities response.
+
+    `loop`, a (points, distance) pair, makes it a repeat of that route instead of a new one.
+    """
+    if loop is None:
+        home_lat, home_lng = user["home"]
+        start = (home_lat + rng.uniform(-0.02, 0.02), home_lng + rng.uniform(-0.02, 0.02))
+        distance = round(max(rng.lognormvariate(math.log(8000), 0.4), 1500), 1)
+    else:
+        distance = round(loop[1] * rng.uniform(0.98, 1.02), 1)
+    pace = rng.uniform(270, 420)  # seconds per km
+    moving_time = int(distance / 1000 * pace)
+    elapsed_time = moving_time + rng.randint(0, 300)
+    route = generate_route(rng, start, distance) if loop is None else jitter_route(rng, loop[0])
+
+    return {
+        "resource_state": 2,
+        "athlete": {"id": user["id"], "resource_state": 1},
+        "name": rng.choice(RUN_NAMES) if activity_type == "Run" else f"Afternoon {activity_type}",
+        "distance": distance,
+        "moving_time": moving_time,
+        "elapsed_time": elapsed_time,
+        "total_elevation_gain": round(rng.uniform(0, distance / 100), 1),
+        "type": activity_type,
+        "sport_type": activity_type,
+        "id": activity_id,
+        "start_date": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "start_date_local": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "timezone": "(GMT+00:00) UTC",
+        "achievement_count": rng.randint(0, 5),
+        "kudos_count": rng.randint(0, 30),
+        "map": {
+            "id": f"a{activity_id}",
+            "summary_polyline": encode_polyline(route),
+            "resource_state": 2
+        },
+        "start_latlng": [round(route[0][0], 6), round(route[0][1], 6)],
+        "end_latlng": [round(route[-1][0], 6), round(route[-1][1], 6)],
+        "average_speed": round(distance / moving_time, 3),
+        "max_speed": round(distance / moving_time * 1.4, 3),
+        "has_heartrate": False,
+    }
+
+
+def generate_streams(activity):
+    """Strava-style streams for an activity at one sample per second, deterministic per id."""
+    rng = random.Random(activity["id"])
+    route = decode_polyline(activity["map"]["summary_polyline"])
+    seconds = activity["moving_time"]
+
+    # Pace wanders around the average; scale so the total matches the activity distance
+    speeds = [1 + 0.15 * math.sin(second / rng.uniform(120, 600)) + rng.uniform(-0.05, 0.05) for second in range(seconds)]
+    scale = activity["distance"] / sum(speeds)
+    distance, total = [], 0.0
+    for speed in speeds:
+        total += speed * scale
+        distance.append(round(total, 1))
+
+    latlng = []
+    for second in range(seconds):
+        position = second / max(seconds - 1, 1) * (len(route) - 1)
+        (lat1, lng1), (lat2, lng2) = route[int(position)], route[min(int(position) + 1, len(route) - 1)]
+        fraction = position - int(position)
+        latlng.append([round(lat1 + (lat2 - lat1) * fraction, 6), round(lng1 + (lng2 - lng1) * fraction, 6)])
+
+    return {
+        "time": {"data": list(range(seconds))},
+        "distance": {"data": distance},
+        "latlng": {"data": latlng},
+        "altitude": {"data": [round(50 + 20 * math.sin(second / 300), 1) for second in range(seconds)]},
+        "heartrate": {"data": [int(140 + 15 * math.sin(second / 400) + rng.randint(-3, 3)) for second in range(seconds)]},
+    }
+
+
+def generate_dataset(users=10, runs=200, seed=42, other_ratio=0.1, end_date=None):
+    """Generate {user_id: (user, [activities newest first])} deterministically for a seed."""
+    rng = random.Random(seed)
+    end_date = end_date or datetime(2025, 11, 1, 7, 0, 0)
+    dataset = {}
+    for index in range(users):
+        user_id = 100000 + index
+        user = generate_user(rng, user_id)
+
+        # Roughly one run every 1-3 days going back from end_date
+        activities = []
+        current = end_date - timedelta(hours=rng.randint(0, 48))
+        for run_index in range(runs):
+            activity_id = user_id * 100000 + run_index
+            activity_type = rng.choice(OTHER_TYPES) if rng.random() < other_ratio else "Run"
+            activities.append(generate_activity(rng, user, activity_id, current, activity_type))
+            current -= timedelta(days=rng.randint(1, 3), minutes=rng.randint(-180, 180))
+
+        dataset[user_id] = (user, activities)
+    return dataset
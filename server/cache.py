@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import record_cache_lookup
+
+
+class MemoryBackend:
+    """Per-process LRU with per-entry expiry."""
+
+    shared = False  # invalidations reach only this process
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # {key: (expires_at, value)}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteBackend:
+    """Cache file shared by every worker on the host, so invalidations reach all processes."""
+
+    shared = True
+
+    def __init__(self, path, max_entries=10000):
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            # Occasionally drop expired rows and cap the table size
+            if hash(key) % 100 == 0:
+                self.connection.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+                self.connection.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def delete(self, key):
+        with self.lock:
+            self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM cache")
+
+
+class ReadThroughCache:
+    """Named cache over a backend. Values must be JSON-serializable (never ORM instances)."""
+
+    def __init__(self, name, backend, ttl):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, key):
+        return f"{self.name}:{key}"
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, or call loader() and cache its result unless it is None."""
+        found, value = self.backend.get(self.key(key))
+        record_cache_lookup(self.name, found)
+        if found:
+            return value
+
+        value = loader()
+        if value is not None:
+            self.backend.set(self.key(key), value, self.ttl)
+        return value
+
+    def invalidate(self, key):
+        self.backend.delete(self.key(key))
+
+
+def default_cache_path():
+    """Beside a SQLite database file, so every worker and CLI run against it shares one cache."""
+    uri = os.getenv("DATABASE_URL", "")
+    if uri.startswith("sqlite:///") and not uri.endswith(":memory:"):
+        return os.path.splitext(uri[len("sqlite:///"):])[0] + "-cache.db"
+    return "runhub-cache.db"
+
+
+def create_backend():
+    """Backend selected by CACHE_BACKEND: 'sqlite' (default) or 'memory'.
+
+    Invalidations from the CLI (seed-badges, delete-users) and from other workers only
+    reach every process through the shared 'sqlite' file at CACHE_PATH; with 'memory'
+    each process serves what it cached until CACHE_TTL_SECONDS passes.
+    """
+    max_entries = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    if os.getenv("CACHE_BACKEND", "sqlite") == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_PATH", default_cache_path()), max_entries)
+    return MemoryBackend(max_entries)
+
+
+backend = create_backend()
+CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", 300))
+
+user_cache = ReadThroughCache("user", backend, CACHE_TTL)
+badge_cache = ReadThroughCache("badges", backend, CACHE_TTL)
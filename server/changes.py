@@ -0,0 +1,147 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import aliased
+from models import db, Activity, ActivityChange, UserSyncStatus
+from sync_scheduler import get_sync_state
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", 30))
+MAX_CHANGES_PAGE = 1000
+
+
+def record_changes(user_id, upserted=(), deleted=()):
+    """Append change-log entries for a user's added/updated and deleted activities.
+
+    Sequence numbers are claimed with one UPDATE of the user's sync row, whose lock is held
+    until the caller commits, so a user's entries always become visible in seq order.
+    """
+    entries = [(activity_id, False) for activity_id in upserted] + [(activity_id, True) for activity_id in deleted]
+    if not entries:
+        return
+    get_sync_state(user_id)
+    db.session.flush()
+    last_seq = db.session.execute(
+        update(UserSyncStatus)
+        .where(UserSyncStatus.user_id == user_id)
+        .values(change_seq=UserSyncStatus.change_seq + len(entries))
+        .returning(UserSyncStatus.change_seq)
+    ).scalar()
+    first_seq = last_seq - len(entries) + 1
+    db.session.add_all([
+        ActivityChange(user_id=user_id, seq=first_seq + index, activity_id=activity_id, deleted=is_deleted)
+        for index, (activity_id, is_deleted) in enumerate(entries)
+    ])
+
+
+def lock_change_log(user_id):
+    """Take the user's change-log lock now instead of at record_changes.
+
+    A no-op UPDATE of the sync row: on Postgres it holds the row lock until commit, and on
+    SQLite it opens the real transaction, so savepoints taken afterwards nest inside it
+    rather than committing when released.
+    """
+    db.session.execute(
+        update(UserSyncStatus)
+        .where(UserSyncStatus.user_id == user_id)
+        .values(change_seq=UserSyncStatus.change_seq)
+    )
+
+
+def get_change_seq(user_id):
+    """The user's latest change sequence number, which versions their activity data."""
+    return db.session.query(UserSyncStatus.change_seq).filter_by(user_id=user_id).scalar() or 0
+
+
+def get_changes(user_id, since=0, limit=MAX_CHANGES_PAGE, activity_type=None):
+    """The user's activity changes after sequence number `since`, optionally for one sport.
+
+    Each changed activity appears once, with its current data or as deleted. When `since`
+    is 0 or predates compacted entries the response is a reset carrying the full list.
+    """
+    state = db.session.get(UserSyncStatus, user_id)
+    current_seq = state.change_seq if state else 0
+    floor = state.change_floor if state else 0
+
+    if since <= 0 or since < floor or since > current_seq:
+        activities = Activity.query.filter_by(user_id=user_id)
+        if activity_type:
+            activities = activities.filter_by(type=activity_type)
+        activities = activities.order_by(Activity.start_date.desc()).all()
+        return {
+            "reset": True,
+            "seq": current_seq,
+            "activities": [activity.activity_data for activity in activities],
+            "changes": [],
+            "has_more": False
+        }
+
+    entries = ActivityChange.query.filter(
+        ActivityChange.user_id == user_id,
+        ActivityChange.seq > since
+    ).order_by(ActivityChange.seq).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Later entries win
+    latest = {entry.activity_id: entry for entry in entries}
+    upserted_ids = [activity_id for activity_id, entry in latest.items() if not entry.deleted]
+    activities = {}
+    if upserted_ids:
+        activities = {activity.id: activity for activity in Activity.query.filter(Activity.id.in_(upserted_ids))}
+
+    changes = []
+    for activity_id, entry in sorted(latest.items(), key=lambda item: item[1].seq):
+        activity = activities.get(activity_id)
+        if entry.deleted or (activity and activity_type and activity.type != activity_type):
+            # Deleted, or no longer of the requested sport: either way the client drops it
+            changes.append({"id": activity_id, "deleted": True})
+        elif activity:
+            changes.append({"id": activity_id, "deleted": False, "activity": activity.activity_data})
+        # Otherwise it was deleted since; that entry comes on a later page
+
+    return {
+        "reset": False,
+        # Only what this page covers: a seq claimed by an uncommitted sync must not be skipped
+        "seq": entries[-1].seq if entries else since,
+        "changes": changes,
+        "has_more": has_more
+    }
+
+
+def compact_changes(retention_days=CHANGE_LOG_RETENTION_DAYS, now=None):
+    """Shrink the change log. Returns (superseded entries removed, old deletions removed).
+
+    Entries superseded by a later one for the same activity go regardless of age, which
+    leaves at most one upsert per stored activity. Deletions older than the retention
+    window go too, raising the user's change_floor: clients that synced before it get a
+    reset instead of a delta.
+    """
+    now = now or datetime.utcnow()
+    newer = aliased(ActivityChange)
+    superseded = db.session.execute(
+        delete(ActivityChange).where(
+            select(newer.seq).where(
+                newer.user_id == ActivityChange.user_id,
+                newer.activity_id == ActivityChange.activity_id,
+                newer.seq > ActivityChange.seq
+            ).exists()
+        ),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+
+    expired = 0
+    floors = db.session.query(ActivityChange.user_id, func.max(ActivityChange.seq)).filter(
+        ActivityChange.deleted.is_(True),
+        ActivityChange.changed_at < now - timedelta(days=retention_days)
+    ).group_by(ActivityChange.user_id).all()
+    for user_id, floor in floors:
+        expired += ActivityChange.query.filter(
+            ActivityChange.user_id == user_id,
+            ActivityChange.deleted.is_(True),
+            ActivityChange.seq <= floor
+        ).delete(synchronize_session=False)
+        state = get_sync_state(user_id)
+        state.change_floor = max(state.change_floor or 0, floor)
+
+    db.session.commit()
+    return superseded, expired
@@ -0,0 +1,301 @@
+import os
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_
+from models import db, Activity, DailyActivitySummary
+
+try:
+    import tiktoken
+    encoding = tiktoken.get_encoding("o200k_base")
+except ImportError:  # Fall back to the ~4 characters per token rule of thumb
+    encoding = None
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", 800))
+METERS_PER_MILE = 1609.34
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"]
+RECORD_WORDS = {"longest", "farthest", "furthest", "fastest", "quickest", "best", "record", "records",
+                "pr", "prs", "pb", "pbs", "personal"}
+RECORD_BANDS = [("5K", 5000), ("10K", 10000), ("Half marathon", 21097.5), ("Marathon", 42195)]
+STOPWORDS = {
+    "what", "when", "where", "which", "who", "how", "many", "much", "was", "were", "did", "does", "have",
+    "has", "had", "the", "and", "for", "with", "that", "this", "than", "then", "from", "about", "into",
+    "your", "you", "mine", "ever", "been", "last", "next", "past", "week", "weeks", "month", "months",
+    "year", "years", "day", "days", "today", "yesterday", "runs", "running", "run", "ran", "miles", "mile",
+    "pace", "time", "times", "total", "average", "should", "could", "would", "can", "tell", "show", "give",
+    "compare", "between", "during", "since", "before", "after", "over", "any", "all", "some", "most",
+    "more", "less", "there", "their", "them", "they", "whats", "its", "maybe", "training", "mileage",
+    "volume", "distance", "splits", "workout", "workouts", "activity", "activities", "doing", "going",
+}
+
+
+def estimate_tokens(text):
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def format_pace_min_sec(decimal_minutes):
+    """Convert decimal minutes to MM:SS format (e.g., 7.1 -> 7:06)."""
+    if decimal_minutes is None:
+        return None
+    minutes = int(decimal_minutes)
+    seconds = round((decimal_minutes - minutes) * 60)
+    # Handle case where seconds round to 60
+    if seconds >= 60:
+        minutes += 1
+        seconds = 0
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_date(value):
+    """"November 9, 2025" (%-d isn't available on Windows)."""
+    return f"{value:%B} {value.day}, {value.year}"
+
+
+def month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def parse_date_range(message, now=None):
+    """(start, end, label) for the first period the question mentions, or None.
+
+    Understands ISO dates, today/yesterday, this/last week/month/year, "last N days/weeks/
+    months", month names with or without a year, and bare years. `end` is exclusive.
+    """
+    now = now or datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    text = message.lower()
+
+    match = re.search(r"\b(\d{4})-(\d{2})-(\d{2})\b", text)
+    if match:
+        try:
+            day = datetime(*(int(part) for part in match.groups()))
+            return day, day + timedelta(days=1), format_date(day)
+        except ValueError:
+            pass
+
+    if "yesterday" in text:
+        return today - timedelta(days=1), today, "yesterday"
+    if re.search(r"\btoday\b", text):
+        return today, today + timedelta(days=1), "today"
+
+    match = re.search(r"\b(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b", text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        days = count * {"day": 1, "week": 7, "month": 30, "year": 365}[unit]
+        return today - timedelta(days=days - 1), today + timedelta(days=1), match.group(0)
+
+    match = re.search(r"\b(this|last|previous)\s+(week|month|year)\b", text)
+    if match:
+        which, unit = match.groups()
+        if unit == "week":
+            start = today - timedelta(days=today.weekday())
+            if which != "this":
+                start -= timedelta(days=7)
+            return start, start + timedelta(days=7), match.group(0)
+        if unit == "month":
+            year, month = today.year, today.month
+            if which != "this":
+                year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+            return (*month_range(year, month), match.group(0))
+        year = today.year if which == "this" else today.year - 1
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1), match.group(0)
+
+    month_pattern = "|".join(MONTHS + [name[:3] for name in MONTHS] + ["sept"])
+    for match in re.finditer(rf"\b({month_pattern})\b(?:\s+(\d{{4}}))?", text):
+        month = [name[:3] for name in MONTHS].index(match.group(1)[:3]) + 1
+        # "May" alone is too often the verb; require a year or a preposition before it
+        if month == 5 and not match.group(2) and not re.search(r"\b(in|during|of|since)\s+may\b", text):
+            continue
+        # A month without a year means its most recent occurrence
+        year = int(match.group(2)) if match.group(2) else (today.year if month <= today.month else today.year - 1)
+        start, end = month_range(year, month)
+        return start, end, start.strftime('%B %Y')
+
+    match = re.search(r"\b(19\d{2}|20\d{2})\b", text)
+    if match:
+        year = int(match.group(1))
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1), str(year)
+    return None
+
+
+def search_terms(message):
+    """Words or quoted phrases from the question worth matching against activity names."""
+    phrases = re.findall(r'"([^"]+)"', message)
+    if phrases:
+        return phrases[:5]
+
+    terms = []
+    month_words = set(MONTHS) | {name[:3] for name in MONTHS}
+    for word in re.findall(r"[a-z0-9']+", message.lower()):
+        word = word.removesuffix("'s").replace("'", "")
+        if word in STOPWORDS or word in RECORD_WORDS or word in month_words or word.isdigit():
+            continue
+        # Short words only count when they look like race distances (5k, 10k)
+        if len(word) >= 4 or re.fullmatch(r"\d+k", word):
+            terms.append(word)
+    return list(dict.fromkeys(terms))[:5]
+
+
+def format_run(activity):
+    distance_km = activity.distance / 1000
+    distance_miles = activity.distance / METERS_PER_MILE
+    line = f"- {format_date(activity.start_date)}: {activity.name} - {distance_miles:.2f} miles ({distance_km:.2f} km)"
+    if activity.distance > 0:
+        pace_mile = activity.moving_time / 60 / distance_miles
+        pace_km = activity.moving_time / 60 / distance_km
+        line += f" @ {format_pace_min_sec(pace_mile)} mins/mi ({format_pace_min_sec(pace_km)} mins/km)"
+    if activity.total_elevation_gain:
+        line += f", {round(activity.total_elevation_gain)} m climb"
+    return line
+
+
+def runs_query(user_id, start=None, end=None):
+    query = Activity.query.filter(Activity.user_id == user_id, Activity.type == 'Run')
+    if start is not None:
+        query = query.filter(Activity.start_date >= start, Activity.start_date < end)
+    return query
+
+
+def totals_line(user_id, start=None, end=None):
+    count, distance, moving_time = runs_query(user_id, start, end).with_entities(
+        func.count(Activity.id), func.sum(Activity.distance), func.sum(Activity.moving_time)
+    ).one()
+    if not count:
+        return "- No runs"
+    line = f"- {count} runs, {distance / METERS_PER_MILE:.1f} miles ({distance / 1000:.1f} km)"
+    if distance:
+        line += f", average pace {format_pace_min_sec(moving_time / 60 / (distance / METERS_PER_MILE))} min/mi"
+    return line
+
+
+def period_section(user_id, start, end, label, list_runs=True):
+    lines = [totals_line(user_id, start, end)]
+    if end - start > timedelta(days=62):
+        # Long periods get a per-month breakdown ahead of individual runs
+        months = {}
+        for day, distance, count in db.session.query(
+            DailyActivitySummary.day, DailyActivitySummary.distance, DailyActivitySummary.count
+        ).filter(
+            DailyActivitySummary.user_id == user_id,
+            DailyActivitySummary.type == 'Run',
+            DailyActivitySummary.day >= start.date(),
+            DailyActivitySummary.day < end.date()
+        ):
+            month = months.setdefault((day.year, day.month), [0, 0])
+            month[0] += distance
+            month[1] += count
+        for (year, month), (distance, count) in sorted(months.items()):
+            lines.append(f"- {datetime(year, month, 1):%B %Y}: {count} runs, {distance / METERS_PER_MILE:.1f} miles")
+    if list_runs:
+        runs = runs_query(user_id, start, end).order_by(Activity.start_date.desc()).limit(50)
+        lines += [format_run(activity) for activity in runs]
+    return f"Runs in {label} ({start:%Y-%m-%d} to {end - timedelta(days=1):%Y-%m-%d}):", lines
+
+
+def name_section(user_id, terms):
+    if not terms:
+        return None
+    matches = runs_query(user_id).filter(
+        or_(*(Activity.name.ilike(f"%{term}%") for term in terms))
+    ).order_by(Activity.start_date.desc()).limit(15).all()
+    if not matches:
+        return None
+    return f"Runs named like {', '.join(terms)}:", [format_run(activity) for activity in matches]
+
+
+def records_section(user_id, start=None, end=None):
+    lines = []
+    longest = runs_query(user_id, start, end).order_by(Activity.distance.desc()).limit(3)
+    lines += ["Longest:"] + [format_run(activity) for activity in longest]
+    for band_name, band_distance in RECORD_BANDS:
+        # Fastest average pace among runs at least this long
+        fastest = runs_query(user_id, start, end).filter(
+            Activity.distance >= band_distance * 0.98, Activity.moving_time > 0
+        ).order_by((Activity.moving_time / Activity.distance).asc()).first()
+        if fastest:
+            lines.append(f"Fastest {band_name} or longer:")
+            lines.append(format_run(fastest))
+    return "Records" + (f" ({start:%Y-%m-%d} to {end - timedelta(days=1):%Y-%m-%d})" if start else " (all time)") + ":", lines
+
+
+def recent_section(user_id, now, brief=False):
+    """Last 4 weeks' totals and latest runs, plus weekly mileage unless `brief`."""
+    today = datetime(now.year, now.month, now.day)
+    lines = ["Last 4 weeks: " + totals_line(user_id, today - timedelta(days=27), today + timedelta(days=1))[2:]]
+    recent = runs_query(user_id).order_by(Activity.start_date.desc()).limit(3 if brief else 10)
+    if brief:
+        return "Recent training:", lines + [format_run(activity) for activity in recent]
+
+    # Weekly mileage from the per-day buckets rather than the activities table
+    weeks = {}
+    for day, distance in db.session.query(DailyActivitySummary.day, DailyActivitySummary.distance).filter(
+        DailyActivitySummary.user_id == user_id,
+        DailyActivitySummary.type == 'Run',
+        DailyActivitySummary.day >= (today - timedelta(days=today.weekday() + 7 * 7)).date()
+    ):
+        week_start = day - timedelta(days=day.weekday())
+        weeks[week_start] = weeks.get(week_start, 0) + distance
+    for week_start in sorted(weeks, reverse=True):
+        lines.append(f"- Week of {week_start:%Y-%m-%d}: {weeks[week_start] / METERS_PER_MILE:.1f} miles")
+    lines += [format_run(activity) for activity in recent]
+    return "Recent training:", lines
+
+
+def build_chat_context(user_id, user_name, message, budget=None, now=None):
+    """Activity context relevant to `message`, kept within `budget` estimated tokens.
+
+    Sections go in priority order: records when it asks about bests (within the period it
+    names, if any), that period, runs whose names match its words, then recent training.
+    Lines are added until the budget is spent. Returns (context, info) where info lists the sections used
+    and the estimated token count.
+    """
+    budget = budget or CHAT_CONTEXT_TOKEN_BUDGET
+    now = now or datetime.utcnow()
+    words = set(re.findall(r"[a-z]+", message.lower()))
+    date_range = parse_date_range(message, now)
+
+    wants_records = bool(words & RECORD_WORDS)
+    sections = []
+    if wants_records:
+        sections.append(("records", records_section(user_id, *(date_range[:2] if date_range else ()))))
+    if date_range:
+        # With records covering the bests, the period only needs its totals
+        sections.append(("period", period_section(user_id, *date_range, list_runs=not wants_records)))
+    named = name_section(user_id, search_terms(message))
+    if named:
+        sections.append(("names", named))
+    # General questions get recent training in detail; specific ones a little background
+    sections.append(("recent", recent_section(user_id, now, brief=bool(sections))))
+
+    context = f"User: {user_name}\nToday: {format_date(now)}\nAll-time: {totals_line(user_id)[2:]}\n"
+    tokens = estimate_tokens(context)
+    used = []
+    truncated = False
+    for name, (title, lines) in sections:
+        block = f"\n{title}\n"
+        block_tokens = estimate_tokens(block)
+        if tokens + block_tokens > budget:
+            truncated = True
+            break
+        added = 0
+        for line in lines:
+            line_tokens = estimate_tokens(line + "\n")
+            if tokens + block_tokens + line_tokens > budget:
+                truncated = True
+                break
+            block += line + "\n"
+            block_tokens += line_tokens
+            added += 1
+        if added:
+            context += block
+            tokens += block_tokens
+            used.append(name)
+        if truncated:
+            break
+
+    return context, {"sections": used, "tokens": tokens, "truncated": truncated}
@@ -0,0 +1,134 @@
+import os
+import time
+from flask import Blueprint, jsonify, request
+from metrics import create_completion, chat_context_tokens
+from chat_context import build_chat_context
+from profiles import get_user_profile
+from strava_sync import release_db_connection
+
+bp = Blueprint("chat", __name__)
+
+# Rate limiting for chat endpoint
+chat_rate_limits = {}  # {user_id: [list of request timestamps]}
+CHAT_RATE_LIMIT_REQUESTS = 10  # Number of requests allowed
+CHAT_RATE_LIMIT_WINDOW = 60  # Time window in seconds (1 minute)
+
+# Created on the first chat request: importing openai takes about a second, most of a
+# cold start, and most processes never serve a chat
+openai_clients = {}  # {api_key: OpenAI}
+
+
+def get_openai_client(api_key):
+    """The process-wide OpenAI client for `api_key`, importing the SDK on first use."""
+    client = openai_clients.get(api_key)
+    if client is None:
+        from openai import OpenAI
+        client = openai_clients.setdefault(api_key, OpenAI(api_key=api_key))
+    return client
+
+
+def check_rate_limit(user_id):
+    """Check if user has exceeded rate limit. Returns (allowed, retry_after_seconds)."""
+    current_time = time.time()
+    
+    # Clean up old entries for this user
+    if user_id in chat_rate_limits:
+        # Remove timestamps older than the time window
+        chat_rate_limits[user_id] = [
+            ts for ts in chat_rate_limits[user_id]
+            if current_time - ts < CHAT_RATE_LIMIT_WINDOW
+        ]
+    else:
+        chat_rate_limits[user_id] = []
+    
+    # Check if limit exceeded
+    if len(chat_rate_limits[user_id]) >= CHAT_RATE_LIMIT_REQUESTS:
+        # Find the oldest request in the current window
+        oldest_request = min(chat_rate_limits[user_id])
+        retry_after = int(CHAT_RATE_LIMIT_WINDOW - (current_time - oldest_request)) + 1
+        return False, retry_after
+    
+    # Add current request timestamp
+    chat_rate_limits[user_id].append(current_time)
+    return True, 0
+
+
+@bp.route("/api/chat", methods=["POST"])
+def chat():
+    """Chat endpoint that provides running advice based on user's activity history."""
+    data = request.get_json()
+    user_id = data.get("user_id")
+    message = data.get("message")
+    
+    if not user_id or not message:
+        return jsonify({"error": "user_id and message are required"}), 400
+    
+    # Check rate limit
+    allowed, retry_after = check_rate_limit(user_id)
+    if not allowed:
+        return jsonify({
+            "error": f"Rate limit exceeded. Please wait {retry_after} seconds before trying again.",
+            "retry_after": retry_after
+        }), 429  # 429 Too Many Requests
+    
+    # Find user
+    profile = get_user_profile(user_id)
+    if not profile:
+        return jsonify({"error": "User not found"}), 404
+    
+    # Only the slices of history the question is about, within the token budget
+    user_name = f"{profile['firstname']} {profile['lastname']}"
+    activity_context, context_info = build_chat_context(user_id, user_name, message)
+    chat_context_tokens.observe(context_info["tokens"])
+    
+    # System prompt for running coach
+    system_prompt = """You are a running coach assistant. Answer questions directly and concisely based on the user's activity history.
+        IMPORTANT RULES:
+        - Answer ONLY what is asked. Do not add extra advice, suggestions, or encouragement unless specifically requested.
+        - Answer in the same language as the user's question. You must answer in a way that is easy to understand and conversational.
+        - Always use min/mi (minutes per mile) as the primary pace unit. You may include min/km in parentheses if helpful, but min/mi should be the default.
+        - Be direct and factual. If asked "What was my last run?", just provide the run details without additional commentary.
+        - Only provide training advice, suggestions, or encouragement when explicitly asked for it.
+        - Keep responses brief and to the point.
+    """
+    
+    # Initialize OpenAI client
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        return jsonify({"error": "OpenAI API key not configured"}), 500
+    
+    # Don't hold a pooled DB connection while waiting on OpenAI
+    release_db_connection()
+    
+    try:
+        client = get_openai_client(openai_api_key)
+        
+        # Call OpenAI API
+        start_time = time.time()
+        response = create_completion(
+            client,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"{activity_context}\n\nUser Question: {message}"}
+            ],
+            temperature=0.3,  # Lower temperature for more factual, concise responses
+            max_tokens=300  # Reduced for more concise answers
+        )
+        
+        ai_response = response.choices[0].message.content
+        prompt_tokens = response.usage.prompt_tokens if response.usage else None
+        print(
+            f"Chat for user {user_id}: context ~{context_info['tokens']} tokens "
+            f"[{', '.join(context_info['sections'])}{', truncated' if context_info['truncated'] else ''}], "
+            f"prompt {prompt_tokens} tokens, {time.time() - start_time:.2f}s"
+        )
+        
+        return jsonify({
+            "response": ai_response,
+            "user_id": user_id
+        })
+    
+    except Exception as e:
+        print(f"OpenAI API error: {str(e)}")
+        return jsonify({"error": f"Failed to get AI response: {str(e)}"}), 500
@@ -0,0 +1,385 @@
+import gzip
+import time
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, current_app
+from models import (db, User, Activity, Badge, UserSyncStatus, ActivityStream, ActivityChange, UserSummary, Route,
+                    LeaderboardEntry, DailyActivitySummary)
+from leaderboards import update_user_leaderboards, prune_stale_boards, rebuild_rank_buckets
+from training_load import update_day_buckets
+from cache import CACHE_TTL, badge_cache, user_cache
+from sync_scheduler import get_sync_state, plan_sync, run_sync_all
+from export import EXPORT_FORMATS, export_chunks, format_available
+from archive_import import iter_archive_batches
+from changes import CHANGE_LOG_RETENTION_DAYS, compact_changes
+from summary import rebuild_summaries, check_summaries
+from route_clusters import cluster_routes
+from maintenance import slim_activity_data, restore_activity_data, delete_user, vacuum_database, table_sizes
+from strava_sync import StravaCredentials, strava_quota, refresh_user_token, store_activity_page, backfill_activity_history, finish_ingest, sync_user_by_id
+
+# Registered at the top level: `flask sync-all`, not `flask commands sync-all`
+bp = Blueprint("commands", __name__, cli_group=None)
+
+
+@bp.cli.command("init-db")
+def init_db_command():
+    """Initialize the database."""
+    db.create_all()
+    print("Initialized the database.")
+
+
+def note_unshared_cache(cache):
+    """Say when an invalidation made here can't reach the web workers."""
+    if not cache.backend.shared:
+        print(f"Note: CACHE_BACKEND=memory, so web workers keep their cached {cache.name} "
+              f"for up to {CACHE_TTL}s.")
+
+
+def invalidate_from_cli(cache, key):
+    cache.invalidate(key)
+    note_unshared_cache(cache)
+
+
+@bp.cli.command("seed-badges")
+def seed_badges_command():
+    """Seed the database with initial badges.
+
+    Web workers see the new badges at once through the shared cache; with
+    CACHE_BACKEND=memory they serve the old set until CACHE_TTL_SECONDS passes.
+    """
+    badges = [
+        {
+            "name": "First Run",
+            "description": "Completed your first run",
+            "icon": "one_run.png",
+            "criteria_type": "run_count",
+            "criteria_value": 1
+        },
+        {
+            "name": "10 Runs",
+            "description": "Completed 10 runs",
+            "icon": "ten_runs.png",
+            "criteria_type": "run_count",
+            "criteria_value": 10
+        },
+        {
+            "name": "100 km",
+            "description": "Ran a total of 100 kilometers",
+            "icon": "hundred_kms.png",
+            "criteria_type": "total_distance",
+            "criteria_value": 100000  # in meters
+        },
+        # Add more badges as needed
+    ]
+    
+    for badge_data in badges:
+        # Skip if badge with same name already exists
+        existing = Badge.query.filter_by(name=badge_data["name"]).first()
+        if existing:
+            print(f"Badge '{badge_data['name']}' already exists")
+            continue
+            
+        badge = Badge(**badge_data)
+        db.session.add(badge)
+        print(f"Added badge: {badge_data['name']}")
+    
+    db.session.commit()
+    invalidate_from_cli(badge_cache, "all")
+    print("Badges seeded successfully!")
+
+
+@bp.cli.command("rebuild-leaderboards")
+def rebuild_leaderboards_command():
+    """Recompute leaderboard entries for every user, drop ended periods and recount rank buckets."""
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).all()]
+    for user_id in user_ids:
+        update_user_leaderboards(user_id)
+        db.session.commit()
+    removed = prune_stale_boards()
+    rebuild_rank_buckets()
+    db.session.commit()
+    print(f"Rebuilt leaderboards for {len(user_ids)} users, pruned {removed} stale entries.")
+
+
+@bp.cli.command("rebuild-calendars")
+def rebuild_calendars_command():
+    """Recompute per-day calendar buckets for every user."""
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).all()]
+    total_days = 0
+    for user_id in user_ids:
+        total_days += update_day_buckets(user_id)
+    print(f"Rebuilt {total_days} calendar days for {len(user_ids)} users.")
+
+
+@bp.cli.command("rebuild-summaries")
+@click.option("--workers", default=4, show_default=True, help="Users recomputed at once.")
+@click.option("--batch-size", default=100, show_default=True, help="Users per commit.")
+def rebuild_summaries_command(workers, batch_size):
+    """Recompute the dashboard summary row for every user."""
+    start_time = time.time()
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id).all()]
+    rebuilt = rebuild_summaries(current_app._get_current_object(), user_ids, workers=workers, batch_size=batch_size)
+    print(f"Rebuilt {rebuilt} summaries in {time.time() - start_time:.1f}s.")
+
+
+@bp.cli.command("check-summaries")
+@click.option("--user-id", type=int, default=None, help="Check one user instead of everyone.")
+@click.option("--fix", is_flag=True, help="Rewrite summaries that don't match.")
+def check_summaries_command(user_id, fix):
+    """Compare stored dashboard summaries with a fresh recomputation."""
+    user_ids = [user_id] if user_id else [uid for (uid,) in db.session.query(User.id).order_by(User.id).all()]
+    problems = check_summaries(user_ids, fix=fix)
+    for uid, mismatches in problems.items():
+        details = ", ".join(f"{field} {stored!r} != {expected!r}" for field, (stored, expected) in mismatches.items())
+        print(f"User {uid}: {details}")
+    print(f"Checked {len(user_ids)} summaries, {len(problems)} mismatched{' and fixed' if fix and problems else ''}.")
+    if problems and not fix:
+        raise SystemExit(1)
+
+
+@bp.cli.command("cluster-routes")
+@click.option("--user-id", type=int, default=None, help="Cluster one user instead of everyone.")
+@click.option("--workers", type=int, default=None, help="Fingerprinting processes (default: one per CPU).")
+@click.option("--batch-size", default=500, show_default=True, help="Activities matched per commit.")
+@click.option("--rebuild", is_flag=True, help="Drop existing routes and match everything again.")
+def cluster_routes_command(user_id, workers, batch_size, rebuild):
+    """Group each user's activities that follow the same route."""
+    start_time = time.time()
+    user_ids = [user_id] if user_id else [uid for (uid,) in db.session.query(User.id).order_by(User.id).all()]
+    matched, routes = cluster_routes(user_ids, workers=workers, batch_size=batch_size, rebuild=rebuild)
+    print(f"Matched {matched} activities to {routes} routes for {len(user_ids)} users in {time.time() - start_time:.1f}s.")
+
+
+@bp.cli.command("sync-all")
+@click.option("--concurrency", default=4, show_default=True, help="Users synced at once.")
+@click.option("--limit", type=int, default=None, help="Maximum users per pass.")
+@click.option("--min-age-minutes", default=60, show_default=True, help="Skip users synced more recently than this.")
+@click.option("--reserve", default=20, show_default=True, help="Strava requests per window left for interactive refreshes.")
+@click.option("--loop", is_flag=True, help="Keep running, one pass every --interval seconds.")
+@click.option("--interval", default=900, show_default=True, help="Seconds between passes with --loop.")
+def sync_all_command(concurrency, limit, min_age_minutes, reserve, loop, interval):
+    """Refresh many users in priority order within the Strava rate limits."""
+    while True:
+        user_ids = plan_sync(min_age=timedelta(minutes=min_age_minutes), limit=limit)
+        print(f"Syncing {len(user_ids)} users")
+        summary = run_sync_all(
+            current_app._get_current_object(), sync_user_by_id, strava_quota, user_ids,
+            concurrency=concurrency, reserve=reserve, wait_for_quota=loop
+        )
+        print(f"Synced {summary['ok']} users, {summary['error']} errors, "
+              f"{summary['skipped']} skipped in {summary['duration']}s.")
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@bp.cli.command("backfill-history")
+@click.option("--user-id", type=int, default=None, help="Backfill one user instead of everyone.")
+@click.option("--max-pages", type=int, default=None, help="Strava pages per user this run.")
+@click.option("--reserve", default=20, show_default=True, help="Stop when fewer Strava requests than this remain.")
+def backfill_history_command(user_id, max_pages, reserve):
+    """Fill gaps in stored history by walking each user's Strava activities backward."""
+    if user_id:
+        user_ids = [user_id]
+    else:
+        # Users whose backfill hasn't finished yet
+        user_ids = [uid for (uid,) in db.session.query(User.id).outerjoin(
+            UserSyncStatus, UserSyncStatus.user_id == User.id
+        ).filter(UserSyncStatus.backfill_completed_at.is_(None)).all()]
+    
+    for uid in user_ids:
+        short_left, daily_left = strava_quota.remaining()
+        if min(short_left, daily_left) < reserve:
+            print("Strava quota low; stopping. Run again to resume from the saved cursor.")
+            break
+        user = User.query.get(uid)
+        if not user:
+            continue
+        credentials = StravaCredentials.from_user(user)
+        try:
+            refresh_user_token(credentials)
+            added, finished = backfill_activity_history(credentials, max_pages=max_pages)
+            print(f"User {uid}: added {added} activities{', history complete' if finished else ''}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Backfill error for user {uid}: {str(e)}")
+
+
+@bp.cli.command("import-archive")
+@click.argument("archive_path", type=click.Path(exists=True))
+@click.option("--user-id", type=int, required=True, help="User the archive belongs to.")
+@click.option("--workers", type=int, default=None, help="Track parsing processes (default: one per CPU).")
+@click.option("--batch-size", default=200, show_default=True, help="Activities stored per commit.")
+def import_archive_command(archive_path, user_id, workers, batch_size):
+    """Load a user's history from a Strava bulk-export archive without calling the API."""
+    if not db.session.get(User, user_id):
+        raise click.ClickException(f"User {user_id} not found; they need to sign in once first")
+    
+    start_time = time.time()
+    activities_added = 0
+    activities_seen = 0
+    for batch in iter_archive_batches(archive_path, workers=workers, batch_size=batch_size):
+        activities_added += store_activity_page(user_id, batch)
+        activities_seen += len(batch)
+        db.session.commit()
+    
+    # The archive holds the full history up to its export date, so the API import only
+    # needs to fetch what's newer and the backfill has nothing left to do
+    state = get_sync_state(user_id)
+    if state.import_status in ('in_progress', 'failed'):
+        state.import_status = 'complete'
+        state.import_before = None
+        state.import_after = None
+    state.backfill_before = None
+    state.backfill_completed_at = datetime.utcnow()
+    db.session.commit()
+    
+    finish_ingest(user_id)
+    print(f"Imported {activities_added} of {activities_seen} activities in {time.time() - start_time:.1f}s.")
+
+
+@bp.cli.command("export-activities")
+@click.option("--user-id", type=int, default=None, help="Export one user instead of the whole table.")
+@click.option("--format", "export_format", type=click.Choice(list(EXPORT_FORMATS)), default="ndjson", show_default=True)
+@click.option("--output", default="-", show_default=True, help="File to write; - for stdout.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows fetched per database round trip.")
+@click.option("--type", "activity_type", default=None, help="Export one activity type, e.g. Ride.")
+def export_activities_command(user_id, export_format, output, batch_size, activity_type):
+    """Dump activities to NDJSON, CSV or Parquet with constant memory."""
+    if not format_available(export_format):
+        raise click.ClickException("Parquet export needs pyarrow installed")
+    
+    with click.open_file(output, "wb") as f:
+        for chunk in export_chunks(export_format, user_id, batch_size, activity_type):
+            f.write(chunk)
+
+
+@bp.cli.command("compact-changes")
+@click.option("--retention-days", default=CHANGE_LOG_RETENTION_DAYS, show_default=True, help="Days to keep deletion entries.")
+def compact_changes_command(retention_days):
+    """Drop superseded and expired activity change-log entries."""
+    superseded, expired = compact_changes(retention_days)
+    print(f"Removed {superseded} superseded and {expired} expired change-log entries.")
+
+
+@bp.cli.command("slim-activity-data")
+@click.option("--older-than-days", default=365, show_default=True, help="Only activities that started longer ago than this.")
+@click.option("--archive", type=click.Path(dir_okay=False), default=None, help="Gzipped NDJSON file to append the payloads to first.")
+@click.option("--batch-size", default=1000, show_default=True, help="Activities per commit.")
+@click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+def slim_activity_data_command(older_than_days, archive, batch_size, pause):
+    """Drop the raw Strava payload of old activities; they are served from their columns.
+
+    Each batch is recorded in the users' change logs and bumps their change_seq, so cached
+    response bodies are rebuilt and syncing clients pick up the slim shape.
+    """
+    start_time = time.time()
+    if archive:
+        with gzip.open(archive, "at") as f:
+            slimmed, dropped = slim_activity_data(older_than_days, batch_size, archive=f, pause=pause)
+    else:
+        slimmed, dropped = slim_activity_data(older_than_days, batch_size, pause=pause)
+    print(f"Slimmed {slimmed} activities, dropping {dropped / 1e6:.1f} MB of payloads in {time.time() - start_time:.1f}s.")
+
+
+@bp.cli.command("restore-activity-data")
+@click.argument("archive_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=1000, show_default=True, help="Activities per commit.")
+def restore_activity_data_command(archive_path, batch_size):
+    """Put raw payloads from a slim-activity-data archive back.
+
+    Like slim-activity-data, restored activities are recorded in the change logs.
+    """
+    with gzip.open(archive_path, "rt") as f:
+        restored = restore_activity_data(f, batch_size)
+    print(f"Restored {restored} activity payloads.")
+
+
+@bp.cli.command("delete-users")
+@click.option("--user-id", "user_ids", type=int, multiple=True, required=True, help="User to delete; repeat for several.")
+@click.option("--batch-size", default=1000, show_default=True, help="Activities deleted per commit.")
+@click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+def delete_users_command(user_ids, batch_size, pause):
+    """Delete users and everything they own, in bounded batches.
+
+    Web workers stop finding the users at once through the shared cache; with
+    CACHE_BACKEND=memory they keep resolving them until CACHE_TTL_SECONDS passes.
+    """
+    for user_id in user_ids:
+        if not db.session.get(User, user_id):
+            print(f"User {user_id} not found")
+            continue
+        deleted = delete_user(user_id, batch_size, pause=pause)
+        print(f"Deleted user {user_id} and {deleted} activities.")
+    note_unshared_cache(user_cache)
+
+
+@bp.cli.command("vacuum-db")
+@click.option("--table", "tables", multiple=True, help="Only this table; repeat for several (Postgres VACUUM and all ANALYZE/REINDEX).")
+@click.option("--analyze-only", is_flag=True, help="Refresh planner statistics without vacuuming.")
+@click.option("--reindex", is_flag=True, help="Rebuild indexes too.")
+def vacuum_db_command(tables, analyze_only, reindex):
+    """Run ANALYZE, VACUUM and REINDEX the way the database dialect allows."""
+    try:
+        timings = vacuum_database(tables, analyze_only=analyze_only, reindex=reindex)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for statement, seconds in timings:
+        print(f"{statement}: {seconds:.2f}s")
+
+
+@bp.cli.command("db-sizes")
+@click.option("--indexes/--no-indexes", default=True, show_default=True, help="List every index too.")
+def db_sizes_command(indexes):
+    """Report rows, table size and index size of every table, largest first."""
+    tables, index_sizes = table_sizes()
+    print(f"{'table':<28} {'rows':>10} {'table MB':>10} {'index MB':>10}")
+    for row in tables:
+        print(f"{row['table']:<28} {row['rows']:>10} {row['table_bytes'] / 1e6:>10.2f} {row['index_bytes'] / 1e6:>10.2f}")
+    if indexes:
+        print(f"\n{'index':<48} {'table':<28} {'MB':>10}")
+        for row in index_sizes:
+            print(f"{row['index']:<48} {row['table']:<28} {row['bytes'] / 1e6:>10.2f}")
+
+
+@bp.cli.command("delete-all-activities")
+def delete_all_activities():
+    """Delete all activities from the database."""
+    # Bulk deletes skip ORM cascades, and SQLite doesn't enforce ON DELETE CASCADE
+    ActivityStream.query.delete()
+    num_deleted = Activity.query.delete()
+    Route.query.delete()
+    # What rebuild-leaderboards and rebuild-calendars give with no activities
+    LeaderboardEntry.query.update({LeaderboardEntry.value: 0})
+    rebuild_rank_buckets()
+    DailyActivitySummary.query.delete()
+    # Empty the change log and move every floor past it so clients reset
+    ActivityChange.query.delete()
+    UserSyncStatus.query.update({
+        UserSyncStatus.change_seq: UserSyncStatus.change_seq + 1,
+        UserSyncStatus.change_floor: UserSyncStatus.change_seq + 1
+    })
+    UserSummary.query.update({
+        UserSummary.run_count: 0,
+        UserSummary.run_distance: 0,
+        UserSummary.run_moving_time: 0,
+        UserSummary.run_elevation_gain: 0,
+        UserSummary.latest_run_id: None,
+        UserSummary.latest_run_date: None
+    })
+    db.session.commit()
+    print(f"Deleted {num_deleted} activities.")
+
+
+@bp.cli.command("delete-all-badges")
+def delete_all_badges():
+    """Delete all badges from the database.
+
+    As with seed-badges, web workers on CACHE_BACKEND=memory serve the old set until
+    CACHE_TTL_SECONDS passes.
+    """
+    num_deleted = Badge.query.delete()
+    UserSummary.query.update({UserSummary.badge_count: 0})
+    db.session.commit()
+    invalidate_from_cli(badge_cache, "all")
+    print(f"Deleted {num_deleted} badges.")
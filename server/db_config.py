@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+from sqlalchemy.engine import Engine
+from metrics import record_replica_fallback
+
+# Flask-SQLAlchemy bind key of the read replica's engine
+REPLICA_BIND = "replica"
+
+
+def get_database_uri(variable="DATABASE_URL"):
+    """A database URL from env with the legacy postgres:// scheme (Render/Heroku) mapped to postgresql://."""
+    uri = os.getenv(variable)
+    if uri and uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def get_engine_options(uri):
+    """Per-dialect SQLAlchemy engine options, overridable from env."""
+    if not uri or uri.startswith("sqlite"):
+        # Pool sizing doesn't apply to SQLite; the busy wait is set by pragma on connect
+        return {}
+
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),  # below typical server idle timeouts
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+
+
+def get_sqlite_pragmas():
+    return {
+        # WAL lets readers proceed while one writer commits, instead of locking the whole file
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        # Wait this long for a competing writer instead of failing with "database is locked"
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 15000)),
+        # NORMAL is durable across app crashes in WAL mode and avoids an fsync per commit
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        # Negative values are KiB
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", 20000)),
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for name, value in get_sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def configure_database(app):
+    """Set the database URI, engine options and SQLite pragmas. Call before db.init_app.
+
+    With DATABASE_REPLICA_URL set, GET requests read from that replica (see db_routing.py).
+    """
+    uri = get_database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(uri)
+
+    replica_uri = get_database_uri("DATABASE_REPLICA_URL")
+    if replica_uri:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: {"url": replica_uri, **get_engine_options(replica_uri)}}
+
+    if not event.contains(Engine, "connect", set_sqlite_pragmas):
+        event.listen(Engine, "connect", set_sqlite_pragmas)
+
+
+class RoutingSession(Session):
+    """db.session that sends plain SELECTs to the read replica while info["read_replica"] is set.
+
+    Anything else (a flush, a write statement, SELECT ... FOR UPDATE) goes to the primary
+    and pins the session there, so the rest of the request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get("read_replica"):
+            if not self._flushing and isinstance(clause, Select) and clause._for_update_arg is None:
+                return self._db.engines[REPLICA_BIND]
+            if self._flushing or clause is not None:  # not a bare dialect lookup
+                self.info["read_replica"] = False
+                record_replica_fallback("write")
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
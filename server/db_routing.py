@@ -0,0 +1,53 @@
+"""Read-replica routing for GET requests.
+
+With DATABASE_REPLICA_URL set, every GET request reads through the replica bind unless
+its view is marked @primary_only (GET endpoints that write). Once a request writes, the
+session stays on the primary (see db_config.RoutingSession).
+
+Replica lag is handled with the user's change-log version: a client that has seen
+change_seq N (from /api/refresh or the changes feed) passes ?min_seq=N, and a request
+for that user falls back to the primary while the replica is still behind it.
+"""
+from flask import request
+from models import db
+from db_config import REPLICA_BIND
+from changes import get_change_seq
+from metrics import record_replica_fallback
+
+
+def primary_only(view):
+    """Mark a GET view that writes: the whole request reads and writes the primary."""
+    view.primary_only = True
+    return view
+
+
+def reading_replica():
+    return db.session.info.get("read_replica", False)
+
+
+def use_primary():
+    """Read from the primary for the rest of this request."""
+    db.session.info["read_replica"] = False
+
+
+def require_change_seq(user_id, min_seq):
+    """Move this request to the primary if the replica hasn't reached the user's change `min_seq`."""
+    if min_seq > 0 and reading_replica() and get_change_seq(user_id) < min_seq:
+        use_primary()
+        record_replica_fallback("lag")
+
+
+def init_read_routing(app):
+    """Send GET requests to the replica bind, when one is configured."""
+    @app.before_request
+    def route_reads():
+        if request.method != "GET" or REPLICA_BIND not in db.engines:
+            return
+        view = app.view_functions.get(request.endpoint)
+        if view is None or getattr(view, "primary_only", False):
+            return
+        db.session.info["read_replica"] = True
+
+        user_id = (request.view_args or {}).get("user_id")
+        if user_id is not None:
+            require_change_seq(user_id, request.args.get("min_seq", 0, type=int))
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+from models import db, Activity
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+
+EXPORT_COLUMNS = [
+    Activity.id, Activity.user_id, Activity.name, Activity.type, Activity.start_date,
+    Activity.distance, Activity.moving_time, Activity.elapsed_time, Activity.total_elevation_gain,
+    Activity.polyline, Activity.start_latlng, Activity.end_latlng,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def iter_activity_rows(user_id=None, batch_size=1000, activity_type=None):
+    """Activity rows as dicts, oldest first, for one user or the whole table (optionally one sport).
+
+    Selects plain columns rather than ORM objects and fetches in batches of `batch_size`
+    (a server-side cursor on Postgres), so memory stays flat however many rows there are.
+    """
+    query = db.select(*EXPORT_COLUMNS).order_by(Activity.user_id, Activity.start_date, Activity.id)
+    if user_id is not None:
+        query = query.where(Activity.user_id == user_id)
+    if activity_type is not None:
+        query = query.where(Activity.type == activity_type)
+
+    for row in db.session.execute(query.execution_options(yield_per=batch_size)):
+        yield row._asdict()
+
+
+def ndjson_chunks(rows, batch_size=1000):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({**row, "start_date": row["start_date"].isoformat() + "Z"}))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def csv_chunks(rows, batch_size=1000):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow({**row, "start_date": row["start_date"].isoformat() + "Z"})
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue().encode()
+
+
+class ChunkSink:
+    """Write-only file that hands out what has been written so far, for streaming Parquet."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # The Parquet writer records row group offsets from this, so it counts drained bytes too
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema():
+    return pa.schema([
+        ("id", pa.int64()), ("user_id", pa.int64()), ("name", pa.string()), ("type", pa.string()),
+        ("start_date", pa.timestamp("s")), ("distance", pa.float64()), ("moving_time", pa.int64()),
+        ("elapsed_time", pa.int64()), ("total_elevation_gain", pa.float64()), ("polyline", pa.string()),
+        ("start_latlng", pa.string()), ("end_latlng", pa.string()),
+    ])
+
+
+def parquet_chunks(rows, batch_size=10000):
+    """One Parquet row group per `batch_size` rows, yielded as each group is written."""
+    schema = parquet_schema()
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy")
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(export_format, user_id=None, batch_size=1000, activity_type=None):
+    """Encoded export of the user's (or everyone's) activities, as an iterator of bytes."""
+    rows = iter_activity_rows(user_id, batch_size, activity_type)
+    if export_format == "ndjson":
+        return ndjson_chunks(rows, batch_size)
+    if export_format == "csv":
+        return csv_chunks(rows, batch_size)
+    # Parquet row groups are worth making larger than the fetch batches
+    return parquet_chunks(rows, max(batch_size, 10000))
+
+
+def format_available(export_format):
+    return export_format in EXPORT_FORMATS and (export_format != "parquet" or pa is not None)
@@ -0,0 +1,25 @@
+# Gunicorn settings, read from the environment so Render (or any host) can switch modes.
+#
+#   WEB_WORKER_CLASS=sync    default; one request in flight per worker
+#   WEB_WORKER_CLASS=gevent  cooperative workers; /api/chat, /callback and /api/refresh
+#                            yield while waiting on OpenAI/Strava, so one process
+#                            serves WEB_WORKER_CONNECTIONS requests concurrently
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5050')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = os.getenv("WEB_WORKER_CLASS", "sync")
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 100))
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+
+
+def post_fork(server, worker):
+    if worker_class != "gevent":
+        return
+
+    # psycopg2 blocks the whole process unless its wait callback yields to the gevent hub
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        server.log.warning("psycogreen not installed; Postgres queries will block the gevent worker")
@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify, request
+from leaderboards import PERIODS, METRICS, get_leaderboard_page, get_user_rank
+
+bp = Blueprint("leaderboards", __name__)
+
+
+@bp.route("/api/leaderboards/<period>/<metric>")
+def get_leaderboard(period, metric):
+    """Paginated top-N read of a precomputed leaderboard"""
+    if period not in PERIODS or metric not in METRICS:
+        return jsonify({"error": "Unknown leaderboard"}), 404
+    
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 100)
+    
+    return jsonify(get_leaderboard_page(period, metric, page=page, per_page=per_page))
+
+
+@bp.route("/api/leaderboards/<period>/<metric>/<int:user_id>")
+def get_leaderboard_rank(period, metric, user_id):
+    """Get a single user's rank on a leaderboard"""
+    if period not in PERIODS or metric not in METRICS:
+        return jsonify({"error": "Unknown leaderboard"}), 404
+    
+    rank = get_user_rank(user_id, period, metric)
+    if not rank:
+        return jsonify({"error": "User not ranked"}), 404
+    
+    return jsonify(rank)
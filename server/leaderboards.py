@@ -0,0 +1,238 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, User, Activity, LeaderboardEntry, LeaderboardRankBucket
+
+PERIODS = ('week', 'month', 'all')
+METRICS = ('distance', 'runs', 'elevation')
+
+# Rank buckets: a 16-ary tree of entry counts over whole value units (metres, runs), 7
+# levels deep, so values up to 2^28 - 1 (268,435 km) get their own bucket and larger
+# ones share the top one. Level RANK_LEVELS is a single root row holding the board size.
+RANK_FANOUT_BITS = 4
+RANK_LEVELS = 7
+RANK_MAX_BUCKET = 2 ** (RANK_FANOUT_BITS * RANK_LEVELS) - 1
+
+
+def rank_bucket(value):
+    return min(int(value), RANK_MAX_BUCKET)
+
+
+def bucket_path(bucket):
+    """(level, prefix) of every tree node counting `bucket`, root last."""
+    return [(level, bucket >> (RANK_FANOUT_BITS * level)) for level in range(RANK_LEVELS)] + [(RANK_LEVELS, 0)]
+
+
+def apply_bucket_deltas(deltas):
+    """Add {(period, period_key, metric, level, prefix): delta} to the rank buckets; the caller commits.
+
+    Atomic increments, in key order, so concurrent ingests for one board neither lose
+    counts nor deadlock.
+    """
+    rows = [{"period": key[0], "period_key": key[1], "metric": key[2], "level": key[3], "prefix": key[4],
+             "entries": delta} for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    dialect = postgresql if db.engine.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(LeaderboardRankBucket)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=["period", "period_key", "metric", "level", "prefix"],
+        set_={"entries": LeaderboardRankBucket.entries + statement.excluded.entries}
+    ), rows)
+
+
+def add_entry_deltas(deltas, board, value, sign):
+    """Stage +1/-1 along the path of `value`'s bucket on `board` (period, period_key, metric)."""
+    for level, prefix in bucket_path(rank_bucket(value)):
+        key = board + (level, prefix)
+        deltas[key] = deltas.get(key, 0) + sign
+
+
+def period_bounds(period, now=None):
+    """Return (period_key, start_date) for the current week/month/all-time board."""
+    now = now or datetime.utcnow()
+    if period == 'week':
+        # Weeks start on Monday to match the client's weekly mileage chart
+        start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime('%Y-%m-%d'), start
+    if period == 'month':
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime('%Y-%m'), start
+    return 'all', None
+
+
+def update_user_leaderboards(user_id, now=None):
+    """Recompute one user's entries on every board and their rank buckets. Called after each ingest.
+
+    The caller commits, together with the sync that changed the activities. Only tree
+    levels where the old and new buckets differ are written; the root only for new entries.
+    """
+    deltas = {}
+    for period in PERIODS:
+        period_key, start_date = period_bounds(period, now)
+
+        # Aggregate only this user's runs in the period (served by idx_user_date)
+        query = db.session.query(
+            func.count(Activity.id),
+            func.coalesce(func.sum(Activity.distance), 0),
+            func.coalesce(func.sum(Activity.total_elevation_gain), 0)
+        ).filter(Activity.user_id == user_id, Activity.type == 'Run')
+        if start_date is not None:
+            query = query.filter(Activity.start_date >= start_date)
+        runs, distance, elevation = query.one()
+
+        values = {'distance': float(distance), 'runs': float(runs), 'elevation': float(elevation)}
+        for metric, value in values.items():
+            board = (period, period_key, metric)
+            entry = db.session.get(LeaderboardEntry, board + (user_id,), with_for_update=True)
+            if entry:
+                if rank_bucket(entry.value) != rank_bucket(value):
+                    add_entry_deltas(deltas, board, entry.value, -1)
+                    add_entry_deltas(deltas, board, value, 1)
+                entry.value = value
+            else:
+                add_entry_deltas(deltas, board, value, 1)
+                db.session.add(LeaderboardEntry(
+                    period=period,
+                    period_key=period_key,
+                    metric=metric,
+                    user_id=user_id,
+                    value=value
+                ))
+    apply_bucket_deltas(deltas)
+
+
+def remove_user_leaderboards(user_id):
+    """Delete a user's entries from every board, taking them out of the rank buckets; the caller commits."""
+    deltas = {}
+    entries = LeaderboardEntry.query.filter_by(user_id=user_id).with_for_update().all()
+    for entry in entries:
+        add_entry_deltas(deltas, (entry.period, entry.period_key, entry.metric), entry.value, -1)
+        db.session.delete(entry)
+    apply_bucket_deltas(deltas)
+
+
+def rebuild_rank_buckets():
+    """Recount every board's rank buckets from its entries, after bulk changes to leaderboard_entries."""
+    LeaderboardRankBucket.query.delete()
+    deltas = {}
+    entries = db.session.query(
+        LeaderboardEntry.period, LeaderboardEntry.period_key, LeaderboardEntry.metric, LeaderboardEntry.value
+    ).yield_per(10000)
+    for period, period_key, metric, value in entries:
+        add_entry_deltas(deltas, (period, period_key, metric), value, 1)
+    apply_bucket_deltas(deltas)
+
+
+def board_size(period, period_key, metric):
+    """Entries on a board, from its root rank bucket."""
+    root = db.session.get(LeaderboardRankBucket, (period, period_key, metric, RANK_LEVELS, 0))
+    return root.entries if root else 0
+
+
+def get_leaderboard_page(period, metric, page=1, per_page=50, now=None):
+    """Return one page of a board, highest value first."""
+    period_key, _ = period_bounds(period, now)
+    total = board_size(period, period_key, metric)
+    rows = db.session.query(LeaderboardEntry, User).join(
+        User, User.id == LeaderboardEntry.user_id
+    ).filter(
+        LeaderboardEntry.period == period,
+        LeaderboardEntry.period_key == period_key,
+        LeaderboardEntry.metric == metric
+    ).order_by(
+        LeaderboardEntry.value.desc(),
+        LeaderboardEntry.user_id
+    ).offset((page - 1) * per_page).limit(per_page).all()
+
+    entries = []
+    for position, (entry, user) in enumerate(rows):
+        entries.append({
+            "rank": (page - 1) * per_page + position + 1,
+            "user_id": user.id,
+            "firstname": user.firstname,
+            "lastname": user.lastname,
+            "profile": user.profile,
+            "value": entry.value
+        })
+
+    return {
+        "period": period,
+        "period_key": period_key,
+        "metric": metric,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "entries": entries
+    }
+
+
+def get_user_rank(user_id, period, metric, now=None):
+    """Return a user's rank on a board, or None if the user has no entry yet.
+
+    Entries in higher buckets are summed from at most 15 sibling nodes per tree level,
+    read as one PK range each, and only the user's own bucket (one value unit) is counted
+    from idx_board_value: O(log of the value range) rows, whatever the board size.
+    """
+    period_key, _ = period_bounds(period, now)
+    entry = db.session.get(LeaderboardEntry, (period, period_key, metric, user_id))
+    if not entry:
+        return None
+
+    # Ties share a rank: count entries with a higher value, first whole buckets above...
+    bucket = rank_bucket(entry.value)
+    # One primary-key range per level (SQLite would scan the whole board for an OR of them)
+    sibling_ranges = []
+    for level, prefix in bucket_path(bucket)[:RANK_LEVELS]:
+        last_sibling = prefix | (2 ** RANK_FANOUT_BITS - 1)
+        if prefix < last_sibling:
+            sibling_ranges.append(select(LeaderboardRankBucket.entries).where(
+                LeaderboardRankBucket.period == period,
+                LeaderboardRankBucket.period_key == period_key,
+                LeaderboardRankBucket.metric == metric,
+                LeaderboardRankBucket.level == level,
+                LeaderboardRankBucket.prefix.between(prefix + 1, last_sibling)
+            ))
+    ahead = 0
+    if sibling_ranges:
+        siblings = union_all(*sibling_ranges).subquery()
+        ahead = db.session.execute(select(func.coalesce(func.sum(siblings.c.entries), 0))).scalar()
+
+    # ...then those higher up the user's own bucket
+    same_bucket = LeaderboardEntry.query.filter(
+        LeaderboardEntry.period == period,
+        LeaderboardEntry.period_key == period_key,
+        LeaderboardEntry.metric == metric,
+        LeaderboardEntry.value > entry.value
+    )
+    if bucket < RANK_MAX_BUCKET:
+        same_bucket = same_bucket.filter(LeaderboardEntry.value < bucket + 1)
+    ahead += same_bucket.count()
+    total = board_size(period, period_key, metric)
+
+    return {
+        "user_id": user_id,
+        "period": period,
+        "period_key": period_key,
+        "metric": metric,
+        "value": entry.value,
+        "rank": ahead + 1,
+        "total": total
+    }
+
+
+def prune_stale_boards(now=None):
+    """Delete week/month entries, and their rank buckets, from periods that have ended."""
+    removed = 0
+    for period in ('week', 'month'):
+        period_key, _ = period_bounds(period, now)
+        removed += LeaderboardEntry.query.filter(
+            LeaderboardEntry.period == period,
+            LeaderboardEntry.period_key != period_key
+        ).delete(synchronize_session=False)
+        LeaderboardRankBucket.query.filter(
+            LeaderboardRankBucket.period == period,
+            LeaderboardRankBucket.period_key != period_key
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
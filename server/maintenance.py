@@ -0,0 +1,197 @@
+"""Batched maintenance for a large database: slimming old payloads, deleting users, vacuum and sizes.
+
+Every write here commits per batch of rows, so locks are held for one batch at a time
+and a long run can be stopped and started again where it left off.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, text, update
+from models import (db, User, Activity, ActivityStream, ActivityChange, UserBadge, DailyActivitySummary,
+                    UserSyncStatus, UserSummary, Route)
+from cache import user_cache
+from changes import record_changes
+from leaderboards import remove_user_leaderboards
+
+
+def slim_activity_data(older_than_days=365, batch_size=1000, archive=None, pause=0):
+    """Drop the raw Strava payload of activities that started more than `older_than_days` ago.
+
+    Those activities are then served from their columns (see Activity.activity_data).
+    With `archive` (a text file), each payload is written to it as an NDJSON line before
+    it is dropped, so restore_activity_data can bring it back. Each batch records the
+    activities in their users' change logs, which moves change_seq so cached bodies are
+    rebuilt and delta-syncing clients get the slim shape too. Returns (activities, bytes dropped).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    slimmed = dropped = 0
+    after_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Activity.id, Activity.user_id, Activity.activity_data_text).where(
+                Activity.start_date < cutoff, Activity.activity_data_text.isnot(None), Activity.id > after_id
+            ).order_by(Activity.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        after_id = rows[-1].id
+
+        if archive is not None:
+            archive.writelines(f'{{"id": {row.id}, "user_id": {row.user_id}, "activity": {row.activity_data_text}}}\n'
+                               for row in rows)
+            archive.flush()  # archived before the rows are changed
+        db.session.execute(update(Activity).where(Activity.id.in_([row.id for row in rows]))
+                           .values(activity_data_text=None), execution_options={"synchronize_session": False})
+        _record_batch_changes((row.user_id, row.id) for row in rows)
+        db.session.commit()
+        slimmed += len(rows)
+        dropped += sum(len(row.activity_data_text) for row in rows)
+        if pause:
+            time.sleep(pause)
+    return slimmed, dropped
+
+
+def restore_activity_data(archive, batch_size=1000):
+    """Put payloads from a slim_activity_data archive back on activities that still lack one. Returns the count.
+
+    Restored activities are recorded in the change log, as slimmed ones are.
+    """
+    restored = 0
+    batch = []
+    for line in archive:
+        if line.strip():
+            entry = json.loads(line)
+            batch.append({"id": entry["id"], "data": json.dumps(entry["activity"])})
+        if len(batch) >= batch_size:
+            restored += _restore_batch(batch)
+            batch = []
+    if batch:
+        restored += _restore_batch(batch)
+    return restored
+
+
+def _restore_batch(batch):
+    missing = dict(db.session.query(Activity.id, Activity.user_id).filter(
+        Activity.id.in_([entry["id"] for entry in batch]), Activity.activity_data_text.is_(None)
+    ).all())
+    values = [{"id": entry["id"], "activity_data_text": entry["data"]} for entry in batch if entry["id"] in missing]
+    if values:
+        db.session.execute(update(Activity), values)
+        _record_batch_changes((missing[value["id"]], value["id"]) for value in values)
+    db.session.commit()
+    return len(values)
+
+
+def _record_batch_changes(user_activity_ids):
+    """Record a batch's changed activities in each of their users' change logs."""
+    by_user = {}
+    for user_id, activity_id in user_activity_ids:
+        by_user.setdefault(user_id, []).append(activity_id)
+    for user_id in sorted(by_user):
+        record_changes(user_id, upserted=by_user[user_id])
+
+
+def delete_user(user_id, batch_size=1000, pause=0):
+    """Delete a user and everything they own, activities `batch_size` at a time. Returns activities deleted.
+
+    Bulk deletes skip ORM cascades (and SQLite doesn't enforce ON DELETE CASCADE), so
+    child rows go explicitly, children before parents.
+    """
+    deleted = 0
+    while True:
+        ids = [activity_id for (activity_id,) in db.session.query(Activity.id).filter(
+            Activity.user_id == user_id
+        ).order_by(Activity.id).limit(batch_size)]
+        if not ids:
+            break
+        db.session.execute(delete(ActivityStream).where(ActivityStream.activity_id.in_(ids)))
+        db.session.execute(delete(Activity).where(Activity.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+
+    # At most a few rows per day or route: one transaction is short
+    remove_user_leaderboards(user_id)
+    for model in (Route, ActivityChange, UserBadge, DailyActivitySummary, UserSyncStatus, UserSummary):
+        db.session.execute(delete(model).where(model.user_id == user_id))
+    db.session.execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+    user_cache.invalidate(user_id)
+    return deleted
+
+
+def table_names(tables=None):
+    names = [table.name for table in db.metadata.sorted_tables]
+    if tables:
+        unknown = set(tables) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        names = [name for name in names if name in tables]
+    return names
+
+
+def vacuum_database(tables=None, analyze_only=False, reindex=False):
+    """ANALYZE, VACUUM and optionally REINDEX, one table at a time where the dialect allows.
+
+    Postgres: VACUUM (ANALYZE) per table, which doesn't block reads or writes, and REINDEX
+    TABLE CONCURRENTLY. SQLite can only VACUUM the whole file, which locks it throughout;
+    the WAL is truncated afterwards. Returns [(statement, seconds)].
+    """
+    names = table_names(tables)
+    statements = []
+    if db.engine.dialect.name == "postgresql":
+        for name in names:
+            statements.append(f"ANALYZE {name}" if analyze_only else f"VACUUM (ANALYZE) {name}")
+            if reindex:
+                statements.append(f"REINDEX TABLE CONCURRENTLY {name}")
+    else:
+        statements.extend(f"ANALYZE {name}" for name in names)
+        if reindex:
+            statements.extend(f"REINDEX {name}" for name in names)
+        if not analyze_only:
+            statements.extend(["VACUUM", "PRAGMA wal_checkpoint(TRUNCATE)"])
+
+    timings = []
+    # VACUUM and REINDEX CONCURRENTLY can't run inside a transaction
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for statement in statements:
+            start = time.perf_counter()
+            connection.execute(text(statement))
+            timings.append((statement, time.perf_counter() - start))
+    return timings
+
+
+def table_sizes():
+    """Rows, table bytes and index bytes of every table in the database, plus per-index bytes, largest first.
+
+    Returns (tables, indexes): [{"table", "rows", "table_bytes", "index_bytes"}] and
+    [{"index", "table", "bytes"}]. Row counts are the planner's estimates on Postgres.
+    """
+    if db.engine.dialect.name == "postgresql":
+        tables = [dict(row._mapping) for row in db.session.execute(text(
+            "SELECT relname AS \"table\", n_live_tup AS \"rows\", pg_table_size(relid) AS table_bytes, "
+            "pg_indexes_size(relid) AS index_bytes FROM pg_stat_user_tables"
+        ))]
+        indexes = [dict(row._mapping) for row in db.session.execute(text(
+            "SELECT indexrelname AS \"index\", relname AS \"table\", pg_relation_size(indexrelid) AS bytes "
+            "FROM pg_stat_user_indexes"
+        ))]
+    else:
+        # Bytes per table or index from the dbstat virtual table (search's FTS5 shadow tables included)
+        pages = dict(db.session.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+        objects = db.session.execute(text(
+            "SELECT type, name, tbl_name FROM sqlite_master "
+            "WHERE type = 'index' OR (type = 'table' AND name NOT LIKE 'sqlite_%')"
+        )).all()
+        indexes = [{"index": name, "table": table, "bytes": pages.get(name, 0)}
+                   for kind, name, table in objects if kind == "index"]
+        tables = [{
+            "table": name,
+            "rows": db.session.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar(),
+            "table_bytes": pages.get(name, 0),
+            "index_bytes": sum(index["bytes"] for index in indexes if index["table"] == name)
+        } for kind, name, _ in objects if kind == "table"]
+    tables.sort(key=lambda row: row["table_bytes"] + row["index_bytes"], reverse=True)
+    indexes.sort(key=lambda row: row["bytes"], reverse=True)
+    return tables, indexes
@@ -0,0 +1,225 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000)
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.callbacks = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            self.values[key] = value
+
+    def set_function(self, callback, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            self.callbacks[key] = callback
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            values = dict(self.values)
+            callbacks = dict(self.callbacks)
+        for key, callback in callbacks.items():
+            try:
+                values[key] = callback()
+            except Exception as e:
+                print(f"Metrics gauge error ({self.name}): {str(e)}")
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}  # {label key: [bucket counts..., sum, count]}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            state = self.values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, state in sorted(self.values.items()):
+                for i, bound in enumerate(self.buckets):
+                    bucket_labels = format_labels(self.labels + ("le",), key + (str(bound),))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {state[i]}")
+                inf_labels = format_labels(self.labels + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{inf_labels} {state[-1]}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {round(state[-2], 6)}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Registry of every metric exposed on /metrics
+http_requests = Counter("runhub_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+http_latency = Histogram("runhub_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+db_queries = Histogram("runhub_db_queries_per_request", "SQL statements executed per request.", ("route",), QUERY_COUNT_BUCKETS)
+db_time = Histogram("runhub_db_time_per_request_seconds", "Time spent in SQL per request.", ("route",))
+db_queries_total = Counter("runhub_db_queries_total", "SQL statements executed, in or out of a request.")
+external_requests = Counter("runhub_external_requests_total", "Outbound HTTP calls by service, endpoint and status.", ("service", "endpoint", "status"))
+external_latency = Histogram("runhub_external_request_duration_seconds", "Outbound HTTP call latency.", ("service", "endpoint"))
+openai_latency = Histogram("runhub_openai_request_duration_seconds", "OpenAI completion latency.", ("model",))
+openai_tokens = Counter("runhub_openai_tokens_total", "OpenAI tokens used by model and kind.", ("model", "kind"))
+chat_context_tokens = Histogram("runhub_chat_context_tokens", "Estimated tokens of activity context per chat prompt.", buckets=TOKEN_BUCKETS)
+cache_requests = Counter("runhub_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+response_bytes = Counter("runhub_http_response_bytes_total", "Response body bytes sent by content encoding.", ("encoding",))
+queue_depth = Gauge("runhub_job_queue_depth", "Jobs waiting in a queue; sync is users due a background refresh, counted at scrape time.", ("queue",))
+replica_fallbacks = Counter("runhub_replica_fallbacks_total", "GET requests moved from the read replica to the primary, by reason.", ("reason",))
+
+REGISTRY = [
+    http_requests, http_latency, db_queries, db_time, db_queries_total,
+    external_requests, external_latency, openai_latency, openai_tokens, chat_context_tokens,
+    cache_requests, response_bytes, queue_depth, replica_fallbacks,
+]
+
+
+def record_cache_lookup(cache, hit):
+    """Count a cache hit or miss; hit ratio is hits / (hits + misses)."""
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_replica_fallback(reason):
+    """Count a GET request that had to read the primary: 'lag', 'write' or 'missing'."""
+    replica_fallbacks.inc(reason=reason)
+
+
+def create_completion(client, **kwargs):
+    """Call client.chat.completions.create, recording latency and token usage."""
+    model = kwargs.get("model", "")
+    start_time = time.perf_counter()
+    response = client.chat.completions.create(**kwargs)
+    openai_latency.observe(time.perf_counter() - start_time, model=model)
+
+    usage = getattr(response, "usage", None)
+    if usage:
+        openai_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+        openai_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+    return response
+
+
+def instrument_session(session, service):
+    """Record latency and status for every response on a requests.Session."""
+    def record_response(response, *args, **kwargs):
+        # Collapse numeric path segments (activity ids) to keep label cardinality bounded
+        endpoint = re.sub(r"/\d+", "/<id>", urlparse(response.url).path)
+        external_requests.inc(service=service, endpoint=endpoint, status=response.status_code)
+        external_latency.observe(response.elapsed.total_seconds(), service=service, endpoint=endpoint)
+        return response
+
+    session.hooks["response"].append(record_response)
+    return session
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    db_queries_total.inc()
+    if has_request_context() and "metrics_start" in g:
+        g.metrics_db_queries += 1
+        g.metrics_db_time += elapsed
+
+
+def init_metrics(app):
+    """Register request middleware, SQLAlchemy hooks and the /metrics endpoint."""
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_queries = 0
+        g.metrics_db_time = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if "metrics_start" not in g:
+            return response
+
+        # Label by URL rule so /api/activities/1 and /api/activities/2 share a series
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        elapsed = time.perf_counter() - g.metrics_start
+        http_requests.inc(route=route, method=request.method, status=response.status_code)
+        http_latency.observe(elapsed, route=route, method=request.method)
+        db_queries.observe(g.metrics_db_queries, route=route)
+        db_time.observe(g.metrics_db_time, route=route)
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """Prometheus text exposition of this worker's metrics"""
+        lines = []
+        for metric in REGISTRY:
+            lines.extend(metric.render())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -45,6 +45,27 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# The search index (see search.py) lives outside the models: the SQLite FTS5 table with its
+# shadow tables, and the Postgres GIN index. Without this, autogenerate would drop them.
+SEARCH_TABLES = {'activity_search'} | {
+    f'activity_search_{suffix}' for suffix in ('data', 'idx', 'docsize', 'config', 'content')
+}
+SEARCH_INDEXES = {'idx_activity_search'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name in SEARCH_TABLES:
+        return False
+    if type_ == 'index' and name in SEARCH_INDEXES:
+        return False
+    # activities.route_id has no FK on SQLite (see e0262513e60a): adding one rebuilds the
+    # table, which drops the search triggers
+    if (type_ == 'foreign_key_constraint' and get_engine().dialect.name == 'sqlite'
+            and object.parent.name == 'activities' and list(object.column_keys) == ['route_id']):
+        return False
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +86,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -100,6 +122,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_object=include_object,
             **conf_args
         )
 
@@ -2,8 +2,9 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
 import secrets
+from db_config import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -25,6 +26,11 @@ class User(db.Model):
     # Define relationships
     activities = db.relationship('Activity', backref='user', lazy=True, cascade='all, delete-orphan')
     badges = db.relationship('Badge', secondary='user_badge', back_populates='users')
+    leaderboard_entries = db.relationship('LeaderboardEntry', backref='user', lazy=True, cascade='all, delete-orphan')
+    daily_summaries = db.relationship('DailyActivitySummary', backref='user', lazy=True, cascade='all, delete-orphan')
+    sync_status = db.relationship('UserSyncStatus', backref='user', uselist=False, cascade='all, delete-orphan')
+    summary = db.relationship('UserSummary', backref='user', uselist=False, cascade='all, delete-orphan')
+    routes = db.relationship('Route', backref='user', lazy=True, cascade='all, delete-orphan')
 
 class Activity(db.Model):
     __tablename__ = 'activities'
@@ -33,6 +39,7 @@ class Activity(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     name = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.Text, nullable=True)
     type = db.Column(db.String(50), nullable=False)  # 'Run', 'Ride', etc.
     distance = db.Column(db.Float, nullable=False)  # in meters
     moving_time = db.Column(db.Integer, nullable=False)  # in seconds
@@ -47,18 +54,40 @@ class Activity(db.Model):
     
     # Store activity data as text (SQLite compatibility)
     activity_data_text = db.Column(db.Text, nullable=True)
+
+    # Route this activity follows (see route_clusters.py); NULL until matched or without a map
+    route_id = db.Column(db.Integer, db.ForeignKey('routes.id'), nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    stream = db.relationship('ActivityStream', backref='activity', uselist=False, cascade='all, delete-orphan')
+
     # Add composite indexes for faster table lookups
     __table_args__ = (
         db.Index('idx_user_type', user_id, type),
         db.Index('idx_user_date', user_id, start_date),
+        db.Index('idx_route_date', route_id, start_date),
     )
     
     @property
     def activity_data(self):
-        return json.loads(self.activity_data_text) if self.activity_data_text else None
+        if self.activity_data_text:
+            return json.loads(self.activity_data_text)
+        # Raw payload pruned (flask slim-activity-data): the fields clients use, from columns
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "type": self.type,
+            "distance": self.distance,
+            "moving_time": self.moving_time,
+            "elapsed_time": self.elapsed_time,
+            "total_elevation_gain": self.total_elevation_gain,
+            "start_date": self.start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "start_latlng": json.loads(self.start_latlng) if self.start_latlng else None,
+            "end_latlng": json.loads(self.end_latlng) if self.end_latlng else None,
+            "map": {"summary_polyline": self.polyline}
+        }
     
     @activity_data.setter
     def activity_data(self, value):
@@ -71,6 +100,7 @@ class Badge(db.Model):
     icon = db.Column(db.String(128), nullable=False)
     criteria_type = db.Column(db.String(64), nullable=False)  # distance, count, streak, etc.
     criteria_value = db.Column(db.Float, nullable=False)  # threshold value
+    sport = db.Column(db.String(50), nullable=False, default='Run', server_default='Run')  # activity type counted
 
     # Relationship to users through UserBadge
     users = db.relationship('User', secondary='user_badge', back_populates='badges')
@@ -85,4 +115,161 @@ class UserBadge(db.Model):
     earned_date = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Add unique constraint to prevent duplicate badges
-    __table_args__ = (db.UniqueConstraint('user_id', 'badge_id'),)
\ No newline at end of file
+    __table_args__ = (db.UniqueConstraint('user_id', 'badge_id'),)
+
+class LeaderboardEntry(db.Model):
+    __tablename__ = 'leaderboard_entries'
+
+    # A board is identified by (period, period_key, metric), e.g. ('week', '2025-11-03', 'distance')
+    period = db.Column(db.String(10), primary_key=True)  # 'week', 'month' or 'all'
+    period_key = db.Column(db.String(10), primary_key=True)  # week start date, 'YYYY-MM' or 'all'
+    metric = db.Column(db.String(20), primary_key=True)  # 'distance', 'runs' or 'elevation'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+    value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Sorted index per board so top-N pages and rank counts never touch the activities table
+    __table_args__ = (
+        db.Index('idx_board_value', period, period_key, metric, value),
+    )
+
+
+class LeaderboardRankBucket(db.Model):
+    __tablename__ = 'leaderboard_rank_buckets'
+
+    # Entry counts per board over ranges of whole value units, a tree for rank lookups (see
+    # leaderboards.py): a node at `level` covers the buckets b with b >> 4 * level == `prefix`
+    period = db.Column(db.String(10), primary_key=True)
+    period_key = db.Column(db.String(10), primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    level = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    prefix = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    entries = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyActivitySummary(db.Model):
+    __tablename__ = 'daily_activity_summaries'
+
+    # One row per user, sport and day with at least one activity, so a sport's calendar is a
+    # single range scan
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    type = db.Column(db.String(50), primary_key=True)  # 'Run', 'Ride', etc.
+    day = db.Column(db.Date, primary_key=True)
+
+    distance = db.Column(db.Float, nullable=False, default=0)  # in meters
+    moving_time = db.Column(db.Integer, nullable=False, default=0)  # in seconds
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserSyncStatus(db.Model):
+    __tablename__ = 'user_sync_status'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+    last_sync_at = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float, nullable=True)  # in seconds
+    last_status = db.Column(db.String(20), nullable=True)  # 'ok' or 'error'
+    last_error = db.Column(db.String(255), nullable=True)
+    last_changes = db.Column(db.Integer, nullable=True)
+    sync_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Checkpoint for the current import: a full import walks import_before backward from now,
+    # one for a returning user walks import_after forward from their newest stored activity
+    import_status = db.Column(db.String(20), nullable=True)  # 'in_progress', 'failed' or 'complete'
+    import_before = db.Column(db.Integer, nullable=True)  # epoch of the oldest activity committed so far
+    import_after = db.Column(db.Integer, nullable=True)  # epoch of the newest activity committed so far (None = full history)
+    import_pages = db.Column(db.Integer, nullable=True)
+    import_error = db.Column(db.String(255), nullable=True)
+
+    # Cursor for the full-history backfill
+    backfill_before = db.Column(db.Integer, nullable=True)
+    backfill_completed_at = db.Column(db.DateTime, nullable=True)
+
+    # Incremental refresh: newest start epoch seen, and when recent activities were last verified
+    sync_watermark = db.Column(db.Integer, nullable=True)
+    verified_at = db.Column(db.DateTime, nullable=True)
+
+    # Activity change log: last sequence number handed out, and the highest one compacted away
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    change_floor = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # The scheduler picks the stalest users first
+    __table_args__ = (
+        db.Index('idx_sync_last_sync_at', last_sync_at),
+    )
+
+
+class ActivityStream(db.Model):
+    __tablename__ = 'activity_streams'
+
+    # Full-resolution Strava streams, fetched on first use. Each column is a zlib-compressed
+    # little-endian packed array (see streams.py); NULL when Strava has no such stream.
+    activity_id = db.Column(db.BigInteger, db.ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True)
+    point_count = db.Column(db.Integer, nullable=False)
+
+    time = db.Column(db.LargeBinary, nullable=True)  # seconds since start
+    distance = db.Column(db.LargeBinary, nullable=True)  # cumulative meters
+    latlng = db.Column(db.LargeBinary, nullable=True)  # lat, lng pairs
+    altitude = db.Column(db.LargeBinary, nullable=True)  # meters
+    heartrate = db.Column(db.LargeBinary, nullable=True)  # bpm
+
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ActivityChange(db.Model):
+    __tablename__ = 'activity_changes'
+
+    # Per-user change log for delta sync (see changes.py). No FK to activities: a deleted
+    # activity's entry outlives it.
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    activity_id = db.Column(db.BigInteger, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Compaction finds superseded entries per activity
+    __table_args__ = (
+        db.Index('idx_change_activity', user_id, activity_id),
+    )
+
+
+class UserSummary(db.Model):
+    __tablename__ = 'user_summary'
+
+    # Dashboard totals, kept current in the same transaction as every activity and badge
+    # write (see summary.py) so the home page is one primary-key read
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    run_distance = db.Column(db.Float, nullable=False, default=0)  # in meters
+    run_moving_time = db.Column(db.Integer, nullable=False, default=0)  # in seconds
+    run_elevation_gain = db.Column(db.Float, nullable=False, default=0)  # in meters
+    latest_run_id = db.Column(db.BigInteger, nullable=True)
+    latest_run_date = db.Column(db.DateTime, nullable=True)
+    badge_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Route(db.Model):
+    __tablename__ = 'routes'
+
+    # A path one user has covered more than once, or may yet (see route_clusters.py).
+    # cells is the founding activity's fingerprint, packed like the stream columns.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    type = db.Column(db.String(50), nullable=False)  # 'Run', 'Ride', etc.
+    start_cell = db.Column(db.String(24), nullable=False)  # coarse grid cell of the start, 'row:column'
+    distance = db.Column(db.Float, nullable=False)  # founding activity's, in meters
+    cells = db.Column(db.LargeBinary, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    activities = db.relationship('Activity', backref='route', lazy=True)
+
+    # New activities look up routes starting near theirs
+    __table_args__ = (
+        db.Index('idx_route_start', user_id, type, start_cell),
+    )
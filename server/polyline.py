@@ -0,0 +1,41 @@
+"""Google's encoded polyline format, as Strava's map.summary_polyline."""
+
+
+def encode_polyline(points):
+    """Encode (lat, lng) pairs with Google's polyline algorithm, as Strava does."""
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_e5 = int(round(lat * 1e5))
+        lng_e5 = int(round(lng * 1e5))
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return "".join(result)
+
+
+def decode_polyline(encoded):
+    """(lat, lng) pairs from an encoded polyline. Raises IndexError if it is truncated."""
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        for axis in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lng += delta
+        points.append((lat / 1e5, lng / 1e5))
+    return points
@@ -0,0 +1,25 @@
+from models import User
+from cache import user_cache
+from db_routing import reading_replica, use_primary
+from metrics import record_replica_fallback
+
+
+def get_user_profile(user_id):
+    """Public profile fields for a user (read-through cached), or None if the user doesn't exist."""
+    def load():
+        user = User.query.get(user_id)
+        if not user and reading_replica():
+            # Signed up moments ago and not replicated yet
+            use_primary()
+            record_replica_fallback("missing")
+            user = User.query.get(user_id)
+        if not user:
+            return None
+        return {
+            "id": user.id,
+            "firstname": user.firstname,
+            "lastname": user.lastname,
+            "username": user.username,
+            "profile": user.profile
+        }
+    return user_cache.get_or_load(user_id, load)
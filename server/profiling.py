@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Collectors started with profile_queries() outside of a request
+_local = threading.local()
+
+
+def normalize_statement(statement):
+    """Reduce a SQL statement to its shape so repeated queries group together."""
+    shape = re.sub(r"'(?:[^']|'')*'", "?", statement)  # string literals
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "?", shape)  # numeric literals
+    shape = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?)", shape)  # IN (...) lists of any length
+    shape = re.sub(r"(%\(\w+\)s|:\w+|\$\d+)", "?", shape)  # named/positional bind params
+    return re.sub(r"\s+", " ", shape).strip()
+
+
+class QueryProfile:
+    """Collects statements executed during one request (or profile_queries block)."""
+
+    def __init__(self, repeat_threshold=5, slow_ms=100):
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self.shapes = {}  # {shape: [count, total seconds]}
+        self.slow = []
+        self.count = 0
+        self.total_time = 0.0
+
+    def record(self, statement, elapsed):
+        shape = normalize_statement(statement)
+        if shape not in self.shapes:
+            self.shapes[shape] = [0, 0.0]
+        self.shapes[shape][0] += 1
+        self.shapes[shape][1] += elapsed
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed * 1000 >= self.slow_ms:
+            self.slow.append({"statement": shape, "ms": round(elapsed * 1000, 2)})
+
+    @property
+    def repeated(self):
+        """Shapes executed at least repeat_threshold times, the usual N+1 signature."""
+        return [
+            {"statement": shape, "count": count, "ms": round(total * 1000, 2)}
+            for shape, (count, total) in sorted(self.shapes.items(), key=lambda item: -item[1][0])
+            if count >= self.repeat_threshold
+        ]
+
+    def report(self):
+        return {
+            "queries": self.count,
+            "time_ms": round(self.total_time * 1000, 2),
+            "distinct_shapes": len(self.shapes),
+            "repeated": self.repeated,
+            "slow": self.slow
+        }
+
+
+def active_profiles():
+    """Profiles that should see the current statement: the request's plus any open blocks."""
+    profiles = list(getattr(_local, "profiles", []))
+    if has_request_context() and "query_profile" in g:
+        profiles.append(g.query_profile)
+    return profiles
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profile_start_time"].pop()
+    for profile in active_profiles():
+        profile.record(statement, elapsed)
+
+
+def register_listeners():
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def profile_queries(repeat_threshold=5, slow_ms=100):
+    """Profile statements in a block, e.g. to assert a per-endpoint query budget:
+
+        with profile_queries() as profile:
+            client.get("/api/badges/1")
+        assert profile.count <= 3 and not profile.repeated
+    """
+    register_listeners()
+    profile = QueryProfile(repeat_threshold, slow_ms)
+    if not hasattr(_local, "profiles"):
+        _local.profiles = []
+    _local.profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _local.profiles.remove(profile)
+
+
+def init_query_profiling(app):
+    """Enable per-request query profiling when app.config['QUERY_PROFILING'] is set."""
+    if not app.config.get("QUERY_PROFILING"):
+        return
+
+    register_listeners()
+    repeat_threshold = app.config.get("QUERY_PROFILING_REPEAT_THRESHOLD", 5)
+    slow_ms = app.config.get("QUERY_PROFILING_SLOW_MS", 100)
+    report_dir = app.config.get("QUERY_PROFILING_REPORT_DIR")
+
+    @app.before_request
+    def start_query_profile():
+        g.query_profile = QueryProfile(repeat_threshold, slow_ms)
+
+    @app.after_request
+    def finish_query_profile(response):
+        if "query_profile" not in g:
+            return response
+
+        report = g.query_profile.report()
+        response.headers["X-Query-Count"] = str(report["queries"])
+        response.headers["X-Query-Time-Ms"] = str(report["time_ms"])
+        response.headers["X-Query-Repeated"] = str(len(report["repeated"]))
+        response.headers["X-Query-Slow"] = str(len(report["slow"]))
+
+        if report["repeated"] or report["slow"]:
+            print(f"Query profile {request.method} {request.path}: {report['queries']} queries, "
+                  f"{len(report['repeated'])} repeated shapes, {len(report['slow'])} slow")
+            for item in report["repeated"]:
+                print(f"  repeated x{item['count']}: {item['statement']}")
+            for item in report["slow"]:
+                print(f"  slow {item['ms']}ms: {item['statement']}")
+
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+            filename = f"{int(time.time() * 1000)}_{request.method}_{request.path.strip('/').replace('/', '_') or 'root'}.json"
+            with open(os.path.join(report_dir, filename), "w") as f:
+                json.dump({"method": request.method, "path": request.path, **report}, f, indent=2)
+
+        return response
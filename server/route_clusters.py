@@ -0,0 +1,287 @@
+"""Group each user's activities that follow the same route.
+
+An activity's fingerprint is the set of ~100 m grid cells its summary polyline passes
+through. Two activities share a route when each covers most of the other's cells (to
+within a cell, which absorbs GPS noise and polyline simplification). Routes are looked
+up by their coarse start cell, an indexed read whose cost doesn't grow with the history.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import func, update
+from models import db, Activity, Route
+from changes import lock_change_log
+from streams import pack, unpack
+from polyline import decode_polyline
+
+CELL_METERS = 100  # fingerprint grid
+START_CELL_METERS = 500  # grid routes are indexed by
+MATCH_THRESHOLD = 0.8  # share of each activity's cells the other must come near
+DISTANCE_TOLERANCE = 0.15
+MIN_ROUTE_CELLS = 5  # shorter tracks (GPS glitches, treadmill stubs) aren't matched
+METERS_PER_DEGREE = 111320
+NEIGHBORS = [(row, column) for row in (-1, 0, 1) for column in (-1, 0, 1)]
+
+
+def grid_cell(lat, lng, size):
+    """(row, column) of the `size`-meter grid cell holding a point.
+
+    Column width follows the cosine of the row's own latitude, so every activity divides
+    the map the same way.
+    """
+    step = size / METERS_PER_DEGREE
+    row = math.floor(lat / step)
+    return row, math.floor(lng * math.cos(math.radians(row * step)) / step)
+
+
+def trace_cells(points, size):
+    """Cells a track passes through, sampled once per cell length along each segment.
+
+    A corner cell skipped between samples is next to ones kept, and matching already
+    tolerates a cell's offset.
+    """
+    cells = set()
+    for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+        meters = math.hypot((lat2 - lat1) * METERS_PER_DEGREE,
+                            (lng2 - lng1) * METERS_PER_DEGREE * math.cos(math.radians(lat1)))
+        steps = max(int(meters / size), 1)
+        for i in range(steps):
+            fraction = i / steps
+            cells.add(grid_cell(lat1 + (lat2 - lat1) * fraction, lng1 + (lng2 - lng1) * fraction, size))
+    cells.add(grid_cell(*points[-1], size))
+    return cells
+
+
+def fingerprint(polyline):
+    """(start cell key, fingerprint cells) for an encoded polyline, or None if it can't be matched."""
+    if not polyline:
+        return None
+    try:
+        points = decode_polyline(polyline)
+    except IndexError:  # truncated
+        return None
+    if len(points) < 2:
+        return None
+    cells = trace_cells(points, CELL_METERS)
+    if len(cells) < MIN_ROUTE_CELLS:
+        return None
+    row, column = grid_cell(*points[0], START_CELL_METERS)
+    return f"{row}:{column}", cells
+
+
+def nearby_start_cells(key):
+    """The start cell key and its eight neighbours: a route start can sit across a cell edge."""
+    row, column = map(int, key.split(":"))
+    return [f"{row + d_row}:{column + d_column}" for d_row, d_column in NEIGHBORS]
+
+
+def dilate(cells):
+    """`cells` and every cell next to one of them."""
+    return {(row + d_row, column + d_column) for row, column in cells for d_row, d_column in NEIGHBORS}
+
+
+def coverage(cells, near_other):
+    """Share of `cells` within a cell of another fingerprint, given that one dilated."""
+    return len(cells & near_other) / len(cells)
+
+
+def pack_cells(cells):
+    return pack([value for cell in sorted(cells) for value in cell], "i")
+
+
+def unpack_cells(blob):
+    values = unpack(blob, "i")
+    return set(zip(values[::2], values[1::2]))
+
+
+def assign_routes(user_id, rows, fingerprints):
+    """Point each of the user's activities at the route it follows, creating routes for new paths.
+
+    `rows` have id, type and distance; `fingerprints` are theirs from fingerprint() (None
+    leaves the activity unmatched). Takes the user's change-log lock so concurrent syncs
+    don't found the same route twice. Returns {activity_id: route_id}; the caller commits.
+    """
+    lock_change_log(user_id)
+    matchable = [(row, fp) for row, fp in zip(rows, fingerprints) if fp]
+    if not matchable:
+        return {}
+
+    # Every route any of these activities could match, found through idx_route_start
+    distances = [row.distance for row, _ in matchable]
+    candidates = {}
+    for route in Route.query.filter(
+        Route.user_id == user_id,
+        Route.type.in_({row.type for row, _ in matchable}),
+        Route.start_cell.in_({key for _, fp in matchable for key in nearby_start_cells(fp[0])}),
+        Route.distance.between(min(distances) / (1 + DISTANCE_TOLERANCE), max(distances) / (1 - DISTANCE_TOLERANCE))
+    ):
+        candidates.setdefault(route.start_cell, []).append(route)
+    # Unpacked on first comparison; dilations only once the other side's cells come near
+    route_cells, route_near = {}, {}
+
+    assigned = {}
+    for row, (start_cell, cells) in matchable:
+        near = None
+        best, best_score = None, MATCH_THRESHOLD
+        for key in nearby_start_cells(start_cell):
+            for route in candidates.get(key, []):
+                if route.type != row.type or abs(route.distance - row.distance) > DISTANCE_TOLERANCE * route.distance:
+                    continue
+                if route not in route_cells:
+                    route_cells[route] = unpack_cells(route.cells)
+                if near is None:
+                    near = dilate(cells)
+                score = coverage(route_cells[route], near)
+                if score < best_score:
+                    continue
+                if route not in route_near:
+                    route_near[route] = dilate(route_cells[route])
+                score = min(score, coverage(cells, route_near[route]))
+                if score >= best_score:
+                    best, best_score = route, score
+        if best is None:
+            best = Route(user_id=user_id, type=row.type, start_cell=start_cell, distance=row.distance,
+                         cells=pack_cells(cells))
+            db.session.add(best)
+            candidates.setdefault(start_cell, []).append(best)
+            route_cells[best] = cells
+        assigned[row.id] = best
+
+    # New routes get their ids in one flush
+    db.session.flush()
+    assigned = {activity_id: route.id for activity_id, route in assigned.items()}
+    db.session.execute(update(Activity), [{"id": activity_id, "route_id": route_id}
+                                          for activity_id, route_id in assigned.items()])
+    return assigned
+
+
+def unmatched_activities(user_id, activity_ids=None, after_id=0, limit=None):
+    """The user's mapped activities without a route, by id: all of them or among `activity_ids`."""
+    query = db.session.query(Activity.id, Activity.type, Activity.distance, Activity.polyline).filter(
+        Activity.user_id == user_id, Activity.route_id.is_(None), Activity.polyline.isnot(None),
+        Activity.id > after_id
+    )
+    if activity_ids is not None:
+        query = query.filter(Activity.id.in_(activity_ids))
+    return query.order_by(Activity.id).limit(limit).all()
+
+
+def match_activity_routes(user_id, activity_ids):
+    """Match newly written activities to routes, in the caller's transaction. Returns the number matched."""
+    rows = unmatched_activities(user_id, activity_ids)
+    return len(assign_routes(user_id, rows, [fingerprint(row.polyline) for row in rows]))
+
+
+def cluster_routes(user_ids, workers=None, batch_size=500, rebuild=False):
+    """Match every unmatched activity of `user_ids` to a route. Returns (activities matched, routes).
+
+    Fingerprints are computed on a pool of `workers` processes (os.cpu_count() by default;
+    1 computes in this process) while this process reads and writes the database, one
+    commit per batch. With rebuild, the users' routes are dropped and found again first;
+    routes left without activities are always removed.
+    """
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    matched = 0
+    try:
+        for user_id in user_ids:
+            if rebuild:
+                Activity.query.filter_by(user_id=user_id).update({Activity.route_id: None})
+                Route.query.filter_by(user_id=user_id).delete()
+                db.session.commit()
+
+            after_id = 0
+            while True:
+                rows = unmatched_activities(user_id, after_id=after_id, limit=batch_size)
+                if not rows:
+                    break
+                after_id = rows[-1].id
+                polylines = [row.polyline for row in rows]
+                if pool:
+                    chunksize = max(len(polylines) // (workers * 4), 1)
+                    fingerprints = list(pool.map(fingerprint, polylines, chunksize=chunksize))
+                else:
+                    fingerprints = [fingerprint(polyline) for polyline in polylines]
+                matched += len(assign_routes(user_id, rows, fingerprints))
+                db.session.commit()
+                db.session.expunge_all()
+
+            # Routes whose activities were all deleted or moved to another route
+            used = db.select(Activity.route_id).where(Activity.user_id == user_id, Activity.route_id.isnot(None))
+            Route.query.filter(Route.user_id == user_id, Route.id.notin_(used)).delete(synchronize_session=False)
+            db.session.commit()
+    finally:
+        if pool:
+            pool.shutdown()
+
+    routes = Route.query.filter(Route.user_id.in_(user_ids)).count() if user_ids else 0
+    return matched, routes
+
+
+def list_routes(user_id, activity_type=None, min_count=2):
+    """The user's routes with at least `min_count` activities, most travelled first."""
+    count = func.count(Activity.id)
+    query = db.session.query(
+        Route.id, Route.type, Route.distance, count.label("count"),
+        func.min(Activity.moving_time).label("best_time"), func.max(Activity.start_date).label("latest")
+    ).join(Activity, Activity.route_id == Route.id).filter(Route.user_id == user_id)
+    if activity_type:
+        query = query.filter(Route.type == activity_type)
+    rows = query.group_by(Route.id, Route.type, Route.distance).having(count >= min_count).order_by(count.desc(), Route.id)
+    return [{
+        "id": row.id,
+        "type": row.type,
+        "distance": row.distance,
+        "count": row.count,
+        "best_time": row.best_time,
+        "latest": row.latest.isoformat()
+    } for row in rows]
+
+
+def pace_trend(efforts):
+    """Least-squares change in pace (seconds per km) per 30 days, negative when getting faster."""
+    if len(efforts) < 3:
+        return None
+    first = efforts[0]["start_date"]
+    days = [(effort["start_date"] - first).total_seconds() / 86400 for effort in efforts]
+    paces = [effort["pace"] for effort in efforts]
+    mean_day, mean_pace = sum(days) / len(days), sum(paces) / len(paces)
+    spread = sum((day - mean_day) ** 2 for day in days)
+    if not spread:
+        return None
+    slope = sum((day - mean_day) * (pace - mean_pace) for day, pace in zip(days, paces)) / spread
+    return round(slope * 30, 2)
+
+
+def route_history(route):
+    """Every effort on a route, oldest first, with the best, the latest and the pace trend."""
+    rows = db.session.query(
+        Activity.id, Activity.name, Activity.start_date, Activity.distance, Activity.moving_time
+    ).filter(Activity.route_id == route.id).order_by(Activity.start_date, Activity.id).all()
+    efforts = [{
+        "id": row.id,
+        "name": row.name,
+        "start_date": row.start_date,
+        "distance": row.distance,
+        "moving_time": row.moving_time,
+        "pace": round(row.moving_time / (row.distance / 1000), 1) if row.distance else None
+    } for row in rows]
+    trend = pace_trend([effort for effort in efforts if effort["pace"] is not None])
+    best = min(efforts, key=lambda effort: effort["moving_time"]) if efforts else None
+    latest_polyline = db.session.query(Activity.polyline).filter(Activity.route_id == route.id).order_by(
+        Activity.start_date.desc(), Activity.id.desc()
+    ).limit(1).scalar()
+
+    for effort in efforts:
+        effort["start_date"] = effort["start_date"].isoformat()
+    return {
+        "id": route.id,
+        "type": route.type,
+        "distance": route.distance,
+        "polyline": latest_polyline,
+        "count": len(efforts),
+        "best": best,
+        "latest": efforts[-1] if efforts else None,
+        "pace_trend_per_30_days": trend,
+        "efforts": efforts
+    }
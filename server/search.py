@@ -0,0 +1,88 @@
+import re
+from sqlalchemy import event, or_, text
+from models import db, Activity
+
+# SQLite: an FTS5 table kept in step with activities by triggers, so every write path
+# (sync, import, archive import, bulk deletes) updates the index without extra code.
+# user_key ("u<user_id>") is indexed so a user's matches come straight from the index.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS activity_search USING fts5(
+        name, description, user_key, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_insert AFTER INSERT ON activities BEGIN
+        INSERT INTO activity_search (rowid, name, description, user_key)
+        VALUES (new.id, new.name, coalesce(new.description, ''), 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_update AFTER UPDATE OF name, description ON activities BEGIN
+        UPDATE activity_search SET name = new.name, description = coalesce(new.description, '')
+        WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_delete AFTER DELETE ON activities BEGIN
+        DELETE FROM activity_search WHERE rowid = old.id;
+    END""",
+]
+
+# Postgres: an expression GIN index, which the planner keeps up to date on its own
+POSTGRES_SEARCH_VECTOR = "to_tsvector('simple', name || ' ' || coalesce(description, ''))"
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS idx_activity_search ON activities USING gin ({POSTGRES_SEARCH_VECTOR})",
+]
+
+MAX_PER_PAGE = 100
+
+
+def create_search_index(target, connection, **kw):
+    """Create the dialect's search index whenever the activities table is created."""
+    statements = {"sqlite": SQLITE_SEARCH_DDL, "postgresql": POSTGRES_SEARCH_DDL}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS activity_search")
+
+
+event.listen(Activity.__table__, "after_create", create_search_index)
+event.listen(Activity.__table__, "after_drop", drop_search_index)
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query.lower())[:10]
+
+
+def search_activities(user_id, query, activity_type=None, after=None, before=None, page=1, per_page=20):
+    """A page of the user's activities matching every word of `query` as a prefix.
+
+    Newest first. Returns (activities, has_more).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+
+    results = Activity.query.filter(Activity.user_id == user_id)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = f'user_key : "u{user_id}" AND ' + " AND ".join(f'"{term}"*' for term in terms)
+        results = results.filter(
+            Activity.id.in_(text("SELECT rowid FROM activity_search WHERE activity_search MATCH :match"))
+        ).params(match=match)
+    elif dialect == "postgresql":
+        results = results.filter(
+            text(f"{POSTGRES_SEARCH_VECTOR} @@ to_tsquery('simple', :tsquery)")
+        ).params(tsquery=" & ".join(f"{term}:*" for term in terms))
+    else:
+        for term in terms:
+            results = results.filter(or_(Activity.name.ilike(f"%{term}%"), Activity.description.ilike(f"%{term}%")))
+
+    if activity_type:
+        results = results.filter(Activity.type == activity_type)
+    if after:
+        results = results.filter(Activity.start_date >= after)
+    if before:
+        results = results.filter(Activity.start_date < before)
+
+    per_page = min(per_page, MAX_PER_PAGE)
+    # One extra row tells us whether there is another page without a COUNT
+    rows = results.order_by(Activity.start_date.desc()).offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
@@ -0,0 +1,634 @@
+import calendar
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from functools import partial
+import requests
+from flask import current_app
+from sqlalchemy import update
+from models import db, User, Activity
+from cache import user_cache
+from leaderboards import update_user_leaderboards
+from training_load import update_day_buckets
+from metrics import instrument_session
+from sync_scheduler import StravaQuota, get_sync_state, record_user_sync
+from streams import STREAM_KEYS, streams_from_strava
+from changes import lock_change_log, record_changes
+from summary import update_user_summary
+from route_clusters import match_activity_routes
+from badges import evaluate_user_badges
+
+# Shared HTTP session for Strava calls (connection reuse + latency/status metrics)
+strava_http = instrument_session(requests.Session(), "strava")
+strava_quota = StravaQuota()
+strava_http.hooks["response"].append(strava_quota.update_from_response)
+
+# Adaptive refresh: deep verification depth and how often it runs
+REFRESH_VERIFY_DEPTH = int(os.getenv("REFRESH_VERIFY_DEPTH", 50))
+REFRESH_VERIFY_INTERVAL_HOURS = float(os.getenv("REFRESH_VERIFY_INTERVAL_HOURS", 24))
+LEGACY_REFRESH_CALLS = 2
+
+# Activity writes per sync transaction (see commit_sync_writes)
+SYNC_WRITE_BATCH = int(os.getenv("SYNC_WRITE_BATCH", 100))
+
+
+class StravaSyncError(Exception):
+    """A sync step failed in a way the caller should report with `status_code`."""
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StravaCredentials:
+    """A user's Strava tokens copied off the User row, so calls to Strava touch no ORM attributes."""
+    def __init__(self, user_id, access_token, refresh_token=None, expires_at=None):
+        self.user_id = user_id
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+    
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.access_token, user.refresh_token, user.token_expires_at)
+
+
+def release_db_connection():
+    """End the current transaction so its connection returns to the pool before a slow external call.
+    
+    Under gevent workers many requests wait on Strava/OpenAI at once; holding a connection
+    (and on SQLite, a lock) for that wait would exhaust the pool long before the worker
+    runs out of greenlets. Call it right before the request: loaded objects are expired,
+    and reading any of their attributes checks a connection out again, so whatever the
+    call needs has to be copied first (see StravaCredentials).
+    """
+    db.session.commit()
+
+
+def refresh_user_token(credentials):
+    """Exchange the refresh token for a new access token if the current one has expired.
+    
+    Updates `credentials` in place and, on success, the user's row.
+    """
+    current_time = int(datetime.utcnow().timestamp())
+    
+    if credentials.expires_at and current_time >= credentials.expires_at:
+        release_db_connection()
+        # Refresh the token
+        try:
+            refresh_response = strava_http.post(
+                "https://www.strava.com/oauth/token",
+                data={
+                    "client_id": current_app.config["STRAVA_CLIENT_ID"],
+                    "client_secret": current_app.config["STRAVA_CLIENT_SECRET"],
+                    "refresh_token": credentials.refresh_token,
+                    "grant_type": "refresh_token"
+                }
+            )
+    
+            if refresh_response.status_code == 200:
+                refresh_data = refresh_response.json()
+                credentials.access_token = refresh_data["access_token"]
+                credentials.refresh_token = refresh_data["refresh_token"]
+                credentials.expires_at = refresh_data["expires_at"]
+                try:
+                    # Try to update but don't fail if read-only
+                    db.session.execute(update(User).where(User.id == credentials.user_id).values(
+                        access_token=credentials.access_token,
+                        refresh_token=credentials.refresh_token,
+                        token_expires_at=credentials.expires_at
+                    ))
+                    db.session.commit()
+                    user_cache.invalidate(credentials.user_id)
+                except Exception as e:
+                    print(f"Database write error (using old token): {str(e)}")
+                    db.session.rollback()
+            else:
+                raise StravaSyncError("Failed to refresh token", 401)
+        except StravaSyncError:
+            raise
+        except Exception as e:
+            print(f"Token refresh error: {str(e)}")
+            raise StravaSyncError("Failed to refresh token", 500)
+
+
+def fetch_activity_streams(credentials, activity_id):
+    """Full-resolution streams for one activity from Strava, as {type: [values]}."""
+    release_db_connection()
+    response = strava_http.get(
+        f"https://www.strava.com/api/v3/activities/{activity_id}/streams",
+        headers={'Authorization': 'Bearer ' + credentials.access_token},
+        params={'keys': STREAM_KEYS, 'key_by_type': 'true'}
+    )
+    if response.status_code == 404:
+        # Manual activities have no streams; store that so we don't ask again
+        return {}
+    if response.status_code != 200:
+        raise StravaSyncError(f"Strava API error: {response.status_code}", 500)
+    return streams_from_strava(response.json())
+
+
+def sync_recent_activities(credentials, force_verify=False):
+    """Adaptive refresh. Returns change counts plus the Strava calls made and saved.
+    
+    Normally only activities after the user's watermark (newest start time seen) are
+    fetched, which costs a single call when nothing is new. Every REFRESH_VERIFY_INTERVAL_HOURS
+    (or when forced) a deep verification reconciles the newest REFRESH_VERIFY_DEPTH activities
+    to pick up edits and deletions.
+    """
+    user_id = credentials.user_id
+    state = get_sync_state(user_id)
+    verify_due = (
+        force_verify
+        or state.sync_watermark is None
+        or state.verified_at is None
+        or datetime.utcnow() - state.verified_at >= timedelta(hours=REFRESH_VERIFY_INTERVAL_HOURS)
+    )
+    
+    if verify_due:
+        changes = verify_recent_activities(credentials, REFRESH_VERIFY_DEPTH)
+        state = get_sync_state(user_id)
+        state.verified_at = datetime.utcnow()
+    else:
+        changes = fetch_activities_after_watermark(credentials, state.sync_watermark)
+        state = get_sync_state(user_id)
+    
+    newest_epoch = changes.pop("newest_epoch")
+    if newest_epoch:
+        state.sync_watermark = max(state.sync_watermark or 0, newest_epoch)
+    db.session.commit()
+    
+    # Leaderboards and calendar buckets were updated above; new or edited activities may earn badges
+    if changes["added"] or changes["updated"]:
+        evaluate_user_badges(user_id)
+    
+    # The fixed-page refresh always made at least two calls (newest 50 + an 'after' fetch)
+    changes["mode"] = "verify" if verify_due else "incremental"
+    changes["calls_saved"] = max(LEGACY_REFRESH_CALLS - changes["strava_calls"], 0)
+    return changes
+
+
+def fetch_strava_pages(credentials, params, max_items=None):
+    """GET /athlete/activities page by page. Returns (activities, calls made).
+    
+    Stops at the first short page, so a quiet user costs exactly one call. No connection
+    is held while fetching.
+    """
+    activities_url = "https://www.strava.com/api/v3/athlete/activities"
+    header = {'Authorization': 'Bearer ' + credentials.access_token}
+    per_page = params.get('per_page', 200)
+    
+    activities = []
+    calls = 0
+    page = 1
+    while True:
+        release_db_connection()
+        strava_response = strava_http.get(activities_url, headers=header, params={**params, 'page': page})
+        calls += 1
+        if strava_response.status_code != 200:
+            raise StravaSyncError(f"Strava API error: {strava_response.status_code}", 500)
+        batch = strava_response.json()
+        activities.extend(batch)
+        if len(batch) < per_page or (max_items and len(activities) >= max_items):
+            break
+        page += 1
+    
+    return (activities[:max_items] if max_items else activities), calls
+
+
+def fetch_activities_after_watermark(credentials, watermark):
+    """Incremental refresh: store only activities that started after the watermark."""
+    user_id = credentials.user_id
+    strava_activities, calls = fetch_strava_pages(credentials, {'per_page': 200, 'after': watermark})
+    
+    activities_added = store_activity_page(user_id, strava_activities)
+    db.session.commit()
+    
+    newest_epoch = None
+    if strava_activities:
+        newest_epoch = max(to_epoch(datetime.strptime(a['start_date'], '%Y-%m-%dT%H:%M:%SZ')) for a in strava_activities)
+    if activities_added:
+        update_user_leaderboards(user_id)
+        update_day_buckets(user_id, since=datetime.utcfromtimestamp(watermark))
+    
+    return {
+        "added": activities_added,
+        "updated": 0,
+        "deleted": 0,
+        "strava_calls": calls,
+        "newest_epoch": newest_epoch
+    }
+
+
+def verify_recent_activities(credentials, depth):
+    """Reconcile the user's newest `depth` Strava activities with the database."""
+    user_id = credentials.user_id
+    # Track changes
+    counts = {"added": 0, "updated": 0, "deleted": 0}
+    buckets_since = None  # Oldest day whose calendar bucket may have changed (None = all)
+    
+    # STEP 1: Fetch the `depth` most recent activities from Strava
+    strava_activities, strava_calls = fetch_strava_pages(credentials, {'per_page': min(depth, 200)}, max_items=depth)
+    
+    # STEP 2: Collect Strava activity IDs into a set
+    strava_activity_ids = {str(activity['id']) for activity in strava_activities}
+    
+    # STEP 3: Determine date range of Strava activities for comparison
+    if strava_activities:
+        # Convert ISO strings to datetime objects
+        strava_dates = [datetime.strptime(activity['start_date'], '%Y-%m-%dT%H:%M:%SZ') for activity in strava_activities]
+        newest_strava_date = max(strava_dates)
+        oldest_strava_date = min(strava_dates)
+        buckets_since = oldest_strava_date
+    
+        # STEP 4: Also get the most recent activity from the database
+        newest_db_activity = Activity.query.filter_by(
+            user_id=user_id
+        ).order_by(
+            Activity.start_date.desc()
+        ).first()
+    
+        # STEP 5: Query local DB for activities in an expanded date range
+        # This includes both the Strava activities AND any newer ones in the DB
+        # that might have been deleted from Strava
+        if newest_db_activity and newest_db_activity.start_date > newest_strava_date:
+            # Use the newest DB activity date as the upper bound
+            query_end_date = newest_db_activity.start_date
+        else:
+            query_end_date = newest_strava_date
+    
+        db_activities = Activity.query.filter(
+            Activity.user_id == user_id,
+            Activity.start_date >= oldest_strava_date,
+            Activity.start_date <= query_end_date
+        ).all()
+    
+        # Create a set of local activity IDs
+        db_activity_ids = {str(activity.id) for activity in db_activities}
+    
+        # Create a map for efficient lookups
+        db_activities_map = {str(activity.id): activity for activity in db_activities}
+    
+        # STEP 6: Plan a write for each new or changed Strava activity
+        writes = []  # (kind, activity_id, write) for commit_sync_writes
+        for strava_activity in strava_activities:
+            strava_id = str(strava_activity['id'])
+    
+            if strava_id in db_activity_ids:
+                # Activity exists - check if it needs updating
+                db_activity = db_activities_map[strava_id]
+    
+                # Check for changes in key fields
+                if (db_activity.name != strava_activity['name'] or
+                    db_activity.type != strava_activity['type'] or
+                    abs(db_activity.distance - strava_activity['distance']) > 0.01 or
+                    db_activity.moving_time != strava_activity['moving_time'] or
+                    db_activity.elapsed_time != strava_activity['elapsed_time']):
+                    writes.append(('updated', db_activity.id, partial(update_activity_from_strava, db_activity, strava_activity)))
+            else:
+                # New activity - add it
+                writes.append(('added', strava_activity['id'], partial(add_activity_from_strava, user_id, strava_activity)))
+    
+        # STEP 7: Find and delete activities that are in our DB but not in Strava
+        activities_to_delete = db_activity_ids - strava_activity_ids
+    
+        for activity_id in activities_to_delete:
+            activity_to_delete = db_activities_map[activity_id]
+            # Only delete if within the Strava range or newer
+            # This avoids deleting old activities that just aren't in the current page
+            if activity_to_delete.start_date >= oldest_strava_date:
+                writes.append(('deleted', activity_to_delete.id, partial(db.session.delete, activity_to_delete)))
+    
+        # STEP 8: Commit in batches; counts are of committed rows only
+        counts = commit_sync_writes(user_id, writes)
+    else:
+        # No activities from Strava, special case handling:
+        # Check if we should delete all activities (account reset) or do nothing
+        # Get the total activity count from Strava (of all types)
+        if not strava_activities:
+            # User might have deleted all activities on Strava
+            # Let's do a second API call to confirm there are no activities at all
+            all_activities_param = {'per_page': 1, 'page': 1}
+            release_db_connection()
+            all_activities_response = strava_http.get(
+                "https://www.strava.com/api/v3/athlete/activities",
+                headers={'Authorization': 'Bearer ' + credentials.access_token},
+                params=all_activities_param
+            )
+            strava_calls += 1
+    
+            if all_activities_response.status_code == 200 and not all_activities_response.json():
+                # Confirmed: User has no activities at all in Strava
+                # Delete all their activities from our database
+                activities_to_delete = Activity.query.filter_by(
+                    user_id=user_id
+                ).all()
+                counts = commit_sync_writes(user_id, [
+                    ('deleted', activity.id, partial(db.session.delete, activity)) for activity in activities_to_delete
+                ])
+    
+    # Keep this user's leaderboard rows and calendar buckets in step with the refreshed activities
+    update_user_leaderboards(user_id)
+    update_day_buckets(user_id, since=buckets_since)
+    
+    newest_epoch = None
+    if strava_activities:
+        newest_epoch = max(to_epoch(datetime.strptime(a['start_date'], '%Y-%m-%dT%H:%M:%SZ')) for a in strava_activities)
+    
+    return {
+        "added": counts["added"],
+        "updated": counts["updated"],
+        "deleted": counts["deleted"],
+        "strava_calls": strava_calls,
+        "newest_epoch": newest_epoch
+    }
+
+
+def to_epoch(value):
+    """Naive UTC datetime to a Unix timestamp (datetime.timestamp() would assume local time)."""
+    return calendar.timegm(value.timetuple())
+
+
+def activity_from_strava(athlete_id, strava_activity):
+    """A new Activity row for a Strava activity summary."""
+    return Activity(
+        id=strava_activity['id'],
+        user_id=athlete_id,
+        name=strava_activity['name'],
+        description=strava_activity.get('description'),
+        type=strava_activity['type'],
+        distance=strava_activity['distance'],
+        moving_time=strava_activity['moving_time'],
+        elapsed_time=strava_activity['elapsed_time'],
+        total_elevation_gain=strava_activity.get('total_elevation_gain', 0),
+        start_date=datetime.strptime(strava_activity['start_date'], '%Y-%m-%dT%H:%M:%SZ'),
+        polyline=strava_activity.get('map', {}).get('summary_polyline'),
+        start_latlng=json.dumps(strava_activity.get('start_latlng')),
+        end_latlng=json.dumps(strava_activity.get('end_latlng')),
+        activity_data=strava_activity
+    )
+
+
+def add_activity_from_strava(athlete_id, strava_activity):
+    db.session.add(activity_from_strava(athlete_id, strava_activity))
+
+
+def update_activity_from_strava(activity, strava_activity):
+    activity.name = strava_activity['name']
+    activity.type = strava_activity['type']
+    # List responses carry no description; keep one we already have
+    if 'description' in strava_activity:
+        activity.description = strava_activity['description']
+    activity.distance = strava_activity['distance']
+    activity.moving_time = strava_activity['moving_time']
+    activity.elapsed_time = strava_activity['elapsed_time']
+    activity.total_elevation_gain = strava_activity.get('total_elevation_gain', 0)
+    polyline = strava_activity.get('map', {}).get('summary_polyline')
+    if polyline != activity.polyline:
+        activity.route_id = None  # matched again below (see stage_sync_writes)
+    activity.polyline = polyline
+    activity.start_latlng = json.dumps(strava_activity.get('start_latlng'))
+    activity.end_latlng = json.dumps(strava_activity.get('end_latlng'))
+    activity.activity_data = strava_activity
+
+
+def stage_sync_writes(user_id, writes):
+    """Stage (kind, activity_id, write) operations in the current transaction. Returns those applied.
+    
+    The writes are flushed together in one savepoint; if that fails they are replayed one
+    savepoint each, so a bad row is logged and dropped without undoing the others. The
+    change-log entries and summary update for the applied writes are staged as well; the
+    caller commits.
+    """
+    if not writes:
+        return []
+    lock_change_log(user_id)
+    try:
+        with db.session.begin_nested():
+            for _, _, write in writes:
+                write()
+        applied = writes
+    except Exception as e:
+        # The driver's message only; str(e) would carry every row's parameters
+        print(f"Database write error in a batch of {len(writes)}, retrying one by one: {getattr(e, 'orig', e)}")
+        applied = []
+        for kind, activity_id, write in writes:
+            try:
+                with db.session.begin_nested():
+                    write()
+                applied.append((kind, activity_id, write))
+            except Exception as e:
+                print(f"Database write error ({kind} activity {activity_id}): {getattr(e, 'orig', e)}")
+    
+    upserted = [activity_id for kind, activity_id, _ in applied if kind != 'deleted']
+    record_changes(
+        user_id,
+        upserted=upserted,
+        deleted=[activity_id for kind, activity_id, _ in applied if kind == 'deleted']
+    )
+    if applied:
+        update_user_summary(user_id, badges=False)
+    if upserted:
+        # Routes are derived data: on failure `flask cluster-routes` matches these later
+        try:
+            with db.session.begin_nested():
+                match_activity_routes(user_id, upserted)
+        except Exception as e:
+            print(f"Route matching error for user {user_id}: {getattr(e, 'orig', e)}")
+    return applied
+
+
+def commit_sync_writes(user_id, writes, batch_size=SYNC_WRITE_BATCH):
+    """Apply a user's sync writes in transactions of `batch_size`, see stage_sync_writes.
+    
+    Returns counts per kind ('added', 'updated', 'deleted') of committed writes only, plus
+    'failed' for those dropped.
+    """
+    counts = {"added": 0, "updated": 0, "deleted": 0, "failed": 0}
+    for start in range(0, len(writes), batch_size):
+        batch = writes[start:start + batch_size]
+        try:
+            applied = stage_sync_writes(user_id, batch)
+            db.session.commit()
+        except Exception as e:
+            print(f"Database write error committing changes: {str(e)}")
+            db.session.rollback()
+            counts["failed"] += len(batch)
+            continue
+        counts["failed"] += len(batch) - len(applied)
+        for kind, _, _ in applied:
+            counts[kind] += 1
+    return counts
+
+
+def store_activity_page(athlete_id, strava_activities):
+    """Stage (and log) the activities from one Strava page that aren't stored yet. Returns the number added.
+    
+    A row that fails to insert is skipped (see stage_sync_writes); the caller commits.
+    """
+    if not strava_activities:
+        return 0
+    
+    # One lookup per page instead of one per activity
+    page_ids = [activity['id'] for activity in strava_activities]
+    existing_ids = {activity_id for (activity_id,) in db.session.query(Activity.id).filter(Activity.id.in_(page_ids))}
+    
+    writes = []
+    for activity in strava_activities:
+        if activity['id'] in existing_ids:
+            continue
+        existing_ids.add(activity['id'])
+        writes.append(('added', activity['id'], partial(add_activity_from_strava, athlete_id, activity)))
+    return len(stage_sync_writes(athlete_id, writes))
+
+
+def oldest_start_epoch(strava_activities):
+    return min(to_epoch(datetime.strptime(a['start_date'], '%Y-%m-%dT%H:%M:%SZ')) for a in strava_activities)
+
+
+def newest_start_epoch(strava_activities):
+    return max(to_epoch(datetime.strptime(a['start_date'], '%Y-%m-%dT%H:%M:%SZ')) for a in strava_activities)
+
+
+def fetch_and_store_activities(athlete_id, access_token):
+    """Fetch activities from Strava API and store in database, handling all pages.
+    
+    The import is checkpointed: a first import walks backward from now with before=, one
+    for a returning user pages forward from their newest stored activity with after=.
+    Each page commits together with the cursor in user_sync_status, so an import that
+    hits a Strava error or a killed worker resumes where it stopped on the next call.
+    The cursor is read before each page request and no connection is held during it.
+    """
+    activities_url = "https://www.strava.com/api/v3/athlete/activities"
+    header = {'Authorization': 'Bearer ' + access_token}
+    
+    state = get_sync_state(athlete_id)
+    resumed = state.import_status in ('in_progress', 'failed')
+    if not resumed:
+        # New import: everything newer than what we have (or full history)
+        newest_activity = Activity.query.filter_by(
+            user_id=athlete_id
+        ).order_by(
+            Activity.start_date.desc()
+        ).first()
+        state.import_after = to_epoch(newest_activity.start_date) if newest_activity else None
+        state.import_before = None
+        state.import_pages = 0
+    state.import_status = 'in_progress'
+    state.import_error = None
+    db.session.commit()
+    
+    # Days at or after the lower bound may get new activities. A resumed import has already
+    # moved that bound past pages it stored, so it rebuilds every day.
+    buckets_since = datetime.utcfromtimestamp(state.import_after) if state.import_after and not resumed else None
+    
+    activities_added = 0
+    while True:
+        # Only one bound at a time: Strava returns after= pages oldest first and before=
+        # pages newest first, and each cursor moves from the far end of its page
+        params = {'per_page': 200, 'page': 1}
+        if state.import_after:
+            params['after'] = state.import_after
+        elif state.import_before:
+            params['before'] = state.import_before
+        
+        release_db_connection()
+        response = strava_http.get(activities_url, headers=header, params=params)
+        if response.status_code != 200:
+            state.import_status = 'failed'
+            state.import_error = f"Strava API error: {response.status_code}"
+            db.session.commit()
+            print(f"Import for user {athlete_id} stopped at page {state.import_pages + 1}: {state.import_error}")
+            break
+        strava_activities = response.json()
+        if not strava_activities:
+            state.import_status = 'complete'
+            state.import_before = None
+            state.import_after = None
+            db.session.commit()
+            break
+        
+        # Activities and the cursor commit together, so the checkpoint never skips a page
+        activities_added += store_activity_page(athlete_id, strava_activities)
+        if state.import_after:
+            state.import_after = newest_start_epoch(strava_activities)
+        else:
+            state.import_before = oldest_start_epoch(strava_activities)
+        state.import_pages += 1
+        db.session.commit()
+    
+    finish_ingest(athlete_id, since=buckets_since)
+    return activities_added
+
+
+def backfill_activity_history(credentials, max_pages=None):
+    """Walk the user's full Strava history backward with before= and fill any missing activities.
+    
+    Progress is checkpointed in user_sync_status.backfill_before, so repeated calls with a
+    page budget eventually cover the whole history. Returns (activities added, finished).
+    """
+    activities_url = "https://www.strava.com/api/v3/athlete/activities"
+    header = {'Authorization': 'Bearer ' + credentials.access_token}
+    user_id = credentials.user_id
+    state = get_sync_state(user_id)
+    
+    activities_added = 0
+    oldest_touched = None
+    pages = 0
+    finished = False
+    while max_pages is None or pages < max_pages:
+        params = {'per_page': 200, 'page': 1}
+        if state.backfill_before:
+            params['before'] = state.backfill_before
+        
+        release_db_connection()
+        response = strava_http.get(activities_url, headers=header, params=params)
+        if response.status_code != 200:
+            print(f"Backfill for user {user_id} stopped: Strava API error {response.status_code}")
+            break
+        strava_activities = response.json()
+        if not strava_activities:
+            state.backfill_before = None
+            state.backfill_completed_at = datetime.utcnow()
+            db.session.commit()
+            finished = True
+            break
+        
+        activities_added += store_activity_page(user_id, strava_activities)
+        state.backfill_before = oldest_start_epoch(strava_activities)
+        oldest_touched = datetime.utcfromtimestamp(state.backfill_before)
+        pages += 1
+        db.session.commit()
+    
+    if activities_added:
+        finish_ingest(user_id, since=oldest_touched)
+    return activities_added, finished
+
+
+def finish_ingest(athlete_id, since=None):
+    """Refresh everything derived from a user's activities after new ones were stored."""
+    evaluate_user_badges(athlete_id)
+    update_user_leaderboards(athlete_id)
+    update_day_buckets(athlete_id, since=since)
+
+
+def sync_user_by_id(user_id):
+    """Token refresh plus recent-activity sync for one user, recording the outcome."""
+    user = User.query.get(user_id)
+    if not user:
+        return "error"
+    credentials = StravaCredentials.from_user(user)
+    
+    started = time.time()
+    try:
+        refresh_user_token(credentials)
+        changes = sync_recent_activities(credentials)
+        record_user_sync(user_id, started, "ok", changes={
+            key: changes[key] for key in ("added", "updated", "deleted")
+        })
+        return "ok"
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error syncing user {user_id}: {str(e)}")
+        record_user_sync(user_id, started, "error", str(e))
+        return "error"
@@ -0,0 +1,150 @@
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from models import db, ActivityStream
+
+# Strava stream type -> array typecode it is packed as
+STREAM_TYPES = {
+    "time": "i",  # seconds since start
+    "distance": "f",  # cumulative meters
+    "latlng": "f",  # flattened lat, lng pairs (float32 is ~1 m at these magnitudes)
+    "altitude": "f",
+    "heartrate": "h",
+}
+STREAM_KEYS = ",".join(STREAM_TYPES)
+
+SPLIT_LENGTHS = {"km": 1000, "mi": 1609.344}
+BEST_EFFORTS = [
+    ("400m", 400), ("1/2 mile", 804.672), ("1k", 1000), ("1 mile", 1609.344), ("5k", 5000),
+    ("10k", 10000), ("Half-Marathon", 21097.5), ("Marathon", 42195),
+]
+
+
+def pack(values, typecode):
+    packed = array(typecode, values)
+    # Stored little-endian regardless of the host
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return zlib.compress(packed.tobytes())
+
+
+def unpack(blob, typecode):
+    values = array(typecode)
+    values.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def streams_from_strava(payload):
+    """{type: [values]} from a /streams response, whether keyed by type or a list."""
+    if isinstance(payload, list):
+        payload = {stream["type"]: stream for stream in payload}
+    streams = {}
+    for stream_type in STREAM_TYPES:
+        if stream_type in payload:
+            data = payload[stream_type]["data"]
+            if stream_type == "latlng":
+                data = [coordinate for point in data for coordinate in point]
+            streams[stream_type] = data
+    return streams
+
+
+def store_streams(activity_id, streams):
+    """Save (or replace) an activity's streams. The caller commits."""
+    record = db.session.get(ActivityStream, activity_id) or ActivityStream(activity_id=activity_id)
+    record.point_count = len(streams.get("time", []))
+    for stream_type, typecode in STREAM_TYPES.items():
+        values = streams.get(stream_type)
+        setattr(record, stream_type, pack(values, typecode) if values else None)
+    db.session.add(record)
+    return record
+
+
+def load_streams(activity_id):
+    """{type: array} for a stored activity, or None if its streams were never fetched."""
+    record = db.session.get(ActivityStream, activity_id)
+    if record is None:
+        return None
+    return {
+        stream_type: unpack(getattr(record, stream_type), typecode)
+        for stream_type, typecode in STREAM_TYPES.items()
+        if getattr(record, stream_type) is not None
+    }
+
+
+def time_at(distance, time, target):
+    """Elapsed seconds when cumulative distance first reaches `target`, interpolated."""
+    index = bisect_left(distance, target)
+    if index == 0:
+        return time[0]
+    d0, d1 = distance[index - 1], distance[index]
+    t0, t1 = time[index - 1], time[index]
+    return t0 + (t1 - t0) * (target - d0) / (d1 - d0) if d1 > d0 else t1
+
+
+def compute_splits(streams, split_length=1000):
+    """Per-split elapsed time, pace, elevation change and average heart rate.
+
+    Split boundaries are found by binary search on the distance stream, so the cost is
+    O(splits * log n) plus one pass for heart rate; the final partial split is included.
+    """
+    distance, time = streams["distance"], streams["time"]
+    altitude, heartrate = streams.get("altitude"), streams.get("heartrate")
+    total = distance[-1]
+
+    splits = []
+    start_distance, start_time, start_index = 0.0, time[0], 0
+    while start_distance < total:
+        end_distance = min(start_distance + split_length, total)
+        end_time = time_at(distance, time, end_distance)
+        end_index = min(bisect_left(distance, end_distance), len(distance) - 1)
+
+        split = {
+            "split": len(splits) + 1,
+            "distance": round(end_distance - start_distance, 1),
+            "elapsed_time": round(end_time - start_time, 1),
+            "pace": round((end_time - start_time) / (end_distance - start_distance) * split_length, 1),
+        }
+        if altitude:
+            split["elevation_difference"] = round(altitude[end_index] - altitude[start_index], 1)
+        if heartrate:
+            window = heartrate[start_index:end_index + 1]
+            split["average_heartrate"] = round(sum(window) / len(window), 1)
+        splits.append(split)
+
+        start_distance, start_time, start_index = end_distance, end_time, end_index
+    return splits
+
+
+def compute_best_efforts(streams, efforts=BEST_EFFORTS):
+    """Fastest time over each standard distance the activity covers.
+
+    A two-pointer sweep per distance: the window's start only ever moves forward, so each
+    effort is one O(n) pass over the stream.
+    """
+    distance, time = streams["distance"], streams["time"]
+    count = len(distance)
+    results = []
+    for name, length in efforts:
+        if distance[-1] - distance[0] < length:
+            break
+        best = None
+        start = 0
+        for end in range(1, count):
+            # Shortest window ending here that still covers the distance
+            while start + 1 < end and distance[end] - distance[start + 1] >= length:
+                start += 1
+            if distance[end] - distance[start] >= length:
+                elapsed = time[end] - time[start]
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, start, end)
+        results.append({
+            "name": name,
+            "distance": length,
+            "elapsed_time": best[0],
+            "start_index": best[1],
+            "end_index": best[2],
+        })
+    return results
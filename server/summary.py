@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from models import db, Activity, Badge, UserBadge, UserSummary, UserSyncStatus
+
+FLOAT_TOLERANCE = 0.01
+
+
+def compute_activity_totals(user_id):
+    """The user's run totals and latest run, aggregated from activities."""
+    run_count, distance, moving_time, elevation = db.session.query(
+        func.count(Activity.id),
+        func.coalesce(func.sum(Activity.distance), 0),
+        func.coalesce(func.sum(Activity.moving_time), 0),
+        func.coalesce(func.sum(Activity.total_elevation_gain), 0)
+    ).filter(Activity.user_id == user_id, Activity.type == 'Run').one()
+    latest = db.session.query(Activity.id, Activity.start_date).filter(
+        Activity.user_id == user_id, Activity.type == 'Run'
+    ).order_by(Activity.start_date.desc(), Activity.id.desc()).first()
+    return {
+        "run_count": run_count,
+        "run_distance": float(distance),
+        "run_moving_time": int(moving_time),
+        "run_elevation_gain": float(elevation),
+        "latest_run_id": latest.id if latest else None,
+        "latest_run_date": latest.start_date if latest else None
+    }
+
+
+def compute_badge_totals(user_id):
+    # Awards whose badge still exists, matching /api/badges
+    badge_count = db.session.query(func.count(UserBadge.badge_id)).join(
+        Badge, Badge.id == UserBadge.badge_id
+    ).filter(UserBadge.user_id == user_id).scalar()
+    return {"badge_count": badge_count}
+
+
+def compute_user_summary(user_id):
+    """The user's summary values recomputed from scratch."""
+    return {**compute_activity_totals(user_id), **compute_badge_totals(user_id)}
+
+
+def update_user_summary(user_id, activities=True, badges=True):
+    """Bring the user's summary row up to date inside the caller's transaction.
+
+    Call it after the activity or badge writes (pending ones are flushed first) and
+    before the commit, so the row never disagrees with committed data. Recomputing
+    activity totals takes the user's sync-row lock, the one record_changes holds, so
+    concurrent writers for a user take turns and the last to commit counts every row.
+    """
+    summary = db.session.get(UserSummary, user_id)
+    if summary is None:
+        summary = UserSummary(user_id=user_id)
+        db.session.add(summary)
+        activities = badges = True
+
+    values = {}
+    if activities:
+        db.session.query(UserSyncStatus.user_id).filter_by(user_id=user_id).with_for_update().scalar()
+        values.update(compute_activity_totals(user_id))
+    if badges:
+        values.update(compute_badge_totals(user_id))
+    for field, value in values.items():
+        setattr(summary, field, value)
+    return summary
+
+
+def summary_response(summary):
+    """The /api/summary payload for a summary row: two primary-key reads in all."""
+    latest_run = db.session.get(Activity, summary.latest_run_id) if summary.latest_run_id else None
+    return {
+        "user_id": summary.user_id,
+        "total_runs": summary.run_count,
+        "total_distance": summary.run_distance,
+        "total_moving_time": summary.run_moving_time,
+        "total_elevation_gain": summary.run_elevation_gain,
+        "latest_run": latest_run.activity_data if latest_run else None,
+        "badge_count": summary.badge_count,
+        "updated_at": summary.updated_at.isoformat() if summary.updated_at else None
+    }
+
+
+def summary_mismatches(summary, expected):
+    """Fields whose stored value differs from `expected`, as {field: (stored, expected)}."""
+    mismatches = {}
+    for field, value in expected.items():
+        stored = getattr(summary, field) if summary else None
+        if isinstance(value, float) and stored is not None:
+            if abs(stored - value) <= FLOAT_TOLERANCE:
+                continue
+        elif stored == value:
+            continue
+        mismatches[field] = (stored, value)
+    return mismatches
+
+
+def rebuild_summaries(app, user_ids, workers=4, batch_size=100):
+    """Recompute summary rows for `user_ids` on a pool of `workers` threads.
+
+    Each worker commits once per batch of users. Returns the number of rows rebuilt.
+    """
+    batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+
+    def run(batch):
+        with app.app_context():
+            for user_id in batch:
+                update_user_summary(user_id)
+            db.session.commit()
+            return len(batch)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(run, batches))
+
+
+def check_summaries(user_ids, fix=False):
+    """Compare stored summaries with a recomputation. Returns {user_id: mismatches}.
+
+    A missing row shows up with every field mismatched. With fix, bad rows are rewritten.
+    A sync committing mid-check can show as a one-off mismatch; recheck before digging in.
+    """
+    problems = {}
+    for user_id in user_ids:
+        summary = db.session.get(UserSummary, user_id)
+        mismatches = summary_mismatches(summary, compute_user_summary(user_id))
+        if mismatches:
+            problems[user_id] = mismatches
+            if fix:
+                update_user_summary(user_id)
+                db.session.commit()
+        # Don't hold a growing identity map across every user
+        db.session.expunge_all()
+    return problems
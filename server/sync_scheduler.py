@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_
+from models import db, User, Activity, UserSyncStatus
+from metrics import queue_depth
+
+SHORT_WINDOW_SECONDS = 15 * 60
+DEFAULT_MIN_AGE = timedelta(hours=1)
+
+
+class StravaQuota:
+    """Tracks Strava's 15-minute and daily request limits from response headers.
+
+    Strava reports usage as "X-RateLimit-Usage: <15min>,<daily>". When headers are missing
+    (e.g. a fake API) each response is counted locally instead.
+    """
+
+    def __init__(self, short_limit=None, daily_limit=None):
+        self.short_limit = short_limit or int(os.getenv("STRAVA_RATE_LIMIT_15MIN", 100))
+        self.daily_limit = daily_limit or int(os.getenv("STRAVA_RATE_LIMIT_DAILY", 1000))
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.short_window = self.current_short_window()
+        self.day = datetime.utcnow().date()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def current_short_window():
+        # Strava's 15-minute windows start on the quarter hour
+        return int(time.time()) // SHORT_WINDOW_SECONDS
+
+    def roll_windows(self):
+        if self.current_short_window() != self.short_window:
+            self.short_window = self.current_short_window()
+            self.short_usage = 0
+        if datetime.utcnow().date() != self.day:
+            self.day = datetime.utcnow().date()
+            self.daily_usage = 0
+
+    def update_from_response(self, response, *args, **kwargs):
+        with self.lock:
+            self.roll_windows()
+            usage = response.headers.get("X-ReadRateLimit-Usage") or response.headers.get("X-RateLimit-Usage")
+            limit = response.headers.get("X-ReadRateLimit-Limit") or response.headers.get("X-RateLimit-Limit")
+            if usage:
+                short_usage, daily_usage = (int(value) for value in usage.split(","))
+                self.short_usage, self.daily_usage = short_usage, daily_usage
+            else:
+                self.short_usage += 1
+                self.daily_usage += 1
+            if limit:
+                self.short_limit, self.daily_limit = (int(value) for value in limit.split(","))
+            if response.status_code == 429:
+                self.short_usage = max(self.short_usage, self.short_limit)
+        return response
+
+    def remaining(self):
+        """Return (requests left in this 15-minute window, requests left today)."""
+        with self.lock:
+            self.roll_windows()
+            return self.short_limit - self.short_usage, self.daily_limit - self.daily_usage
+
+    def seconds_until_short_reset(self):
+        return SHORT_WINDOW_SECONDS - int(time.time()) % SHORT_WINDOW_SECONDS
+
+
+def record_user_sync(user_id, started, status, error=None, changes=None):
+    """Upsert the user's last-sync record. Never raises; sync results matter more."""
+    try:
+        sync_status = get_sync_state(user_id)
+        sync_status.last_sync_at = datetime.utcnow()
+        sync_status.last_duration = round(time.time() - started, 3)
+        sync_status.last_status = status
+        sync_status.last_error = error[:255] if error else None
+        sync_status.last_changes = sum(changes.values()) if changes else 0
+        sync_status.sync_count += 1
+        db.session.commit()
+    except Exception as e:
+        print(f"Database write error recording sync status: {str(e)}")
+        db.session.rollback()
+
+
+def plan_sync(min_age=DEFAULT_MIN_AGE, limit=None, now=None):
+    """Return user ids to sync, highest priority first.
+
+    Priority is hours since last sync weighted by recent activity frequency, so active users
+    refresh more often than idle ones without idle users being starved. Never-synced users
+    go first.
+    """
+    now = now or datetime.utcnow()
+    users = db.session.query(User.id, UserSyncStatus.last_sync_at).outerjoin(
+        UserSyncStatus, UserSyncStatus.user_id == User.id
+    ).all()
+
+    # Activities (any sport) per week over the last 4 weeks, one grouped query over idx_user_date
+    recent_counts = dict(db.session.query(Activity.user_id, func.count(Activity.id)).filter(
+        Activity.start_date >= now - timedelta(days=28)
+    ).group_by(Activity.user_id).all())
+
+    candidates = []
+    for user_id, last_sync_at in users:
+        if last_sync_at is None:
+            candidates.append((float("inf"), user_id))
+            continue
+        age = now - last_sync_at
+        if age < min_age:
+            continue
+        activities_per_week = recent_counts.get(user_id, 0) / 4
+        candidates.append((age.total_seconds() / 3600 * (1 + activities_per_week), user_id))
+
+    candidates.sort(key=lambda candidate: -candidate[0])
+    user_ids = [user_id for _, user_id in candidates]
+    return user_ids[:limit] if limit else user_ids
+
+
+def count_due_users(min_age=DEFAULT_MIN_AGE, now=None):
+    """How many users plan_sync would return: never synced, or synced at least min_age ago."""
+    now = now or datetime.utcnow()
+    return db.session.query(func.count(User.id)).outerjoin(
+        UserSyncStatus, UserSyncStatus.user_id == User.id
+    ).filter(or_(
+        UserSyncStatus.last_sync_at.is_(None), UserSyncStatus.last_sync_at <= now - min_age
+    )).scalar()
+
+
+# Read from the database at scrape time, so the web process's /metrics reports the backlog
+# that sync-all (a separate CLI process) is working through
+queue_depth.set_function(count_due_users, queue="sync")
+
+
+def run_sync_all(app, sync_user, quota, user_ids, concurrency=4, calls_per_user=3, reserve=5,
+                 wait_for_quota=True, log=print):
+    """Sync users in order on a bounded pool, admitting work only while quota remains.
+
+    `sync_user(user_id)` runs inside an app context and returns 'ok' or 'error'. Each user is
+    budgeted `calls_per_user` Strava requests; `reserve` requests are left for interactive
+    refreshes. Returns a summary dict.
+    """
+    pending = list(user_ids)
+    in_flight = {}
+    summary = {"ok": 0, "error": 0, "skipped": 0, "started": time.time()}
+
+    def run(user_id):
+        with app.app_context():
+            return sync_user(user_id)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while pending or in_flight:
+            short_left, daily_left = quota.remaining()
+            reserved = len(in_flight) * calls_per_user
+
+            if pending and len(in_flight) < concurrency:
+                if daily_left - reserved < calls_per_user + reserve:
+                    log(f"Daily Strava quota exhausted; skipping {len(pending)} users")
+                    summary["skipped"] += len(pending)
+                    pending = []
+                    continue
+                if short_left - reserved >= calls_per_user + reserve:
+                    user_id = pending.pop(0)
+                    in_flight[executor.submit(run, user_id)] = user_id
+                    continue
+                if not in_flight:
+                    if not wait_for_quota:
+                        log(f"15-minute Strava quota exhausted; skipping {len(pending)} users")
+                        summary["skipped"] += len(pending)
+                        pending = []
+                        continue
+                    delay = quota.seconds_until_short_reset() + 1
+                    log(f"15-minute Strava quota exhausted; waiting {delay}s")
+                    time.sleep(delay)
+                    continue
+
+            # Pool is full or waiting on quota held by in-flight syncs
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                user_id = in_flight.pop(future)
+                try:
+                    status = future.result()
+                except Exception as e:
+                    print(f"Sync error for user {user_id}: {str(e)}")
+                    status = "error"
+                summary[status] += 1
+
+    summary["duration"] = round(time.time() - summary.pop("started"), 2)
+    return summary
+
+
+def get_sync_state(user_id):
+    """The user's sync record, created (unsaved) if missing."""
+    state = db.session.get(UserSyncStatus, user_id)
+    if not state:
+        state = UserSyncStatus(user_id=user_id, sync_count=0)
+        db.session.add(state)
+    return state
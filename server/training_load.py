@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from models import db, Activity, DailyActivitySummary
+
+ACUTE_WINDOW_DAYS = 7
+CHRONIC_WINDOW_DAYS = 28
+
+
+def update_day_buckets(user_id, since=None):
+    """Rebuild a user's per-sport, per-day buckets, optionally only from `since` onward."""
+    query = db.session.query(
+        Activity.type,
+        Activity.start_date,
+        Activity.distance,
+        Activity.moving_time
+    ).filter(Activity.user_id == user_id)
+    if since is not None:
+        since = since.date() if isinstance(since, datetime) else since
+        query = query.filter(Activity.start_date >= datetime.combine(since, datetime.min.time()))
+
+    # Aggregate per calendar day (UTC, same as Activity.start_date)
+    buckets = {}
+    for activity_type, start_date, distance, moving_time in query:
+        key = (activity_type, start_date.date())
+        if key not in buckets:
+            buckets[key] = {"distance": 0, "moving_time": 0, "count": 0}
+        buckets[key]["distance"] += distance
+        buckets[key]["moving_time"] += moving_time
+        buckets[key]["count"] += 1
+
+    # Replace the affected range so days whose activities were deleted disappear too
+    stale = DailyActivitySummary.query.filter(DailyActivitySummary.user_id == user_id)
+    if since is not None:
+        stale = stale.filter(DailyActivitySummary.day >= since)
+    stale.delete(synchronize_session=False)
+
+    for (activity_type, day), totals in buckets.items():
+        db.session.add(DailyActivitySummary(user_id=user_id, type=activity_type, day=day, **totals))
+
+    db.session.commit()
+    return len(buckets)
+
+
+def get_streak_before(user_id, day, activity_type='Run'):
+    """Count consecutive active days ending the day before `day` (any sport if type is None)."""
+    streak = 0
+    expected = day - timedelta(days=1)
+    previous_days = db.session.query(DailyActivitySummary.day).filter(
+        DailyActivitySummary.user_id == user_id,
+        DailyActivitySummary.day < day
+    )
+    if activity_type:
+        previous_days = previous_days.filter(DailyActivitySummary.type == activity_type)
+    previous_days = previous_days.distinct().order_by(DailyActivitySummary.day.desc()).yield_per(100)
+
+    for (active_day,) in previous_days:
+        if active_day != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+    return streak
+
+
+def get_calendar_series(user_id, start, end, activity_type='Run'):
+    """Return a dense per-day series between start and end (inclusive) for one sport, or
+    every sport combined when activity_type is None."""
+    # One range scan covers the requested days plus the chronic-load lookback
+    lookback_start = start - timedelta(days=CHRONIC_WINDOW_DAYS - 1)
+    rows = DailyActivitySummary.query.filter(
+        DailyActivitySummary.user_id == user_id,
+        DailyActivitySummary.day >= lookback_start,
+        DailyActivitySummary.day <= end
+    )
+    if activity_type:
+        rows = rows.filter(DailyActivitySummary.type == activity_type)
+
+    buckets = {}
+    for row in rows:
+        bucket = buckets.setdefault(row.day, {"distance": 0, "moving_time": 0, "count": 0})
+        bucket["distance"] += row.distance
+        bucket["moving_time"] += row.moving_time
+        bucket["count"] += row.count
+
+    streak = get_streak_before(user_id, start, activity_type)
+    acute_load = 0
+    chronic_load = 0
+    series = []
+
+    day = lookback_start
+    while day <= end:
+        bucket = buckets.get(day)
+        distance = bucket["distance"] if bucket else 0
+
+        # Rolling sums of daily distance over the acute and chronic windows
+        acute_load += distance
+        chronic_load += distance
+        acute_drop = buckets.get(day - timedelta(days=ACUTE_WINDOW_DAYS))
+        chronic_drop = buckets.get(day - timedelta(days=CHRONIC_WINDOW_DAYS))
+        if acute_drop:
+            acute_load -= acute_drop["distance"]
+        if chronic_drop:
+            chronic_load -= chronic_drop["distance"]
+
+        if day >= start:
+            streak = streak + 1 if bucket else 0
+
+            # Acute:chronic ratio compares the last week against the 4-week weekly average
+            chronic_weekly = chronic_load / (CHRONIC_WINDOW_DAYS / ACUTE_WINDOW_DAYS)
+            ratio = round(acute_load / chronic_weekly, 2) if chronic_weekly > 0 else None
+
+            series.append({
+                "date": day.isoformat(),
+                "distance": round(distance, 1),
+                "moving_time": bucket["moving_time"] if bucket else 0,
+                "count": bucket["count"] if bucket else 0,
+                "streak": streak,
+                "acute_load": round(acute_load, 1),
+                "chronic_load": round(chronic_weekly, 1),
+                "acute_chronic_ratio": ratio
+            })
+        day += timedelta(days=1)
+
+    return series